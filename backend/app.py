@@ -1,4 +1,6 @@
 # backend/app.py
+import importlib
+
 from flask import Flask
 from flask_cors import CORS
 
@@ -7,7 +9,9 @@ from backend.routes.order_routes import order_bp
 from backend.routes.predict_routes import predict_bp
 from backend.routes.schedule_routes import schedule_bp
 from backend.routes.plan_routes import plan_bp
+from backend.routes.stock_routes import stock_bp
 from backend.routes.history_routes import history_bp
+from backend.routes.job_routes import job_bp
 
 
 def create_app():
@@ -20,11 +24,37 @@ def create_app():
     app.register_blueprint(schedule_bp, url_prefix='/api/schedule')
     app.register_blueprint(predict_bp, url_prefix='/api/forecast')
     app.register_blueprint(plan_bp, url_prefix='/api/stock')
+    app.register_blueprint(stock_bp, url_prefix='/api/stock')  # 情景分析
     app.register_blueprint(history_bp, url_prefix='/api/history')
+    app.register_blueprint(job_bp, url_prefix='/api/jobs')
 
     return app
 
 
+# 算法依赖的重型库：各 ml_models 模块在首次使用算法时才导入，预加载模式下由 gunicorn 主进程提前导入
+HEAVY_MODULES = [
+    "statsmodels.tsa.holtwinters",
+    "statsmodels.tsa.arima.model",
+    "statsmodels.tsa.stattools",
+    "statsmodels.stats.diagnostic",
+    "pmdarima",
+    "scipy.optimize",
+]
+
+
+def warm_up():
+    """
+    预热：导入算法依赖的重型库（只读状态，fork 后由各 worker 以写时复制方式共享）
+    只做导入，不创建进程池、数据库连接等不能跨 fork 共享的资源
+    """
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"⚠️ 预热导入失败（首次使用对应算法时再报错）: {name}", e)
+    print(f"🔥 已预热 {len(HEAVY_MODULES)} 个算法依赖模块")
+
+
 # 程序入口
 if __name__ == "__main__":
     app = create_app()
@@ -11,6 +11,15 @@ if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 LOG_FILE = os.path.join(LOG_DIR, 'app.log')
 
+# 预测模型缓存：进程内 LRU 容量；MODEL_CACHE_DIR 非空时同时持久化到磁盘，供多个 worker 共享
+MODEL_CACHE_SIZE = int(os.environ.get('MODEL_CACHE_SIZE', 32))
+MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', '')
+MODEL_CACHE_DISK_SIZE = int(os.environ.get('MODEL_CACHE_DISK_SIZE', 256))
+
+# 后台任务：每个 Web 进程中执行长任务的子进程数
+# 每个 gunicorn worker 各自创建进程池，任务进程总数 = workers × JOB_WORKERS（gunicorn_config 默认设为 1）
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+
 # Flask配置
 DEBUG = False
 SECRET_KEY = 'smart_factory_secret_key'
@@ -1,11 +1,16 @@
 import pandas as pd
 from datetime import timedelta
-from statsmodels.tsa.holtwinters import ExponentialSmoothing, SimpleExpSmoothing, Holt
-from statsmodels.tsa.arima.model import ARIMA
-from pmdarima import auto_arima
+import inspect
 import math
-from statsmodels.tsa.stattools import acf
 import numpy as np
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+# statsmodels / pmdarima 导入耗时且占内存，推迟到首次用到对应算法时在函数内导入
+
+from backend.utils.model_cache import series_fingerprint, get_cached_model, put_cached_model
+from backend.ml_models.fast_forecast import FAST_ALGORITHMS, fit_fast, fast_forecast
 
 def preprocess_time_series(input_data):
     """
@@ -42,14 +47,215 @@ def preprocess_time_series(input_data):
     return df
 
 
-def run_forecast(input_data, algorithm, forecast_days=None, prev_model=None):
+#ARIMA 阶数搜索
+ARIMA_MAX_ORDER = 5  # 并行搜索时 p + q 的上限（与 auto_arima 非逐步搜索的 max_order 一致）
+_search_pool = None
+
+
+def _get_search_pool():
+    """预测进程池（并行阶数搜索与批量预测共用）按需创建并在请求间复用"""
+    global _search_pool
+    if _search_pool is None:
+        _search_pool = ProcessPoolExecutor(max_workers=max(1, os.cpu_count() or 1))
+    return _search_pool
+
+
+def _arima_aic(values, order):
+    """在子进程中拟合单个候选阶数，返回 AIC（拟合失败返回 inf）"""
+    from statsmodels.tsa.arima.model import ARIMA
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return float(ARIMA(values, order=order).fit().aic)
+    except Exception:
+        return float("inf")
+
+
+def _candidate_orders(d, start_order=None):
+    """p + q <= ARIMA_MAX_ORDER 的全部候选阶数，按与上次阶数的距离排序（热启动时最近的先算）"""
+    p0, q0 = (start_order[0], start_order[2]) if start_order else (2, 2)
+    orders = [(p, d, q) for p in range(ARIMA_MAX_ORDER + 1) for q in range(ARIMA_MAX_ORDER + 1 - p)]
+    return sorted(orders, key=lambda o: (abs(o[0] - p0) + abs(o[2] - q0), o))
+
+
+def search_arima_order_parallel(ts, start_order=None, time_cap_s=None):
+    """
+    并行阶数搜索
+    -------------------------------------------------------
+    差分阶数 d 由单位根检验（ndiffs）确定，候选 (p, d, q) 分发到进程池并行拟合，取 AIC 最小者。
+    time_cap_s 到时不再等待：返回已完成候选中的最优阶数，未开始的候选取消
+    （已在子进程中运行的候选继续执行但结果被丢弃）。
+    返回:
+        best_order: 最优阶数，无任何候选完成时返回 None
+        info: 已评估 / 候选总数、是否超时
+    """
+    from pmdarima.arima import ndiffs
+
+    values = np.asarray(ts, dtype=np.float64)
+    d = int(ndiffs(values, test="kpss"))
+    if start_order is not None and start_order[1] == d:
+        print(f"♨️ 热启动：从上次阶数 {tuple(start_order)} 附近开始搜索")
+    orders = _candidate_orders(d, start_order)
+
+    pool = _get_search_pool()
+    futures = {pool.submit(_arima_aic, values, order): order for order in orders}
+    best_order, best_aic, evaluated, timed_out = None, float("inf"), 0, False
+    try:
+        for future in as_completed(futures, timeout=time_cap_s):
+            aic = future.result()
+            evaluated += 1
+            if aic < best_aic:
+                best_order, best_aic = futures[future], aic
+    except FuturesTimeout:
+        timed_out = True
+        for future in futures:
+            future.cancel()
+    return best_order, {"evaluated": evaluated, "candidates": len(orders), "timed_out": timed_out}
+
+
+def _fit_arima(ts, search="stepwise", start_order=None, time_cap_s=None):
+    """
+    搜索阶数后拟合 ARIMA
+    search: 'stepwise'（auto_arima 逐步搜索，默认）/ 'parallel'（候选阶数并行拟合，可设时间上限）
+    start_order: 上次为同一序列选出的阶数，逐步搜索从该阶数起步，并行搜索优先评估其附近的候选
+    并行搜索没有任何候选完成时退回逐步搜索
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    best_order = None
+    if search == "parallel":
+        started = time.perf_counter()
+        try:
+            best_order, info = search_arima_order_parallel(ts, start_order, time_cap_s)
+            print(f"🧮 并行阶数搜索: 评估 {info['evaluated']}/{info['candidates']} 个候选，"
+                  f"耗时 {time.perf_counter() - started:.2f}s{'（已达时间上限）' if info['timed_out'] else ''}")
+        except Exception as e:
+            print("⚠️ 并行阶数搜索失败，改用逐步搜索：", e)
+
+    if best_order is None:
+        from pmdarima import auto_arima
+
+        kwargs = {}
+        if start_order is not None:
+            kwargs = {"start_p": int(start_order[0]), "start_q": int(start_order[2])}
+        auto_model = auto_arima(ts, seasonal=False, stepwise=True, suppress_warnings=True, **kwargs)
+        best_order = auto_model.order
+    model = ARIMA(ts, order=best_order)
+    return model.fit()
+
+
+def _fit_exp_smooth(ts, **_):
+    """样本少时用 Holt 双指数平滑，否则按 ACF 峰值判断季节周期后用三指数平滑"""
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing, Holt
+    from statsmodels.tsa.stattools import acf
+
+    n = len(ts)
+    if n <= 20:
+        model = Holt(ts)
+        fit_model = model.fit()
+        model_type = "双指数平滑"
+    else:
+        # --------------------------
+        # 自动判断季节周期（基于ACF）
+        # --------------------------
+        max_lag = min(30, n // 2)  # 最大滞后期，避免太短或太长
+        acf_vals = acf(ts, nlags=max_lag, fft=False)
+        # 找到滞后期峰值（忽略滞后0）
+        lag_peaks = np.argmax(acf_vals[1:]) + 1
+        seasonal_periods = max(2, lag_peaks)  # 至少2
+        print(f"🔄 自动判断季节周期: {seasonal_periods}")
+
+        model = ExponentialSmoothing(ts, trend='add', seasonal='add', seasonal_periods=seasonal_periods)
+        fit_model = model.fit()
+        model_type = f"三指数平滑（周期={seasonal_periods}）"
+
+    print(f"✅ 已选择 {model_type} 模型（样本数: {n}）")
+    return fit_model
+
+
+def _fast_fitter(algorithm):
+    """轻量引擎拟合函数：模型 dict 额外保存日期与数值，供增量更新时取回历史序列"""
+    def fit(ts, **_):
+        fit_model = fit_fast(ts.to_numpy(dtype=np.float64), algorithm)
+        fit_model["index"] = ts.index.to_numpy(dtype="datetime64[ns]")
+        fit_model["y"] = ts.to_numpy(dtype=np.float64)
+        return fit_model
+    return fit
+
+
+FITTERS = {
+    "arima": _fit_arima,
+    "exp_smooth": _fit_exp_smooth,
+}
+# 轻量引擎：'ses' / 'holt' / 'holt_winters' / 'croston'（只依赖 NumPy，网格选参，不调用优化器）
+FITTERS.update({name: _fast_fitter(name) for name in FAST_ALGORITHMS})
+
+
+def _unsupported(algorithm):
+    return ValueError(f"Unsupported algorithm: {algorithm}，请选择 {' / '.join(FITTERS)}")
+
+
+def _forecast_values(fit_model, steps):
+    """已拟合模型外推 steps 期（statsmodels 结果对象或轻量引擎模型 dict）"""
+    if isinstance(fit_model, dict):
+        return fast_forecast(fit_model, steps)
+    return np.asarray(fit_model.forecast(steps), dtype=np.float64)
+
+
+def _cache_key(ts, algorithm, **fit_options):
+    """
+    模型缓存键：序列指纹 + 算法 + 影响拟合结果的参数
+    值为 None 或与拟合函数默认值相同的参数不计入，因此按默认参数拟合时
+    与不传参数（如批量预测）的键相同，可以共用缓存
+    """
+    fitter = FITTERS.get(algorithm)
+    defaults = {name: p.default for name, p in inspect.signature(fitter).parameters.items()} if fitter else {}
+    params = {}
+    for name, value in fit_options.items():
+        if isinstance(value, list):
+            value = tuple(value)  # JSON 传入的阶数为 list，与 tuple 视为相同
+        if value is not None and (name not in defaults or defaults[name] != value):
+            params[name] = value
+    return series_fingerprint(ts, algorithm, **params)
+
+
+def fit_model_cached(ts, algorithm, use_cache=True, **fit_options):
+    """
+    拟合模型（带缓存）
+    -------------------------------------------------------
+    以序列指纹 + 算法 + 拟合参数为键查缓存，命中时直接返回已拟合模型，完全跳过拟合；
+    未命中时拟合后写入缓存。fit_options 透传给拟合函数（如 ARIMA 的搜索方式、热启动阶数与时间上限），
+    不同参数的拟合结果分别缓存
+    """
+    fitter = FITTERS.get(algorithm)
+    if fitter is None:
+        raise _unsupported(algorithm)
+    if not use_cache:
+        return fitter(ts, **fit_options)
+
+    key = _cache_key(ts, algorithm, **fit_options)
+    fit_model = get_cached_model(key)
+    if fit_model is not None:
+        print(f"⚡ 命中模型缓存（{algorithm}），跳过拟合")
+        return fit_model
+    fit_model = fitter(ts, **fit_options)
+    put_cached_model(key, fit_model)
+    return fit_model
+
+
+def run_forecast(input_data, algorithm, forecast_days=None, prev_model=None, use_cache=True,
+                 arima_search="stepwise", start_order=None, time_cap_s=None):
     """
     时间序列预测主函数
     -----------------------------------------------------
     input_data: Excel 文件路径 或 list[dict]
-    algorithm: 'arima' / 'exp_smooth'
+    algorithm: 'arima' / 'exp_smooth' / 轻量引擎 'ses' / 'holt' / 'holt_winters' / 'croston'
     forecast_days: 预测未来天数（默认 = 样本天数 / 2）
     prev_model: 已训练模型（用于动态更新）
+    use_cache: 是否使用已拟合模型缓存（相同序列与算法不再重复拟合）
+    arima_search: ARIMA 阶数搜索方式 'stepwise' / 'parallel'
+    start_order: 上次为同一序列 / SKU 选出的 (p, d, q)，用于热启动阶数搜索
+    time_cap_s: 并行阶数搜索的时间上限（秒）
     return: forecast_result, chart_data, new_model
     """
     df = preprocess_time_series(input_data)
@@ -69,10 +275,8 @@ def run_forecast(input_data, algorithm, forecast_days=None, prev_model=None):
             except Exception:
                 fit_model = prev_model.fit()
         else:
-            auto_model = auto_arima(ts, seasonal=False, stepwise=True, suppress_warnings=True)
-            best_order = auto_model.order
-            model = ARIMA(ts, order=best_order)
-            fit_model = model.fit()
+            fit_model = fit_model_cached(ts, algorithm, use_cache, search=arima_search,
+                                         start_order=start_order, time_cap_s=time_cap_s)
 
         forecast_index = pd.date_range(start=ts.index[-1] + timedelta(days=1),
                                        periods=forecast_days, freq='D')
@@ -84,35 +288,29 @@ def run_forecast(input_data, algorithm, forecast_days=None, prev_model=None):
         if prev_model is not None:
             fit_model = prev_model
         else:
-            if n <= 20:
-                model = Holt(ts)
-                fit_model = model.fit()
-                model_type = "双指数平滑"
-            else:
-                # --------------------------
-                # 自动判断季节周期（基于ACF）
-                # --------------------------
-                max_lag = min(30, n // 2)  # 最大滞后期，避免太短或太长
-                acf_vals = acf(ts, nlags=max_lag, fft=False)
-                # 找到滞后期峰值（忽略滞后0）
-                lag_peaks = np.argmax(acf_vals[1:]) + 1
-                seasonal_periods = max(2, lag_peaks)  # 至少2
-                print(f"🔄 自动判断季节周期: {seasonal_periods}")
-
-                model = ExponentialSmoothing(ts, trend='add', seasonal='add', seasonal_periods=seasonal_periods)
-                fit_model = model.fit()
-                model_type = f"三指数平滑（周期={seasonal_periods}）"
-
-            print(f"✅ 已选择 {model_type} 模型（样本数: {n}）")
+            fit_model = fit_model_cached(ts, algorithm, use_cache)
 
         forecast = fit_model.forecast(forecast_days)
         forecast_index = pd.date_range(start=ts.index[-1] + timedelta(days=1),
                                        periods=forecast_days, freq='D')
         forecast_series = pd.Series(forecast, index=forecast_index)
+
+    # 三、轻量引擎（NumPy 实现，适合短序列与大批量 SKU）
+    elif algorithm in FAST_ALGORITHMS:
+        fit_model = prev_model if prev_model is not None else fit_model_cached(ts, algorithm, use_cache)
+        forecast_index = pd.date_range(start=ts.index[-1] + timedelta(days=1),
+                                       periods=forecast_days, freq='D')
+        forecast_series = pd.Series(_forecast_values(fit_model, forecast_days), index=forecast_index)
     else:
-        raise ValueError("Unsupported algorithm: 请选择 'arima' 或 'exp_smooth'")
+        raise _unsupported(algorithm)
+
+    # 四、统一输出结果
+    forecast_result, chart_data = _format_forecast(ts, forecast_series)
+    return forecast_result, chart_data, fit_model
+
 
-    # 三、统一输出结果
+def _format_forecast(ts, forecast_series):
+    """历史序列 + 预测序列 -> 预测结果表格与图表数据"""
     forecast_result = [
         {"日期": str(d.date()), "预测需求": float(v)} for d, v in forecast_series.items()
     ]
@@ -121,5 +319,296 @@ def run_forecast(input_data, algorithm, forecast_days=None, prev_model=None):
         "y": [float(v) for v in ts.values] + [float(v) for v in forecast_series.values],  # 转 float
         "分界线": int(len(ts))  # 转 int
     }
+    return forecast_result, chart_data
+
+
+#多序列批量预测
+SERIES_ID_COLS = ['序列编号', 'SKU', 'sku', '产品编号', '产品', 'series_id']
+
+
+def split_series(input_data):
+    """
+    长表拆分为多条序列：一次解析日期与需求列，排序后一次 groupby 取各序列的行位置
+    -------------------------------------------------------
+    参数:
+        input_data: Excel 文件路径 或 list[dict]，每行包含序列编号（SKU）、日期、需求数量
+    返回:
+        list[(series_id, dates, values)]，dates 为 datetime64[ns] 数组，values 为 float 数组，
+        按序列首次出现的顺序排列
+    """
+    df = pd.read_excel(input_data) if isinstance(input_data, str) else pd.DataFrame(input_data)
+
+    id_col = next((col for col in SERIES_ID_COLS if col in df.columns), None)
+    if id_col is None:
+        raise ValueError("未找到序列编号列，请包含 '序列编号' 或 'SKU'")
+    date_col = next((col for col in ['录入日期', '日期', 'date', '时间'] if col in df.columns), None)
+    if date_col is None:
+        raise ValueError("未找到日期列，请包含 '日期' 或 '录入日期'")
+    demand_col = next((col for col in ['需求数量', '当日需求数量', '订单数量', '当日订单数'] if col in df.columns), None)
+    if demand_col is None:
+        raise ValueError("未找到需求数量列，请包含 '需求数量' 或 '当日需求数量'")
+
+    ids = df[id_col].astype(str).to_numpy()
+    dates = pd.to_datetime(df[date_col]).to_numpy(dtype="datetime64[ns]")
+    values = pd.to_numeric(df[demand_col], errors="coerce").to_numpy(dtype=np.float64)
+
+    # 序列内按日期排序（稳定排序保持同日行的原始顺序）
+    order = np.argsort(dates, kind="stable")
+    ids, dates, values = ids[order], dates[order], values[order]
+    groups = pd.Series(ids).groupby(ids, sort=False).indices
+    first_seen = pd.unique(df[id_col].astype(str))
+    return [(sid, dates[groups[sid]], values[groups[sid]]) for sid in first_seen]
+
+
+def _forecast_series(series_id, dates, values, algorithm, forecast_days=None, return_model=True):
+    """
+    单条序列拟合与预测（在子进程中运行，失败不抛出而是返回失败记录）
+    ARIMA 在子进程内固定用逐步搜索，避免进程池嵌套
+    返回:
+        (record, fit_model)，record 含序列编号、状态、预测结果、样本数与耗时；
+        return_model=False 时不回传模型（省去序列化开销）
+    """
+    started = time.perf_counter()
+    record = {"seriesId": series_id, "nObs": int(len(values))}
+    try:
+        if np.isnan(values).any():
+            raise ValueError("需求数量存在缺失或非数值")
+        ts = pd.Series(values, index=pd.DatetimeIndex(dates), name='需求数量')
+        fitter = FITTERS.get(algorithm)
+        if fitter is None:
+            raise _unsupported(algorithm)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fit_model = fitter(ts)
+        forecast_result = _forecast_from_model(ts, fit_model, forecast_days)
+        record.update({"status": "success", "forecastResult": forecast_result})
+    except Exception as e:
+        fit_model = None
+        record.update({"status": "fail", "msg": str(e)})
+    record["elapsedS"] = round(time.perf_counter() - started, 4)
+    return record, fit_model if return_model else None
+
+
+def _forecast_from_model(ts, fit_model, forecast_days=None):
+    """已拟合模型 -> 预测结果表格（默认预测天数 = 样本天数 / 2）"""
+    if forecast_days is None:
+        forecast_days = max(1, math.floor(len(ts) / 2))
+    forecast_index = pd.date_range(start=ts.index[-1] + timedelta(days=1), periods=forecast_days, freq='D')
+    forecast = _forecast_values(fit_model, forecast_days)
+    return [{"日期": str(d.date()), "预测需求": float(v)} for d, v in zip(forecast_index, forecast)]
+
+
+def iter_batch_forecast(input_data, algorithm, forecast_days=None, parallel=True, use_cache=True, progress=None):
+    """
+    多序列批量预测，按完成顺序逐条生成结果
+    -------------------------------------------------------
+    1. 长表一次拆分为各序列（split_series）
+    2. 命中模型缓存的序列在主进程直接预测
+    3. 其余序列分发到进程池并行拟合，完成一条返回一条；拟合好的模型写回缓存
+    单条序列失败只影响该序列，结果中 status='fail' 并带失败原因
+    参数:
+        parallel: False 时在当前进程逐条拟合（调试用；单核机器上自动如此）
+        progress: 进度回调 progress(已完成序列比例, 说明)（可选），每条序列完成时调用
+    生成:
+        record: {seriesId, status, forecastResult | msg, nObs, elapsedS, cached}
+    """
+    series = split_series(input_data)
+    records = _iter_batch_records(series, algorithm, forecast_days, parallel, use_cache)
+    try:
+        for done, record in enumerate(records, 1):
+            if progress is not None:
+                progress(done / len(series), f"已完成 {done} / {len(series)} 条序列")
+            yield record
+    finally:
+        # 回调抛出异常（如任务取消）或调用方提前结束时，立即取消尚未开始的序列
+        records.close()
+
+
+def _iter_batch_records(series, algorithm, forecast_days, parallel, use_cache):
+    """iter_batch_forecast 的主体：缓存命中的序列先返回，其余按完成顺序返回"""
+    pending = []
+    for series_id, dates, values in series:
+        key = None
+        if use_cache and not np.isnan(values).any():
+            ts = pd.Series(values, index=pd.DatetimeIndex(dates), name='需求数量')
+            key = _cache_key(ts, algorithm)  # 批量预测按默认参数拟合
+            fit_model = get_cached_model(key)
+            if fit_model is not None:
+                started = time.perf_counter()
+                yield {"seriesId": series_id, "nObs": int(len(values)), "status": "success",
+                       "forecastResult": _forecast_from_model(ts, fit_model, forecast_days),
+                       "elapsedS": round(time.perf_counter() - started, 4), "cached": True}
+                continue
+        pending.append((key, series_id, dates, values))
+    print(f"📦 批量预测: 缓存命中后待拟合 {len(pending)} 条序列")
+
+    def _finish(key, record, fit_model):
+        if key is not None and fit_model is not None:
+            put_cached_model(key, fit_model)
+        record["cached"] = False
+        return record
+
+    # 单核或只剩一条序列时进程池只有额外开销
+    if not parallel or len(pending) <= 1 or (os.cpu_count() or 1) == 1:
+        for key, series_id, dates, values in pending:
+            yield _finish(key, *_forecast_series(series_id, dates, values, algorithm, forecast_days, key is not None))
+        return
+
+    pool = _get_search_pool()
+    futures = {
+        pool.submit(_forecast_series, series_id, dates, values, algorithm, forecast_days, key is not None):
+            (key, series_id, len(values))
+        for key, series_id, dates, values in pending
+    }
+    try:
+        for future in as_completed(futures):
+            key, series_id, n_obs = futures[future]
+            try:
+                record, fit_model = future.result()
+            except Exception as e:
+                # 子进程异常退出等，记为该序列失败
+                record = {"seriesId": series_id, "nObs": n_obs, "status": "fail", "msg": str(e), "elapsedS": None}
+                fit_model = None
+            yield _finish(key, record, fit_model)
+    finally:
+        # 客户端断开时取消尚未开始的序列
+        for future in futures:
+            future.cancel()
+
+
+#增量更新（在线模型）
+def _model_series(fit_model):
+    """已拟合模型所用的历史序列（带日期索引；append 后的模型可能保存为单列 DataFrame）"""
+    if isinstance(fit_model, dict):
+        return pd.Series(fit_model["y"], index=pd.DatetimeIndex(fit_model["index"]), name='需求数量')
+    endog = fit_model.model.data.orig_endog
+    if isinstance(endog, pd.DataFrame):
+        endog = endog.iloc[:, 0]
+    return endog.rename('需求数量')
+
+
+def _baseline_residuals(fit_model, algorithm):
+    """样本内残差；ARIMA 跳过差分 / 初始化造成的前几期大残差（轻量引擎的残差已不含初始化期）"""
+    if isinstance(fit_model, dict):
+        return np.asarray(fit_model["resid"], dtype=np.float64)
+    resid = np.asarray(fit_model.resid, dtype=np.float64)
+    if algorithm == 'arima':
+        p, d, q = fit_model.model.order
+        resid = resid[min(d + max(p, q), len(resid) // 4):]
+    return resid
+
 
-    return forecast_result, chart_data, fit_model
\ No newline at end of file
+def _ljung_box_pvalue(resid):
+    """残差 Ljung-Box 白噪声检验 p 值（样本过少时返回 1）"""
+    from statsmodels.stats.diagnostic import acorr_ljungbox
+
+    if len(resid) < 10:
+        return 1.0
+    lags = max(1, min(10, len(resid) // 5))
+    return float(acorr_ljungbox(resid, lags=[lags], return_df=True)["lb_pvalue"].iloc[0])
+
+
+def model_metadata(fit_model, algorithm):
+    """
+    模型元信息（随模型一起存入注册表）
+    last_date / n_obs: 已吸收的最后日期与样本数
+    resid_std / lb_pvalue: 样本内残差均方根与 Ljung-Box p 值，作为增量更新时残差诊断的基线
+    """
+    ts = _model_series(fit_model)
+    resid = _baseline_residuals(fit_model, algorithm)
+    meta = {
+        "algorithm": algorithm,
+        "last_date": str(ts.index[-1].date()),
+        "n_obs": int(len(ts)),
+        "resid_std": float(np.sqrt(np.mean(resid ** 2))) if len(resid) else 0.0,
+        "lb_pvalue": _ljung_box_pvalue(resid),
+    }
+    if algorithm == 'arima':
+        meta["order"] = [int(v) for v in fit_model.model.order]
+    elif algorithm in FAST_ALGORITHMS:
+        meta["params"] = fit_model["params"]
+        meta["seasonal_periods"] = fit_model.get("seasonal_periods")
+    else:
+        model = fit_model.model
+        meta["spec"] = {
+            "trend": model.trend,
+            "damped_trend": bool(model.damped_trend),
+            "seasonal": model.seasonal,
+            "seasonal_periods": model.seasonal_periods,
+        }
+    return meta
+
+
+def update_forecast_model(fit_model, meta, input_data, forecast_days=None, degrade_ratio=2.0, min_pvalue=0.01):
+    """
+    在已拟合模型上追加新观测并预测
+    -------------------------------------------------------
+    - ARIMA：append(refit=False) 沿用原参数，只更新状态，不重新搜索阶数
+    - 指数平滑：沿用原模型结构（趋势 / 季节 / 周期）在扩展序列上重新估计参数，不重新判断周期
+    - 轻量引擎：沿用原平滑参数与周期，在扩展序列上重新递推（不重新选参）
+    残差诊断：新观测上的一步预测残差均方根超过基线的 degrade_ratio 倍，
+    或原本通过 Ljung-Box 白噪声检验的残差在追加后 p 值低于 min_pvalue（出现新的自相关）时，
+    视为模型退化，在完整序列上重新完整拟合（auto_arima / 周期判断）
+    参数:
+        fit_model: 注册表中的已拟合模型
+        meta: 模型元信息（model_metadata）
+        input_data: 新观测（Excel 文件路径 或 list[dict]），早于模型最后日期的行忽略
+        forecast_days: 预测天数（默认 = 样本天数 / 2）
+    返回:
+        forecast_result, chart_data, new_model, new_meta, diagnostics
+    """
+    algorithm = meta["algorithm"]
+    history = _model_series(fit_model)
+    new_ts = preprocess_time_series(input_data)['需求数量']
+    new_ts = new_ts[new_ts.index > history.index[-1]]
+    if new_ts.empty:
+        raise ValueError(f"没有晚于模型最后日期（{meta['last_date']}）的新观测")
+
+    reason = None
+    try:
+        if algorithm == 'arima':
+            updated = fit_model.append(new_ts, refit=False)
+        elif algorithm in FAST_ALGORITHMS:
+            full = pd.concat([history, new_ts])
+            updated = fit_fast(full.to_numpy(dtype=np.float64), algorithm, params=meta["params"],
+                               seasonal_periods=meta.get("seasonal_periods"))
+            updated.update(index=full.index.to_numpy(dtype="datetime64[ns]"), y=full.to_numpy(dtype=np.float64))
+        else:
+            from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+            full = pd.concat([history, new_ts])
+            updated = ExponentialSmoothing(full, **meta["spec"]).fit()
+    except Exception as e:
+        # 例如日期不连续，无法在原模型上追加
+        updated = None
+        reason = f"无法增量追加：{e}"
+
+    diagnostics = {"新增观测数": int(len(new_ts)), "基线残差标准差": round(meta["resid_std"], 4)}
+    if updated is not None:
+        resid = _baseline_residuals(updated, algorithm)
+        new_resid = (updated["resid"] if isinstance(updated, dict) else np.asarray(updated.resid, dtype=np.float64))[-len(new_ts):]
+        rmse = float(np.sqrt(np.mean(new_resid ** 2)))
+        pvalue = _ljung_box_pvalue(resid)
+        diagnostics.update({"新观测残差RMSE": round(rmse, 4), "Ljung-Box p值": round(pvalue, 4)})
+        if rmse > degrade_ratio * meta["resid_std"]:
+            reason = f"新观测残差 RMSE 超过基线 {degrade_ratio} 倍"
+        elif pvalue < min_pvalue <= meta.get("lb_pvalue", 1.0):
+            reason = "残差出现显著自相关"
+
+    if reason is not None:
+        print(f"🔁 模型退化（{reason}），重新完整拟合")
+        full = pd.concat([history, new_ts])
+        # 重新搜索时以原阶数热启动
+        updated = FITTERS[algorithm](full, start_order=meta.get("order"))
+    else:
+        print(f"⚡ 增量更新完成：追加 {len(new_ts)} 个观测，未重新搜索")
+    diagnostics["重新拟合"] = reason is not None
+    diagnostics["重新拟合原因"] = reason
+
+    ts = _model_series(updated)
+    if forecast_days is None:
+        forecast_days = max(1, math.floor(len(ts) / 2))
+    forecast_index = pd.date_range(start=ts.index[-1] + timedelta(days=1), periods=forecast_days, freq='D')
+    forecast_series = pd.Series(_forecast_values(updated, forecast_days), index=forecast_index)
+    forecast_result, chart_data = _format_forecast(ts, forecast_series)
+    return forecast_result, chart_data, updated, model_metadata(updated, algorithm), diagnostics
@@ -0,0 +1,198 @@
+# 轻量预测引擎：只依赖 NumPy 的 SES / Holt / 加法 Holt-Winters / Croston
+# 平滑递推按时间步循环、在参数网格上向量化：一次递推同时得到网格中所有参数组合的一步预测误差，
+# 取误差平方和最小的参数，不调用数值优化器。适合短序列与大批量 SKU 的快速预测。
+# 模型为 dict（参数 + 末期状态 + 样本内残差），可 pickle 缓存 / 存入模型注册表。
+import numpy as np
+
+FAST_ALGORITHMS = ("ses", "holt", "holt_winters", "croston")
+
+# 参数网格
+_ALPHAS = np.round(np.arange(0.05, 1.0, 0.05), 2)
+_HOLT_ALPHAS = np.round(np.arange(0.1, 1.0, 0.1), 2)
+_BETAS = np.array([0.01, 0.05, 0.1, 0.2, 0.3, 0.5])
+_GAMMAS = np.array([0.01, 0.05, 0.1, 0.3, 0.5])
+_CROSTON_ALPHAS = np.round(np.arange(0.05, 0.55, 0.05), 2)
+
+
+def _grid(*axes):
+    """参数笛卡尔积，返回每个参数的一维数组"""
+    mesh = np.meshgrid(*axes, indexing="ij")
+    return [m.ravel() for m in mesh]
+
+
+def _fixed(params, *names):
+    """固定参数（增量更新时沿用上次拟合的参数）转为长度 1 的网格"""
+    return [np.array([float(params[k])]) for k in names]
+
+
+def seasonal_period(y, max_lag=30):
+    """按自相关峰值判断季节周期，至少为 2（先去掉线性趋势，避免趋势使滞后 1 的自相关最大）"""
+    n = len(y)
+    max_lag = min(max_lag, n // 2)
+    if max_lag < 1:
+        return 2
+    t = np.arange(n, dtype=np.float64)
+    x = y - np.polyval(np.polyfit(t, y, 1), t)
+    denom = float(x @ x)
+    if denom == 0:
+        return 2
+    acf = np.array([x[k:] @ x[:-k] for k in range(1, max_lag + 1)]) / denom
+    return max(2, int(np.argmax(acf)) + 1)
+
+
+def _ses(y, params=None):
+    """简单指数平滑：l_t = l_{t-1} + alpha * e_t"""
+    (alpha,) = _fixed(params, "alpha") if params else (_ALPHAS,)
+    level = np.full(len(alpha), y[0])
+    errors = np.empty((len(y) - 1, len(alpha)))
+    for t in range(1, len(y)):
+        e = y[t] - level
+        errors[t - 1] = e
+        level = level + alpha * e
+    best = int(np.argmin((errors ** 2).sum(axis=0))) if len(errors) else 0
+    return {
+        "params": {"alpha": float(alpha[best])},
+        "level": float(level[best]), "trend": 0.0,
+        "resid": errors[:, best],
+    }
+
+
+def _holt(y, params=None):
+    """Holt 线性趋势（误差修正形式）：l += b + alpha*e，b += alpha*beta*e"""
+    alpha, beta = _fixed(params, "alpha", "beta") if params else _grid(_HOLT_ALPHAS, _BETAS)
+    level = np.full(len(alpha), y[0])
+    trend = np.full(len(alpha), y[1] - y[0])
+    errors = np.empty((len(y) - 1, len(alpha)))
+    for t in range(1, len(y)):
+        e = y[t] - (level + trend)
+        errors[t - 1] = e
+        level = level + trend + alpha * e
+        trend = trend + alpha * beta * e
+    best = int(np.argmin((errors ** 2).sum(axis=0)))
+    return {
+        "params": {"alpha": float(alpha[best]), "beta": float(beta[best])},
+        "level": float(level[best]), "trend": float(trend[best]),
+        "resid": errors[:, best],
+    }
+
+
+def _holt_winters(y, params=None, seasonal_periods=None):
+    """
+    加法 Holt-Winters（误差修正形式）
+    初始化：首个周期均值为水平，前两个周期均值之差 / m 为趋势，首个周期去水平为季节项
+    样本不足两个完整周期（或指定周期为 0）时退化为 Holt，此时模型 seasonal_periods = 0
+    """
+    m = seasonal_period(y) if seasonal_periods is None else int(seasonal_periods)
+    if m < 2 or len(y) < 2 * m + 1:
+        model = _holt(y, params)
+        model["seasonal_periods"] = 0
+        return model
+    names = ("alpha", "beta", "gamma")
+    alpha, beta, gamma = _fixed(params, *names) if params else _grid(_HOLT_ALPHAS, _BETAS, _GAMMAS)
+    g = len(alpha)
+
+    level0 = y[:m].mean()
+    trend0 = (y[m:2 * m].mean() - level0) / m
+    # 状态对应第 m-1 期末：水平推进到首个周期末尾
+    level = np.full(g, level0 + (m - 1) / 2 * trend0)
+    trend = np.full(g, trend0)
+    season = np.repeat((y[:m] - (level0 + (np.arange(m) - (m - 1) / 2) * trend0))[:, None], g, axis=1)
+
+    errors = np.empty((len(y) - m, g))
+    for t in range(m, len(y)):
+        s = season[t % m]
+        e = y[t] - (level + trend + s)
+        errors[t - m] = e
+        level = level + trend + alpha * e
+        trend = trend + alpha * beta * e
+        season[t % m] = s + gamma * (1 - alpha) * e
+    best = int(np.argmin((errors ** 2).sum(axis=0)))
+    return {
+        "params": {name: float(v[best]) for name, v in zip(names, (alpha, beta, gamma))},
+        "level": float(level[best]), "trend": float(trend[best]),
+        "season": season[:, best].tolist(), "seasonal_periods": m,
+        "resid": errors[:, best],
+    }
+
+
+def _croston(y, params=None):
+    """
+    Croston 间歇需求：需求量 z 与需求间隔 p 分别做指数平滑，每期预测 z / p
+    只在有需求的时期更新；误差为各期实际需求与当期预测之差
+    """
+    (alpha,) = _fixed(params, "alpha") if params else (_CROSTON_ALPHAS,)
+    nonzero = np.flatnonzero(y > 0)
+    if not len(nonzero):
+        return {"params": {"alpha": float(alpha[0])}, "level": 0.0, "trend": 0.0,
+                "demand": 0.0, "interval": 1.0, "resid": y[1:].copy()}
+
+    first = nonzero[0]
+    demand = np.full(len(alpha), y[first])
+    interval = np.full(len(alpha), float(first + 1))
+    errors = np.empty((len(y) - first - 1, len(alpha)))
+    since = 0
+    for t in range(first + 1, len(y)):
+        since += 1
+        errors[t - first - 1] = y[t] - demand / interval
+        if y[t] > 0:
+            demand = demand + alpha * (y[t] - demand)
+            interval = interval + alpha * (since - interval)
+            since = 0
+    best = int(np.argmin((errors ** 2).sum(axis=0))) if len(errors) else 0
+    return {
+        "params": {"alpha": float(alpha[best])},
+        "level": float(demand[best] / interval[best]), "trend": 0.0,
+        "demand": float(demand[best]), "interval": float(interval[best]),
+        "resid": errors[:, best],
+    }
+
+
+def fit_fast(values, algorithm, params=None, seasonal_periods=None):
+    """
+    拟合轻量模型
+    -------------------------------------------------------
+    参数:
+        values: 一维需求序列（按日期升序）
+        algorithm: 'ses' / 'holt' / 'holt_winters' / 'croston'
+        params: 固定平滑参数（如上次拟合结果），为空时在网格上选误差平方和最小者
+        seasonal_periods: Holt-Winters 季节周期，为 None 时按自相关自动判断
+    返回:
+        model: dict，含 algorithm、params、末期状态、样本内一步预测残差 resid、n_obs
+    """
+    y = np.asarray(values, dtype=np.float64)
+    if y.ndim != 1 or np.isnan(y).any():
+        raise ValueError("需求序列需为一维且不含缺失值")
+    if algorithm == "ses":
+        if len(y) < 2:
+            raise ValueError("简单指数平滑至少需要 2 个观测")
+        model = _ses(y, params)
+    elif algorithm == "holt":
+        if len(y) < 3:
+            raise ValueError("Holt 至少需要 3 个观测")
+        model = _holt(y, params)
+    elif algorithm == "holt_winters":
+        if len(y) < 3:
+            raise ValueError("Holt-Winters 至少需要 3 个观测")
+        model = _holt_winters(y, params, seasonal_periods)
+    elif algorithm == "croston":
+        if len(y) < 2:
+            raise ValueError("Croston 至少需要 2 个观测")
+        if (y < 0).any():
+            raise ValueError("Croston 要求需求非负")
+        model = _croston(y, params)
+    else:
+        raise ValueError(f"Unsupported algorithm: 请选择 {', '.join(FAST_ALGORITHMS)}")
+    model["algorithm"] = algorithm
+    model["n_obs"] = int(len(y))
+    return model
+
+
+def fast_forecast(model, steps):
+    """由末期状态外推 steps 期预测"""
+    h = np.arange(1, int(steps) + 1, dtype=np.float64)
+    forecast = model["level"] + h * model["trend"]
+    m = model.get("seasonal_periods") or 0
+    if m:
+        season = np.asarray(model["season"])
+        forecast = forecast + season[(model["n_obs"] + np.arange(int(steps))) % m]
+    return forecast
@@ -0,0 +1,176 @@
+import os
+import time
+import warnings
+
+import numpy as np
+
+from backend.ml_models.demand_forecast import (
+    FITTERS, FAST_ALGORITHMS, _forecast_values, _get_search_pool, preprocess_time_series
+)
+from backend.ml_models.fast_forecast import fit_fast
+
+DEFAULT_CANDIDATES = ["ses", "holt", "holt_winters", "exp_smooth", "arima"]
+
+
+def rolling_origins(n, horizon, folds, min_train=14):
+    """
+    滚动预测起点：最后 folds 个不重叠的 horizon 长度窗口，起点之前的数据为训练集
+    训练集不足 min_train 的起点被丢弃
+    """
+    origins = [n - horizon * (folds - k) for k in range(folds)]
+    return [o for o in origins if o >= min_train]
+
+
+def _advance_model(algorithm, fit_model, train):
+    """
+    沿用已拟合模型的参数，把状态推进到更长的训练集末尾（不重新选参）
+    - ARIMA：append 新观测（refit=False）
+    - 指数平滑：已知初始状态 + 固定平滑参数重新递推
+    - 轻量引擎：固定参数与周期重新递推
+    """
+    if algorithm == "arima":
+        n_old = int(fit_model.nobs)
+        return fit_model.append(train.iloc[n_old:], refit=False)
+    if algorithm in FAST_ALGORITHMS:
+        return fit_fast(train.to_numpy(dtype=np.float64), algorithm, params=fit_model["params"],
+                        seasonal_periods=fit_model.get("seasonal_periods"))
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    model, params = fit_model.model, fit_model.params
+    known = {"initial_level": params["initial_level"]}
+    smoothing = {"smoothing_level": params["smoothing_level"]}
+    if model.trend:
+        known["initial_trend"] = params["initial_trend"]
+        smoothing["smoothing_trend"] = params["smoothing_trend"]
+    if model.seasonal:
+        known["initial_seasonal"] = params["initial_seasons"]
+        smoothing["smoothing_seasonal"] = params["smoothing_seasonal"]
+    if model.damped_trend:
+        smoothing["damping_trend"] = params["damping_trend"]
+    return ExponentialSmoothing(
+        train, trend=model.trend, damped_trend=model.damped_trend, seasonal=model.seasonal,
+        seasonal_periods=model.seasonal_periods, initialization_method="known", **known
+    ).fit(optimized=False, **smoothing)
+
+
+def _backtest_step(algorithm, fit_model, train, horizon, reuse=True):
+    """
+    单个候选在一个起点上的预测（在子进程中运行）
+    fit_model 为空（首个起点）或 reuse=False 时完整拟合，否则在上一起点的模型上推进状态
+    返回:
+        (fit_model, forecast, elapsed, error)，失败时 fit_model / forecast 为 None 并带错误信息
+    """
+    started = time.perf_counter()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            if fit_model is None or not reuse:
+                fit_model = FITTERS[algorithm](train)
+            else:
+                fit_model = _advance_model(algorithm, fit_model, train)
+            forecast = _forecast_values(fit_model, horizon)
+        return fit_model, forecast, time.perf_counter() - started, None
+    except Exception as e:
+        return None, None, time.perf_counter() - started, str(e)
+
+
+def _score(errors, actuals, scale):
+    """MAPE（%，跳过实际值为 0 的点）与 MASE（MAE / 训练集一步朴素预测 MAE）"""
+    errors, actuals = np.abs(np.concatenate(errors)), np.concatenate(actuals)
+    nonzero = actuals != 0
+    mape = float(np.mean(errors[nonzero] / np.abs(actuals[nonzero])) * 100) if nonzero.any() else None
+    return mape, float(errors.mean() / scale)
+
+
+def backtest_models(input_data, candidates=None, horizon=7, folds=4, parallel=True, reuse=True,
+                    abandon_ratio=1.5, min_folds=2, progress=None):
+    """
+    滚动起点回测与模型选择
+    -------------------------------------------------------
+    在最后 folds 个长度为 horizon 的窗口上逐起点回测各候选模型：
+    - 每一轮（一个起点）内，未淘汰的候选在进程池中并行拟合 / 推进
+    - reuse=True 时只在首个起点完整拟合，之后沿用参数推进状态（ARIMA append、
+      指数平滑与轻量引擎固定参数重新递推），选择代价远低于逐折重新拟合
+    - 完成 min_folds 轮后，累计 MASE 超过当前最优 abandon_ratio 倍的候选提前淘汰
+    参数:
+        input_data: Excel 文件路径 或 list[dict]（日期 + 需求数量）
+        candidates: 候选算法列表，默认 ses / holt / holt_winters / exp_smooth / arima；
+                    序列超过 30% 为零需求时自动加入 croston
+        progress: 进度回调 progress(已完成折数比例, 说明)（可选），每完成一个起点调用一次
+    返回:
+        result: {"最优模型", "预测步长", "折数", "候选": [{algorithm, MAPE(%), MASE, 完成折数, 状态, 耗时(s)}]}
+    """
+    ts = preprocess_time_series(input_data)['需求数量'].astype(np.float64)
+    values = ts.to_numpy()
+    if candidates is None:
+        candidates = list(DEFAULT_CANDIDATES)
+        if np.mean(values == 0) > 0.3:
+            candidates.append("croston")
+    unknown = [c for c in candidates if c not in FITTERS]
+    if unknown:
+        raise ValueError(f"Unsupported algorithm: {', '.join(unknown)}，请选择 {' / '.join(FITTERS)}")
+
+    horizon, folds = int(horizon), int(folds)
+    origins = rolling_origins(len(ts), horizon, folds)
+    if not origins:
+        raise ValueError(f"样本过少：{len(ts)} 天不足以做 {horizon} 天步长的回测")
+    # MASE 分母：首个训练集上一步朴素预测的平均绝对误差（训练集为常数时退化为 MAE）
+    scale = float(np.mean(np.abs(np.diff(values[:origins[0]]))))
+    scale = scale if scale > 0 else 1.0
+
+    state = {
+        c: {"model": None, "errors": [], "actuals": [], "elapsed": 0.0, "status": "完成", "mape": None, "mase": None}
+        for c in candidates
+    }
+    pool = _get_search_pool() if parallel and (os.cpu_count() or 1) > 1 and len(candidates) > 1 else None
+
+    for k, origin in enumerate(origins):
+        active = [c for c in candidates if state[c]["status"] == "完成"]
+        if not active:
+            break
+        train, actual = ts.iloc[:origin], values[origin:origin + horizon]
+        if pool is not None:
+            futures = {c: pool.submit(_backtest_step, c, state[c]["model"], train, horizon, reuse) for c in active}
+            outcomes = {c: f.result() for c, f in futures.items()}
+        else:
+            outcomes = {c: _backtest_step(c, state[c]["model"], train, horizon, reuse) for c in active}
+
+        for c, (fit_model, forecast, elapsed, error) in outcomes.items():
+            s = state[c]
+            s["elapsed"] += elapsed
+            if error is not None:
+                s["status"], s["model"] = f"失败：{error}", None
+                continue
+            s["model"] = fit_model
+            s["errors"].append(forecast - actual)
+            s["actuals"].append(actual)
+            s["mape"], s["mase"] = _score(s["errors"], s["actuals"], scale)
+
+        # 提前淘汰明显更差的候选
+        running = {c: state[c]["mase"] for c in active if state[c]["status"] == "完成"}
+        if k + 1 >= min_folds and k + 1 < len(origins) and running:
+            best = min(running.values())
+            for c, mase in running.items():
+                if mase > abandon_ratio * best:
+                    state[c]["status"] = "提前淘汰"
+                    state[c]["model"] = None
+        if progress is not None:
+            progress((k + 1) / len(origins), f"回测第 {k + 1} / {len(origins)} 折完成")
+
+    report = []
+    for c in candidates:
+        s = state[c]
+        report.append({
+            "algorithm": c,
+            "MAPE(%)": None if s["mape"] is None else round(s["mape"], 3),
+            "MASE": None if s["mase"] is None else round(s["mase"], 4),
+            "完成折数": len(s["errors"]),
+            "状态": s["status"],
+            "耗时(s)": round(s["elapsed"], 3),
+        })
+    finished = [r for r in report if r["状态"] == "完成" and r["完成折数"] == len(origins)]
+    if not finished:
+        raise ValueError("所有候选模型回测失败")
+    winner = min(finished, key=lambda r: r["MASE"])["algorithm"]
+    print(f"🏁 回测完成：{len(origins)} 折 × {horizon} 天，最优模型 {winner}")
+    return {"最优模型": winner, "预测步长": horizon, "折数": len(origins), "候选": report}
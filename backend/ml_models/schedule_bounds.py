@@ -0,0 +1,94 @@
+import numpy as np
+
+_MAX_MASK_SETS = 4096  # 可选机器集合种类超过该数量时只用单机与全体机器两类负载下界
+
+
+def _order_work(problem):
+    """每个订单的总加工时间（订单内工序必须顺序加工）"""
+    proc = problem["proc_times"]
+    if not len(proc):
+        return np.zeros(0)
+    return np.add.reduceat(proc, problem["order_ptr"][:-1])
+
+
+def critical_path_bound(problem):
+    """关键路径下界：任一订单的工序只能顺序加工，完工时间不早于其总加工时间"""
+    work = _order_work(problem)
+    return float(work.max()) if len(work) else 0.0
+
+
+def machine_load_bound(problem):
+    """
+    机器负载下界
+    -------------------------------------------------------
+    对任一机器集合 S，可选机器全部落在 S 内的工序只能在 S 上加工，
+    因此完工时间 >= 这些工序总加工时间 / |S|。
+    S 取所有出现过的可选机器集合以及全体机器（机器数 <= 62 时用位掩码向量化计算）
+    """
+    proc = problem["proc_times"]
+    n_machines = len(problem["machines"])
+    if not len(proc) or not n_machines:
+        return 0.0
+    bound = float(proc.sum()) / n_machines
+    if n_machines > 62:
+        return bound
+
+    bits = np.left_shift(np.int64(1), problem["elig_idx"].astype(np.int64))
+    masks = np.bitwise_or.reduceat(bits, problem["elig_ptr"][:-1])
+    sets, inverse = np.unique(masks, return_inverse=True)
+    load = np.bincount(inverse.reshape(-1), weights=proc, minlength=len(sets))
+    if len(sets) > _MAX_MASK_SETS:
+        # 集合种类过多时只看单机集合
+        singles = (sets & (sets - 1)) == 0
+        return max(bound, float(load[singles].max())) if singles.any() else bound
+    # contained[s, u]: 集合 u 是集合 s 的子集
+    contained = (sets[None, :] & ~sets[:, None]) == 0
+    sizes = np.asarray([bin(int(s)).count("1") for s in sets], dtype=np.float64)
+    return max(bound, float((contained @ load / sizes).max()))
+
+
+def makespan_lower_bound(problem):
+    """完工时间下界：关键路径与机器负载下界取大者"""
+    return max(critical_path_bound(problem), machine_load_bound(problem))
+
+
+def tardiness_lower_bound(problem, tardiness_weight=1):
+    """
+    延迟惩罚下界（两种松弛取大者）
+    -------------------------------------------------------
+    1. 无限机器松弛：工序完成时间不早于订单内到它为止的累计加工时间
+    2. 单机聚合松弛：M 台机器合并为一台 M 倍速机器，第 k 个完成的工序
+       不早于最短 k 道工序加工时间之和 / M；完成时间与交期都升序配对时
+       延迟之和最小，因此该配对给出下界
+    """
+    proc = problem["proc_times"]
+    n_machines = len(problem["machines"])
+    if not len(proc) or not n_machines:
+        return 0.0
+    due = problem["due_limits"][problem["op_order"]]
+    w = tardiness_weight
+
+    order_ptr = problem["order_ptr"]
+    prefix = np.cumsum(proc)
+    chain = prefix - np.repeat(prefix[order_ptr[:-1]] - proc[order_ptr[:-1]], np.diff(order_ptr))
+    chain_bound = float(np.sum(w * np.maximum(0, chain - due)))
+
+    completion = np.cumsum(np.sort(proc)) / n_machines
+    pooled_bound = float(np.sum(w * np.maximum(0, completion - np.sort(due))))
+    return max(chain_bound, pooled_bound)
+
+
+def optimality_gap(value, bound):
+    """相对下界的差距（%）：(value - bound) / value，value 为 0 时差距为 0"""
+    if value <= 0:
+        return 0.0
+    return max(0.0, (value - bound) / value * 100)
+
+
+def stop_threshold(bound, gap_tolerance):
+    """差距不超过 gap_tolerance（比例，如 0.05）时的目标值上限，用作提前停止信号"""
+    if gap_tolerance is None:
+        return None
+    if gap_tolerance >= 1:
+        return float("inf")
+    return bound / (1 - gap_tolerance)
@@ -0,0 +1,246 @@
+import math
+import random
+import time
+
+import numpy as np
+
+PROGRESS_EVERY = 512  # 局部搜索每隔多少次迭代回调一次进度
+TARDY_TRIES = 8  # 选取延迟工序时的最大抽样次数
+
+
+def _decode_all(seq, proc, pred, elig_ptr, elig_idx, n_machines, stride, product, setup):
+    """
+    按派工序列做列表调度（与 EDD / 贪心 / 批量的排产规则一致）：
+    每道工序在就绪后选择完成时间最早的可选机器（计入换线时间）
+    同时每隔 stride 个位置记录一次机器可用时间与最后加工产品，作为增量评估的检查点
+    """
+    n_ops = len(proc)
+    machine = [-1] * n_ops
+    start = [0.0] * n_ops
+    finish = [0.0] * n_ops
+    available = [0.0] * n_machines
+    last = [-1] * n_machines
+    checkpoints = []
+
+    for p, op in enumerate(seq):
+        if p % stride == 0:
+            checkpoints.append((available[:], last[:]))
+        pr = pred[op]
+        ready = finish[pr] if pr >= 0 else 0
+        pt = proc[op]
+        row = product[op]
+        best_m, best_s, best_f = -1, 0.0, float("inf")
+        for k in range(elig_ptr[op], elig_ptr[op + 1]):
+            m = elig_idx[k]
+            s = max(available[m] + setup[last[m]][row], ready)
+            f = s + pt
+            if f < best_f:
+                best_m, best_s, best_f = m, s, f
+        available[best_m] = best_f
+        last[best_m] = row
+        machine[op], start[op], finish[op] = best_m, best_s, best_f
+
+    if len(seq) % stride == 0:
+        checkpoints.append((available[:], last[:]))
+    return machine, start, finish, checkpoints
+
+
+def improve_schedule(problem, schedule, time_budget_ms, tardiness_weight=1, seed=None, max_iterations=None,
+                     stop_penalty=None, setup_matrix=None, progress=None):
+    """
+    局部搜索改进（模拟退火，带时间预算的随时可停算法）
+    -------------------------------------------------------
+    在工序派工序列上做交换移动（保持订单内工序顺序），解码规则与构造算法相同。
+    每次移动只从交换位置开始增量重排：
+      - 交换位置之前的机器状态由检查点 + 少量回放得到，不从头解码
+      - 向后重排直到机器可用时间、最后加工产品与原序列重新一致、且没有待传播的完成时间变化，
+        之后的工序不受影响，直接用差值更新延迟惩罚
+    参数:
+        problem: 列式排产问题
+        schedule: 构造算法得到的初始排产（EDD / 贪心 / 批量等）
+        time_budget_ms: 时间预算（毫秒），用完即返回当前最优解
+        tardiness_weight: 延迟惩罚权重
+        seed: 随机种子（可复现）
+        max_iterations: 最大迭代次数（可选）
+        stop_penalty: 达到该延迟惩罚即提前停止（可选，例如下界）
+        setup_matrix: 产品换线时间矩阵（可选，None 表示不计换线）
+        progress: 进度回调 progress(已用时间占预算比例, 说明)（可选），每 PROGRESS_EVERY 次迭代调用一次
+    返回:
+        best_schedule: 搜索到的最优排产（不差于初始排产）
+        info: 基线惩罚、最优惩罚、改进量、迭代次数等
+    """
+    started_at = time.perf_counter()
+    deadline = started_at + time_budget_ms / 1000.0
+    rng = random.Random(seed)
+
+    proc = problem["proc_times"].tolist()
+    elig_ptr = problem["elig_ptr"].tolist()
+    elig_idx = problem["elig_idx"].tolist()
+    order_ptr = problem["order_ptr"]
+    op_order = problem["op_order"]
+    n_ops = len(proc)
+    n_machines = len(problem["machines"])
+    n_products = len(problem["product_names"])
+    product = problem["product_codes"][op_order].tolist()
+    # 补一行一列 0：机器尚未加工任何产品（-1）时无换线
+    padded = np.zeros((n_products + 1, n_products + 1), dtype=np.float64)
+    if setup_matrix is not None:
+        padded[:n_products, :n_products] = setup_matrix
+    setup = padded.tolist()
+
+    # 前序 / 后续工序（同一订单内相邻）
+    is_first = np.zeros(n_ops, dtype=bool)
+    is_first[order_ptr[:-1][np.diff(order_ptr) > 0]] = True
+    pred = np.where(is_first, -1, np.arange(n_ops) - 1).tolist()
+    has_succ = np.r_[~is_first[1:], False].tolist() if n_ops else []
+    order_of = op_order.tolist()
+    due = problem["due_limits"][op_order].tolist()
+    w = tardiness_weight
+
+    baseline_penalty = float(np.sum(w * np.maximum(0, schedule["finish"] - problem["due_limits"][op_order])))
+    info = {
+        "baseline_penalty": baseline_penalty,
+        "best_penalty": baseline_penalty,
+        "improvement": 0.0,
+        "iterations": 0,
+        "accepted": 0,
+    }
+    if n_ops < 2:
+        return schedule, info
+
+    stride = max(16, int(math.sqrt(n_ops)))
+    seq = schedule["seq"].tolist()
+    machine, start, finish, checkpoints = _decode_all(seq, proc, pred, elig_ptr, elig_idx, n_machines, stride,
+                                                      product, setup)
+    pen = [w * (f - d) if f > d else 0.0 for f, d in zip(finish, due)]
+    current = sum(pen)
+
+    best_penalty = current
+    current_is_best = True
+    best_snapshot = None
+
+    window = min(n_ops - 1, 12)
+    temperature0 = w * float(np.mean(problem["proc_times"])) if n_ops else 1.0
+    iterations = accepted = 0
+
+    def state_before(pos):
+        c = pos // stride
+        av, lp = checkpoints[c][0][:], checkpoints[c][1][:]
+        for p in range(c * stride, pos):
+            op = seq[p]
+            av[machine[op]] = finish[op]
+            lp[machine[op]] = product[op]
+        return av, lp
+
+    while True:
+        now = time.perf_counter()
+        if now >= deadline or (max_iterations is not None and iterations >= max_iterations):
+            break
+        if stop_penalty is not None and best_penalty <= stop_penalty:
+            break
+        iterations += 1
+        if progress is not None and iterations % PROGRESS_EVERY == 0:
+            progress(min(1.0, (now - started_at) * 1000.0 / max(time_budget_ms, 1e-9)), f"局部搜索迭代 {iterations} 次")
+
+        # 选择移动：一半概率把延迟工序往前换，一半随机交换
+        # 延迟工序用拒绝抽样选取（抽到即为延迟工序中的均匀抽样），延迟工序很少时至多抽 TARDY_TRIES 次后退化为随机交换
+        j = rng.randrange(1, n_ops)
+        if rng.random() < 0.5:
+            for _ in range(TARDY_TRIES - 1):
+                if pen[seq[j]] > 0:
+                    break
+                j = rng.randrange(1, n_ops)
+        i = max(0, j - rng.randint(1, window))
+        a, b = seq[i], seq[j]
+        oa, ob = order_of[a], order_of[b]
+        if oa == ob or any(order_of[seq[p]] in (oa, ob) for p in range(i + 1, j)):
+            continue
+
+        # 增量重排
+        old_av, old_lp = state_before(i)
+        new_av, new_lp = old_av[:], old_lp[:]
+        new_vals = {}
+        ck_updates = {}
+        pending = set()
+        delta = 0.0
+        p = i
+        while p < n_ops:
+            op_old = seq[p]
+            old_av[machine[op_old]] = finish[op_old]
+            old_lp[machine[op_old]] = product[op_old]
+
+            op = b if p == i else a if p == j else op_old
+            pr = pred[op]
+            if pr >= 0:
+                v = new_vals.get(pr)
+                ready = v[2] if v is not None else finish[pr]
+            else:
+                ready = 0
+            pt = proc[op]
+            row = product[op]
+            best_m, best_s, best_f = -1, 0.0, float("inf")
+            for k in range(elig_ptr[op], elig_ptr[op + 1]):
+                m = elig_idx[k]
+                s = max(new_av[m] + setup[new_lp[m]][row], ready)
+                f = s + pt
+                if f < best_f:
+                    best_m, best_s, best_f = m, s, f
+            new_av[best_m] = best_f
+            new_lp[best_m] = row
+            new_vals[op] = (best_m, best_s, best_f)
+            pending.discard(op)
+            if best_f != finish[op] and has_succ[op]:
+                pending.add(op + 1)
+            d = due[op]
+            delta += (w * (best_f - d) if best_f > d else 0.0) - pen[op]
+
+            p += 1
+            if p % stride == 0:
+                ck_updates[p // stride] = (new_av[:], new_lp[:])
+            if p > j and not pending and new_av == old_av and new_lp == old_lp:
+                break
+
+        # 模拟退火接受准则
+        if delta > 1e-12:
+            temperature = temperature0 * max(1e-3, 1.0 - (now - started_at) * 1000.0 / max(time_budget_ms, 1e-9))
+            if rng.random() >= math.exp(-delta / temperature):
+                continue
+            if current_is_best:
+                best_snapshot = (seq[:], machine[:], start[:], finish[:])
+                current_is_best = False
+
+        accepted += 1
+        seq[i], seq[j] = b, a
+        for op, (m, s, f) in new_vals.items():
+            machine[op], start[op], finish[op] = m, s, f
+            d = due[op]
+            pen[op] = w * (f - d) if f > d else 0.0
+        for c, av in ck_updates.items():
+            if c < len(checkpoints):
+                checkpoints[c] = av
+        current += delta
+        if current < best_penalty - 1e-9:
+            best_penalty = current
+            current_is_best = True
+
+    if not current_is_best:
+        seq, machine, start, finish = best_snapshot
+
+    best = {
+        "seq": np.asarray(seq, dtype=np.int64),
+        "machine": np.asarray(machine, dtype=np.int32),
+        "start": np.asarray(start, dtype=np.float64),
+        "finish": np.asarray(finish, dtype=np.float64),
+    }
+    best_penalty = float(np.sum(w * np.maximum(0, best["finish"] - problem["due_limits"][op_order])))
+    if best_penalty >= baseline_penalty:
+        best, best_penalty = schedule, baseline_penalty
+
+    info.update({
+        "best_penalty": best_penalty,
+        "improvement": baseline_penalty - best_penalty,
+        "iterations": iterations,
+        "accepted": accepted,
+        "elapsed_ms": (time.perf_counter() - started_at) * 1000.0,
+    })
+    return best, info
@@ -1,25 +1,34 @@
 import pandas as pd
-from datetime import datetime, timedelta
-from copy import deepcopy
-from dateutil import parser
-import re
+import numpy as np
+import bisect
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
-def run_schedule_from_excel(input_data, algorithm='edd', batch_size=50, tardiness_weight=1, switch_default=1):
-    """
-    通用排产调度函数（支持多工序、多机器、顺序加工、批量优化）
-    -------------------------------------------------------
-    参数:
-        input_data: Excel 文件路径 或 list[dict]
-        algorithm: 'edd' / 'greedy' / 'batch'
-        batch_size: 批量调度时的批大小
-        tardiness_weight: 延迟惩罚权重
-        switch_default: 默认切换时间（小时）
-    返回:
-        results: 排产结果表格（list[dict]）
-        metrics: 总延迟惩罚、平均延迟惩罚
-    """
+from backend.ml_models.schedule_bounds import (
+    makespan_lower_bound, optimality_gap, stop_threshold, tardiness_lower_bound
+)
+from backend.ml_models.schedule_search import improve_schedule
 
-    #数据读取
+
+REQUIRED_COLUMNS = ["订单编号", "工序编号", "产品型号", "到达日期", "最晚交付日期"]
+
+
+class ScheduleInputError(ValueError):
+    """排产输入校验失败，errors 中包含全部问题（而不只是第一条）"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        preview = "；".join(errors[:10])
+        more = f"（另有 {len(errors) - 10} 条）" if len(errors) > 10 else ""
+        super().__init__(f"排产输入数据校验失败，共 {len(errors)} 条问题：{preview}{more}")
+
+
+def load_schedule_input(input_data):
+    """读取排产输入：Excel 文件路径 或 list[dict]"""
     if isinstance(input_data, str):
         df = pd.read_excel(input_data)
     elif isinstance(input_data, list):
@@ -29,267 +38,1236 @@ def run_schedule_from_excel(input_data, algorithm='edd', batch_size=50, tardines
 
     print(f"📂 读取数据条数: {len(df)}")
     print(f"🧮 数据列: {list(df.columns)}")
+    return df
+
+
+def _row_errors(mask, row_no, order_col, reason):
+    """把布尔掩码命中的行转换为错误描述"""
+    return [f"第{r}行 订单 {o}: {reason}" for r, o in zip(row_no[mask].tolist(), order_col[mask].tolist())]
+
+
+def _parse_machine_sets(machine_col, available_machines=None):
+    """
+    批量解析“分配机器”列并生成 CSR 可选机器数组
+    -------------------------------------------------------
+    只对不同的机器串做一次 split / strip / explode，机器名用排序后的
+    下标编码（intern），再按行展开为 CSR；空串表示可用任意机器。
+    返回: machines, elig_ptr, elig_idx, 可选机器数
+    """
+    text = machine_col.where(machine_col.notna(), "").astype(str)
+    str_codes, uniques = pd.factorize(text, sort=False)
+
+    tokens = pd.Series(uniques, dtype=object).str.split(",").explode().str.strip()
+    tokens = tokens[tokens.notna() & (tokens != "")]
+
+    if available_machines is None:
+        machines = sorted(tokens.unique().tolist())
+    else:
+        machines = sorted({str(m).strip() for m in available_machines if str(m).strip()})
+        # 不可用机器直接从可选集合中剔除
+        tokens = tokens[tokens.isin(machines)]
+    machine_arr = np.asarray(machines, dtype=object)
+
+    token_uid = tokens.index.to_numpy(dtype=np.int64)
+    token_mid = np.searchsorted(machine_arr, tokens.to_numpy(dtype=object)).astype(np.int32)
+    u_counts = np.bincount(token_uid, minlength=len(uniques))
+
+    # 未填写机器的机器串 -> 全部机器（若原本填写但全部不可用，则保持为空，交由校验报错）
+    declared = pd.Series(uniques, dtype=object).str.strip().ne("").to_numpy()
+    fill_all = ~declared
+    u_counts_all = np.where(fill_all, len(machines), u_counts)
+    u_ptr = np.zeros(len(uniques) + 1, dtype=np.int64)
+    np.cumsum(u_counts_all, out=u_ptr[1:])
+    u_idx = np.empty(int(u_ptr[-1]), dtype=np.int32)
+    explicit_pos = np.repeat(u_ptr[:-1] - np.r_[0, np.cumsum(u_counts)[:-1]], u_counts) + np.arange(len(token_mid))
+    u_idx[explicit_pos] = token_mid
+    for uid in np.flatnonzero(fill_all & (len(machines) > 0)).tolist():
+        u_idx[u_ptr[uid]:u_ptr[uid + 1]] = np.arange(len(machines), dtype=np.int32)
+
+    # 按行展开
+    counts = u_counts_all[str_codes]
+    elig_ptr = np.zeros(len(str_codes) + 1, dtype=np.int64)
+    np.cumsum(counts, out=elig_ptr[1:])
+    within = np.arange(int(elig_ptr[-1]), dtype=np.int64) - np.repeat(elig_ptr[:-1], counts)
+    elig_idx = u_idx[np.repeat(u_ptr[:-1][str_codes], counts) + within]
+    return machines, elig_ptr, elig_idx, counts
+
+
+def build_schedule_problem(df, available_machines=None):
+    """
+    构建列式排产问题（订单 / 工序 / 机器全部以数组表示）
+    -------------------------------------------------------
+    全部预处理均为批量 pandas / NumPy 操作，不逐行解析；
+    校验问题统一收集后以 ScheduleInputError 一次性抛出。
+    参数:
+        df: 原始订单工序表
+        available_machines: 可用机器列表（可选，默认取表中出现的全部机器）
+    返回:
+        problem: dict
+            order_ids    (n_orders,)    订单编号（按编号排序）
+            products     (n_orders,)    订单产品型号
+            product_codes (n_orders,)   产品型号编码（下标对应 product_names）
+            product_names list[str]     产品型号名称
+            entry_dates  (n_orders,)    到达日期 datetime64[ns]
+            due_dates    (n_orders,)    最晚交付日期 datetime64[ns]
+            due_limits   (n_orders,)    交付时限（小时，相对到达日期）
+            order_ptr    (n_orders+1,)  订单 i 的工序为 [order_ptr[i], order_ptr[i+1])
+            op_order     (n_ops,)       工序所属订单下标
+            op_no        (n_ops,)       工序编号
+            proc_times   (n_ops,)       加工时间（小时）
+            elig_ptr     (n_ops+1,)     CSR：工序 j 的可选机器为 elig_idx[elig_ptr[j]:elig_ptr[j+1]]
+            elig_idx     (nnz,)         可选机器下标（保持表格中的书写顺序）
+            machines     list[str]      机器名称，下标即机器编号
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ScheduleInputError([f"缺少必要列: {c}" for c in missing])
+
+    errors = []
+    row_no = np.arange(1, len(df) + 1)
+    order_col = df["订单编号"].reset_index(drop=True)
+
+    #订单编号 / 工序编号
+    no_order = order_col.isna().to_numpy() | order_col.astype(str).str.strip().eq("").to_numpy()
+    errors += _row_errors(no_order, row_no, order_col, "订单编号为空")
+    op_no = pd.to_numeric(df["工序编号"], errors="coerce").to_numpy(dtype=np.float64)
+    bad_op_no = np.isnan(op_no) | (op_no != np.round(op_no))
+    errors += _row_errors(bad_op_no, row_no, order_col, "工序编号无效")
+
+    #加工时间（缺列时默认 1 小时）
+    if "加工时间(h)" in df.columns:
+        proc_times = pd.to_numeric(df["加工时间(h)"], errors="coerce").to_numpy(dtype=np.float64)
+    else:
+        proc_times = np.ones(len(df), dtype=np.float64)
+    bad_time = ~np.isfinite(proc_times) | (proc_times < 0)
+    errors += _row_errors(bad_time, row_no, order_col, "加工时间(h)无效")
+
+    #机器集合与可选机器
+    machine_col = df["分配机器"] if "分配机器" in df.columns else pd.Series([""] * len(df), dtype=object)
+    machines, elig_ptr, elig_idx, elig_counts = _parse_machine_sets(machine_col.reset_index(drop=True), available_machines)
+    print("🛠 系统识别机器集合:", machines)
+    errors += _row_errors(elig_counts == 0, row_no, order_col, "没有可用机器")
+
+    #按订单、工序排序（订单顺序与 groupby 一致）
+    valid = ~(no_order | bad_op_no)
+    order_codes, order_ids = pd.factorize(order_col.where(valid), sort=True)
+    dup = pd.DataFrame({"o": order_codes, "p": op_no}).duplicated(keep="first").to_numpy() & valid
+    errors += _row_errors(dup, row_no, order_col, "工序编号重复")
+
+    rows = np.lexsort((op_no, order_codes))
+    rows = rows[valid[rows]]
+    order_codes = order_codes[rows]
+    n_orders = len(order_ids)
+    order_ptr = np.zeros(n_orders + 1, dtype=np.int64)
+    np.cumsum(np.bincount(order_codes, minlength=n_orders), out=order_ptr[1:])
+    first_rows = rows[order_ptr[:-1]]
+
+    #时间列标准化：只转换每个订单的首行；两列分别解析（pandas 按首个值推断格式，两列格式可以不同）
+    entry_dates, due_dates = (
+        pd.to_datetime(df[col].reset_index(drop=True).iloc[first_rows], errors="coerce").to_numpy(dtype="datetime64[ns]")
+        for col in ("到达日期", "最晚交付日期")
+    )
+    bad_date = np.isnat(entry_dates) | np.isnat(due_dates)
+    errors += _row_errors(bad_date, row_no[first_rows], order_col.iloc[first_rows].reset_index(drop=True), "到达日期或最晚交付日期无效")
+
+    if errors:
+        raise ScheduleInputError(errors)
+
+    due_limits = (due_dates - entry_dates) / np.timedelta64(1, "h")
+    products = df["产品型号"].reset_index(drop=True).astype(str).to_numpy(dtype=object)[first_rows]
+    product_codes, product_names = pd.factorize(products, sort=True)
+
+    # 按排序后的工序顺序重排 CSR
+    counts = np.diff(elig_ptr)[rows]
+    new_ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_ptr[1:])
+    within = np.arange(int(new_ptr[-1]), dtype=np.int64) - np.repeat(new_ptr[:-1], counts)
+    elig_idx = elig_idx[np.repeat(elig_ptr[:-1][rows], counts) + within]
+
+    return {
+        "order_ids": np.asarray(order_ids, dtype=object),
+        "products": products,
+        "product_codes": product_codes.astype(np.int64),
+        "product_names": list(product_names),
+        "entry_dates": entry_dates,
+        "due_dates": due_dates,
+        "due_limits": due_limits.astype(np.float64),
+        "order_ptr": order_ptr,
+        "op_order": order_codes.astype(np.int32),
+        "op_no": op_no[rows].astype(np.int64),
+        "proc_times": proc_times[rows],
+        "elig_ptr": new_ptr,
+        "elig_idx": elig_idx.astype(np.int32),
+        "machines": machines,
+    }
+
+
+def new_machines_state(problem):
+    """机器状态：可用时间与最近加工产品（-1 表示空闲）"""
+    n_machines = len(problem["machines"])
+    return {
+        "available_time": np.zeros(n_machines, dtype=np.float64),
+        "last_product": np.full(n_machines, -1, dtype=np.int64),
+    }
+
+
+def _new_schedule(n_ops):
+    return {
+        "seq": [],
+        "machine": [-1] * n_ops,
+        "start": [0.0] * n_ops,
+        "finish": [0.0] * n_ops,
+    }
+
+
+def _finalize_schedule(schedule):
+    """把调度过程中的 Python 列表转换为数组"""
+    return {
+        "seq": np.asarray(schedule["seq"], dtype=np.int64),
+        "machine": np.asarray(schedule["machine"], dtype=np.int32),
+        "start": np.asarray(schedule["start"], dtype=np.float64),
+        "finish": np.asarray(schedule["finish"], dtype=np.float64),
+    }
+
+
+#换线（产品切换）时间矩阵
+SETUP_SHEET = "换线时间"
+SETUP_COLUMNS = ["前产品型号", "后产品型号", "换线时间(h)"]
+
+
+def load_setup_table(input_data):
+    """从排产工作簿中读取换线时间表（工作表“换线时间”），不存在时返回 None"""
+    if not isinstance(input_data, str):
+        return None
+    with pd.ExcelFile(input_data) as xls:
+        if SETUP_SHEET not in xls.sheet_names:
+            return None
+        return xls.parse(SETUP_SHEET)
+
+
+def build_setup_matrix(problem, setup_table=None, switch_default=1):
+    """
+    按产品对构建顺序相关的换线时间矩阵
+    -------------------------------------------------------
+    参数:
+        problem: 列式排产问题（使用其中的产品编码）
+        setup_table: 换线时间表（DataFrame 或 list[dict]，列为 前产品型号 / 后产品型号 / 换线时间(h)），
+                     表中未列出的产品对使用 switch_default
+        switch_default: 默认换线时间（小时）
+    返回:
+        setup: (P, P) 矩阵，setup[a, b] 为产品 a 切换到产品 b 的换线时间，对角线为 0
+    """
+    names = problem["product_names"]
+    setup = np.full((len(names), len(names)), float(switch_default), dtype=np.float64)
+
+    if setup_table is not None:
+        table = pd.DataFrame(setup_table)
+        missing = [c for c in SETUP_COLUMNS if c not in table.columns]
+        if missing:
+            raise ScheduleInputError([f"换线时间表缺少必要列: {c}" for c in missing])
+        hours = pd.to_numeric(table["换线时间(h)"], errors="coerce").to_numpy(dtype=np.float64)
+        bad = ~np.isfinite(hours) | (hours < 0)
+        if bad.any():
+            raise ScheduleInputError([f"换线时间表第{r}行: 换线时间(h)无效" for r in (np.flatnonzero(bad) + 1).tolist()])
+        name_arr = np.asarray(names, dtype=object)
+        src = np.searchsorted(name_arr, table["前产品型号"].astype(str).to_numpy(dtype=object))
+        dst = np.searchsorted(name_arr, table["后产品型号"].astype(str).to_numpy(dtype=object))
+        src_ok = (src < len(names)) & (name_arr[np.minimum(src, len(names) - 1)] == table["前产品型号"].astype(str).to_numpy(dtype=object)) \
+            if len(names) else np.zeros(len(table), dtype=bool)
+        dst_ok = (dst < len(names)) & (name_arr[np.minimum(dst, len(names) - 1)] == table["后产品型号"].astype(str).to_numpy(dtype=object)) \
+            if len(names) else np.zeros(len(table), dtype=bool)
+        # 本批订单中不存在的产品对直接忽略
+        ok = src_ok & dst_ok
+        setup[src[ok], dst[ok]] = hours[ok]
+
+    np.fill_diagonal(setup, 0)
+    return setup
+
+
+def _setup_rows(problem, setup_matrix):
+    """
+    换线矩阵转为嵌套列表供逐工序查表：额外补一行一列 0，
+    使“机器空闲（产品编码 -1）”与“后面没有工序”都落在 0 上
+    """
+    n_products = len(problem["product_names"])
+    padded = np.zeros((n_products + 1, n_products + 1), dtype=np.float64)
+    if setup_matrix is not None:
+        padded[:n_products, :n_products] = setup_matrix
+    return padded.tolist()
 
-    #时间列标准化
-    for col in ["到达日期", "最晚交付日期"]:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col])
-
-    #构建机器集合
-    all_machines = set()
-    for val in df.get("分配机器", []):
-        if pd.notna(val) and str(val).strip() != "":
-            all_machines.update([m.strip() for m in str(val).split(",")])
-    all_machines = sorted(list(all_machines))
-    print("🛠 系统识别机器集合:", all_machines)
-
-    machines_state = {m: {"available_time": 0, "last_product": None} for m in all_machines}
-    switch_time = {m: {m2: switch_default for m2 in all_machines if m2 != m} for m in all_machines}
-
-    #构造订单与工序结构
-    orders = []
-    grouped = df.groupby("订单编号")
-
-    for order_id, group in grouped:
-        group = group.sort_values(by="工序编号")
-        entry_date = group["到达日期"].iloc[0]
-        due_date = group["最晚交付日期"].iloc[0]
-        product = str(group["产品型号"].iloc[0])
-        quantity = 1  # 暂无“需求数量”，默认1
-
-        operations = []
-        for _, row in group.iterrows():
-            ops = [m.strip() for m in str(row.get("分配机器", "")).split(",") if m.strip()]
-            processing_time = float(row.get("加工时间(h)", 1))
-            operations.append({
-                "op_no": int(row["工序编号"]),
-                "op_id": f"{order_id}_工序{int(row['工序编号'])}",
-                "machines": ops if ops else all_machines,
-                "processing_time": processing_time
-            })
-
-        orders.append({
-            "order_id": order_id,
-            "product": product,
-            "entry_date": entry_date,
-            "due_date": due_date,
-            "quantity": quantity,
-            "operations": operations
-        })
-
-    print(f"✅ 构建完成，共 {len(orders)} 个订单。")
-
-    #核心 EDD 调度算法
-    def edd_multi_machine(orders, machines_state, switch_time, tardiness_weight):
-        schedule = []
-        sorted_orders = sorted(orders, key=lambda x: x["due_date"])  # EDD
-
-        for order in sorted_orders:
-            prev_finish = 0  # 控制同订单内工序顺序
-
-            for op in order["operations"]:
-                best_machine = None
-                best_start = None
-                best_finish = float("inf")
-
-                for m in op["machines"]:
-                    state = machines_state[m]
-                    available = state["available_time"]
-
-                    start_time = max(available, prev_finish)
-                    finish_time = start_time + op["processing_time"]
-
-                    if finish_time < best_finish:
-                        best_finish = finish_time
-                        best_machine = m
-                        best_start = start_time
-
-                if best_machine is None:
-                    raise ValueError(f"工序 {op['op_id']} 没有可用机器！")
-
-                # 更新状态
-                machines_state[best_machine]["available_time"] = best_finish
-                machines_state[best_machine]["last_product"] = order["product"]
-                prev_finish = best_finish
-
-                tardiness = max(0, (best_finish - (order["due_date"] - order["entry_date"]).total_seconds() / 3600))
-                penalty = tardiness_weight * tardiness
-
-                schedule.append({
-                    "order_id": order["order_id"],
-                    "product": order["product"],
-                    "op_id": op["op_id"],
-                    "machine": best_machine,
-                    "processing_time": op["processing_time"],
-                    "start_time_dt": order["entry_date"] + timedelta(hours=best_start),
-                    "finish_time_dt": order["entry_date"] + timedelta(hours=best_finish),
-                    "tardiness": tardiness,
-                    "penalty": penalty
-                })
-
-        total_penalty = sum(s["penalty"] for s in schedule)
-        return schedule, total_penalty
-
-    #Greedy 算法
-    def greedy_multi_machine(orders, machines_state, switch_time, tardiness_weight=1):
-        """
-        全局 SPT 贪心调度算法（考虑工序顺序依赖）
-        ---------------------------------------------------------
-        原理：
-          - 全局贪心：每次从当前可执行的工序池中选加工时间最短的任务
-          - 顺序约束：只有前序工序完成后，后续工序才能进入可执行池
-        """
-
-        schedule = []
-        total_penalty = 0.0
-
-        # 每个订单的当前可执行工序索引
-        order_progress = {o["order_id"]: 0 for o in orders}
-        order_finish_time = {o["order_id"]: 0.0 for o in orders}
-
-        # 初始可执行工序池（每个订单的第一个工序）
-        ready_ops = []
-        for order in orders:
-            op = order["operations"][0]
-            ready_ops.append({
-                "order_id": order["order_id"],
-                "product": order["product"],
-                "entry_date": order["entry_date"],
-                "due_date": order["due_date"],
-                "op_no": op["op_no"],
-                "op_id": op["op_id"],
-                "machines": op["machines"],
-                "processing_time": op["processing_time"]
-            })
-
-        # 循环直到所有工序完成
-        while ready_ops:
-            # 1️⃣ 选出当前加工时间最短的工序
-            ready_ops.sort(key=lambda x: x["processing_time"])
-            op = ready_ops.pop(0)
-
-            best_machine = None
+
+def _dispatch_orders(problem, order_seq, machines_state, schedule, setup_matrix=None):
+    """
+    按给定订单顺序逐个订单、逐道工序排产（EDD / 批量调度共用）
+    每道工序选择完成时间最早的可选机器（计入换线时间），同一订单内工序顺序加工
+    """
+    order_ptr = problem["order_ptr"].tolist()
+    proc_times = problem["proc_times"].tolist()
+    elig_ptr = problem["elig_ptr"].tolist()
+    elig_idx = problem["elig_idx"].tolist()
+    product_codes = problem["product_codes"].tolist()
+    setup = _setup_rows(problem, setup_matrix)
+    available = machines_state["available_time"].tolist()
+    last_product = machines_state["last_product"].tolist()
+
+    seq = schedule["seq"]
+    op_machine, op_start, op_finish = schedule["machine"], schedule["start"], schedule["finish"]
+
+    for o in order_seq:
+        prev_finish = 0  # 控制同订单内工序顺序
+        product = product_codes[o]
+        for op in range(order_ptr[o], order_ptr[o + 1]):
+            pt = proc_times[op]
+            best_machine = -1
             best_start = None
             best_finish = float("inf")
 
-            for m in op["machines"]:
-                state = machines_state[m]
-                available = state["available_time"]
-                last_prod = state["last_product"]
+            for k in range(elig_ptr[op], elig_ptr[op + 1]):
+                m = elig_idx[k]
+                start_time = max(available[m] + setup[last_product[m]][product], prev_finish)
+                finish_time = start_time + pt
+                if finish_time < best_finish:
+                    best_finish = finish_time
+                    best_machine = m
+                    best_start = start_time
+
+            if best_machine < 0:
+                raise ValueError(f"工序 {problem['order_ids'][o]}_工序{problem['op_no'][op]} 没有可用机器！")
+
+            # 更新状态
+            available[best_machine] = best_finish
+            last_product[best_machine] = product
+            prev_finish = best_finish
+
+            seq.append(op)
+            op_machine[op] = best_machine
+            op_start[op] = best_start
+            op_finish[op] = best_finish
+
+    machines_state["available_time"][:] = available
+    machines_state["last_product"][:] = last_product
+    return schedule
+
+
+#核心 EDD 调度算法
+def edd_multi_machine(problem, machines_state, setup_matrix=None, **_):
+    """按最晚交付日期排序订单后依次排产"""
+    order_seq = np.argsort(problem["due_dates"], kind="stable").tolist()
+    schedule = _new_schedule(len(problem["proc_times"]))
+    _dispatch_orders(problem, order_seq, machines_state, schedule, setup_matrix)
+    return _finalize_schedule(schedule)
+
+
+#Greedy 算法
+def greedy_multi_machine(problem, machines_state, setup_matrix=None, **_):
+    """
+    全局 SPT 贪心调度算法（考虑工序顺序依赖）
+    ---------------------------------------------------------
+    原理：
+      - 全局贪心：每次从当前可执行的工序池中选加工时间最短的任务
+      - 顺序约束：只有前序工序完成后，后续工序才能进入可执行池
+    实现：
+      - 可执行工序池使用最小堆，键为 (加工时间, 入池序号)，
+        入池序号保证同加工时间时先入池者先出，与稳定排序结果一致
+      - 订单的后续工序即下一个工序下标（order_ptr 偏移），整体复杂度 O(n log n)
+    """
+    order_ptr = problem["order_ptr"].tolist()
+    proc_times = problem["proc_times"].tolist()
+    elig_ptr = problem["elig_ptr"].tolist()
+    elig_idx = problem["elig_idx"].tolist()
+    op_order = problem["op_order"].tolist()
+    product_codes = problem["product_codes"].tolist()
+    setup = _setup_rows(problem, setup_matrix)
+    available = machines_state["available_time"].tolist()
+    last_product = machines_state["last_product"].tolist()
+
+    n_orders = len(order_ptr) - 1
+    schedule = _new_schedule(len(proc_times))
+    seq = schedule["seq"]
+    op_machine, op_start, op_finish = schedule["machine"], schedule["start"], schedule["finish"]
+    order_finish_time = [0.0] * n_orders
+
+    # 初始可执行工序池（每个订单的第一个工序）
+    # 堆元素: (加工时间, 入池序号, 工序下标)
+    counter = itertools.count()
+    ready_heap = [(proc_times[order_ptr[o]], next(counter), order_ptr[o]) for o in range(n_orders)]
+    heapq.heapify(ready_heap)
+
+    # 循环直到所有工序完成
+    while ready_heap:
+        # 1️⃣ 弹出当前加工时间最短的工序
+        pt, _, op = heapq.heappop(ready_heap)
+        o = op_order[op]
+        product = product_codes[o]
+
+        best_machine = -1
+        best_start = None
+        best_finish = float("inf")
+
+        for k in range(elig_ptr[op], elig_ptr[op + 1]):
+            m = elig_idx[k]
+
+            # 换线时间（按前后产品查表）
+            switch_t = setup[last_product[m]][product]
+
+            start_time = max(available[m] + switch_t, order_finish_time[o], 0)
+            finish_time = start_time + pt
+
+            if finish_time < best_finish:
+                best_finish = finish_time
+                best_machine = m
+                best_start = start_time
+
+        if best_machine < 0:
+            raise ValueError(f"工序 {problem['order_ids'][o]}_工序{problem['op_no'][op]} 没有可用机器！")
+
+        # 2️⃣ 更新机器与订单状态
+        available[best_machine] = best_finish
+        last_product[best_machine] = product
+        order_finish_time[o] = best_finish
+
+        # 3️⃣ 若该订单还有下一工序，则加入可执行池
+        if op + 1 < order_ptr[o + 1]:
+            heapq.heappush(ready_heap, (proc_times[op + 1], next(counter), op + 1))
+
+        seq.append(op)
+        op_machine[op] = best_machine
+        op_start[op] = best_start
+        op_finish[op] = best_finish
+
+    machines_state["available_time"][:] = available
+    machines_state["last_product"][:] = last_product
+    return _finalize_schedule(schedule)
+
+
+#批量调度优化
+def batch_schedule(problem, machines_state, batch_size=50, setup_matrix=None, **_):
+    """将订单按到达日期排序后分批，批内按 EDD 排产，机器状态在批间顺延"""
+    orders_sorted = np.argsort(problem["entry_dates"], kind="stable")
+    due_dates = problem["due_dates"]
+    order_seq = []
+    for i in range(0, len(orders_sorted), batch_size):
+        batch = orders_sorted[i:i + batch_size]
+        order_seq.extend(batch[np.argsort(due_dates[batch], kind="stable")].tolist())
+
+    schedule = _new_schedule(len(problem["proc_times"]))
+    _dispatch_orders(problem, order_seq, machines_state, schedule, setup_matrix)
+    return _finalize_schedule(schedule)
+
+
+#产品族批量（换线感知）
+def family_schedule(problem, machines_state, batch_size=50, setup_matrix=None, **_):
+    """
+    产品族批量调度
+    -------------------------------------------------------
+    同一产品型号的订单按交期排序后，每 batch_size 个订单组成一个生产批次（campaign），
+    批次按其中最早交期排序后依次排产；机器选择计入换线时间（setup_matrix），
+    同型号工序自然集中在已完成换线的机器上，从而减少换线次数与时长
+    """
+    products = problem["product_codes"]
+    due = problem["due_dates"]
+    # 先按产品、再按交期排序，得到每个产品内的 EDD 顺序
+    by_product = np.lexsort((np.arange(len(products)), due, products))
+    sorted_products = products[by_product]
+    rank_in_product = np.arange(len(by_product)) - np.searchsorted(sorted_products, sorted_products, side="left")
+    campaign = np.column_stack((sorted_products, rank_in_product // max(int(batch_size), 1)))
+    # 批次首单交期即批次内最早交期
+    campaign_key, campaign_id = np.unique(campaign, axis=0, return_inverse=True)
+    campaign_id = campaign_id.reshape(-1)
+    campaign_due = np.full(len(campaign_key), np.datetime64("NaT"), dtype=due.dtype)
+    first_in_campaign = np.r_[True, campaign_id[1:] != campaign_id[:-1]] if len(campaign_id) else np.zeros(0, dtype=bool)
+    campaign_due[campaign_id[first_in_campaign]] = due[by_product][first_in_campaign]
+    order_seq = by_product[np.lexsort((np.arange(len(by_product)), campaign_due[campaign_id]))].tolist()
+
+    schedule = _new_schedule(len(problem["proc_times"]))
+    _dispatch_orders(problem, order_seq, machines_state, schedule, setup_matrix)
+    return _finalize_schedule(schedule)
+
+
+#插空（回填）调度
+_GAP_BLOCK = 64  # 空隙索引分块大小
+
+
+def _new_timeline(free_from, min_gap, last_product=-1):
+    """
+    单台机器的空闲空隙索引
+    -------------------------------------------------------
+    空隙按时间有序存放在若干块中（每块至多 2*_GAP_BLOCK 个），
+    每块记录首个空隙起点与块内最大空隙长度：
+      - 二分定位起点所在的块与空隙 O(log n)
+      - 最大空隙不够长的块整块跳过，不逐个检查
+    每个空隙同时记录前后相邻工序的产品（-1 表示无），用于计算插入时的换线时间。
+    最后一个空隙为 [机器末尾, +inf)，短于 min_gap 的空隙永远放不下工序，直接丢弃
+    """
+    return {
+        "first": [free_from],
+        "starts": [[free_from]],
+        "ends": [[float("inf")]],
+        "prev": [[last_product]],
+        "next": [[-1]],
+        "max": [float("inf")],
+        "min_gap": min_gap,
+    }
+
+
+def new_timelines(machines_state, min_gap=0.0):
+    """每台机器一个空隙索引，available_time 之前视为已占用"""
+    return [_new_timeline(avail, min_gap, last)
+            for avail, last in zip(machines_state["available_time"].tolist(), machines_state["last_product"].tolist())]
+
+
+def timeline_from_busy(busy, min_gap=0.0):
+    """由已占用区间 [(start, finish, product), ...] 构建空隙索引（用于在已有计划上续排）"""
+    gaps = []
+    t, last = 0.0, -1
+    for start, finish, product in sorted(busy):
+        if start > t and start - t >= min_gap:
+            gaps.append((t, start, last, product))
+        if finish > t:
+            t, last = finish, product
+    gaps.append((t, float("inf"), last, -1))
+
+    timeline = _new_timeline(t, min_gap)
+    blocks = [gaps[i:i + _GAP_BLOCK] for i in range(0, len(gaps), _GAP_BLOCK)]
+    timeline["starts"] = [[g[0] for g in block] for block in blocks]
+    timeline["ends"] = [[g[1] for g in block] for block in blocks]
+    timeline["prev"] = [[g[2] for g in block] for block in blocks]
+    timeline["next"] = [[g[3] for g in block] for block in blocks]
+    timeline["first"] = [block[0][0] for block in blocks]
+    timeline["max"] = [max(g[1] - g[0] for g in block) for block in blocks]
+    return timeline
+
+
+def timeline_free_from(timeline):
+    """机器末尾空闲起点（即传统意义上的可用时间）"""
+    return timeline["starts"][-1][-1]
 
-                # 换线时间
-                switch_t = 0
-                if last_prod and last_prod != op["product"]:
-                    switch_t = switch_time.get(m, {}).get(m, 0) or 0
 
-                start_time = max(
-                    available + switch_t,
-                    order_finish_time[op["order_id"]],
-                    0
-                )
-                finish_time = start_time + op["processing_time"]
+def timeline_earliest_start(timeline, ready, duration, product=-1, setup=None):
+    """
+    查找不早于 ready、能放下 duration 的最早空隙，返回可开工时间
+    setup 为 _setup_rows 生成的换线表时，空隙还需容纳前换线与后换线时间
+    """
+    first, block_starts, block_ends, block_max = timeline["first"], timeline["starts"], timeline["ends"], timeline["max"]
+    b = bisect.bisect_right(first, ready) - 1
+    if b < 0:
+        b = 0
+    i0 = bisect.bisect_right(block_ends[b], ready)
+    for b in range(b, len(first)):
+        # 块内最长空隙都放不下（换线只会让可用长度更短），整块跳过
+        if block_max[b] < duration:
+            i0 = 0
+            continue
+        starts, ends = block_starts[b], block_ends[b]
+        prevs, nexts = timeline["prev"][b], timeline["next"][b]
+        for i in range(i0, len(starts)):
+            s = starts[i]
+            if setup is not None:
+                s += setup[prevs[i]][product]
+            if s < ready:
+                s = ready
+            tail = setup[product][nexts[i]] if setup is not None else 0
+            if s + duration + tail <= ends[i]:
+                return s
+        i0 = 0
+    return ready  # 不会到达：最后一个空隙无限长
+
+
+def timeline_reserve(timeline, start, finish, product=-1):
+    """占用 [start, finish)（必须位于某个空隙内），把该空隙拆成左右两段"""
+    if finish <= start:
+        return
+    first = timeline["first"]
+    b = bisect.bisect_right(first, start) - 1
+    starts, ends = timeline["starts"][b], timeline["ends"][b]
+    prevs, nexts = timeline["prev"][b], timeline["next"][b]
+    i = bisect.bisect_right(starts, start) - 1
+    gap_start, gap_end = starts[i], ends[i]
+    gap_prev, gap_next = prevs[i], nexts[i]
+    min_gap = timeline["min_gap"]
+
+    pieces = []
+    if start - gap_start >= min_gap and start > gap_start:
+        pieces.append((gap_start, start, gap_prev, product))
+    if gap_end - finish >= min_gap and gap_end > finish:
+        pieces.append((finish, gap_end, product, gap_next))
+    starts[i:i + 1] = [g[0] for g in pieces]
+    ends[i:i + 1] = [g[1] for g in pieces]
+    prevs[i:i + 1] = [g[2] for g in pieces]
+    nexts[i:i + 1] = [g[3] for g in pieces]
 
+    if not starts:
+        # 整块被占满（最后一块必有无限空隙，不会为空）
+        for key in ("starts", "ends", "prev", "next", "max", "first"):
+            del timeline[key][b]
+        return
+    if len(starts) > 2 * _GAP_BLOCK:
+        for key in ("starts", "ends", "prev", "next"):
+            block = timeline[key][b]
+            timeline[key][b:b + 1] = [block[:_GAP_BLOCK], block[_GAP_BLOCK:]]
+        first[b:b + 1] = [starts[0], starts[_GAP_BLOCK]]
+        timeline["max"][b:b + 1] = [0.0, 0.0]
+        for k in (b, b + 1):
+            timeline["max"][k] = max(e - s for s, e in zip(timeline["starts"][k], timeline["ends"][k]))
+        return
+    first[b] = starts[0]
+    # 只有被拆分的正是块内最长空隙时，块最大值才可能变化
+    if gap_end - gap_start >= timeline["max"][b] and gap_end != float("inf"):
+        timeline["max"][b] = max(e - s for s, e in zip(starts, ends))
+
+
+def _dispatch_orders_with_gaps(problem, order_seq, timelines, schedule, release=None, setup_matrix=None):
+    """
+    按订单顺序排产，每道工序可插入机器上更早的空闲空隙
+    release: 可选，每个订单首道工序的最早开工时间（小时）
+    setup_matrix: 可选，换线时间矩阵（插入空隙时需同时容纳前后换线）
+    """
+    order_ptr = problem["order_ptr"].tolist()
+    proc_times = problem["proc_times"].tolist()
+    elig_ptr = problem["elig_ptr"].tolist()
+    elig_idx = problem["elig_idx"].tolist()
+    product_codes = problem["product_codes"].tolist()
+    setup = _setup_rows(problem, setup_matrix) if setup_matrix is not None else None
+
+    seq = schedule["seq"]
+    op_machine, op_start, op_finish = schedule["machine"], schedule["start"], schedule["finish"]
+
+    for o in order_seq:
+        prev_finish = release[o] if release is not None else 0  # 控制同订单内工序顺序
+        product = product_codes[o]
+        for op in range(order_ptr[o], order_ptr[o + 1]):
+            pt = proc_times[op]
+            best_machine = -1
+            best_start = None
+            best_finish = float("inf")
+
+            for k in range(elig_ptr[op], elig_ptr[op + 1]):
+                m = elig_idx[k]
+                start_time = timeline_earliest_start(timelines[m], prev_finish, pt, product, setup)
+                finish_time = start_time + pt
                 if finish_time < best_finish:
                     best_finish = finish_time
                     best_machine = m
                     best_start = start_time
 
-            # 2️⃣ 更新机器与订单状态
-            machines_state[best_machine]["available_time"] = best_finish
-            machines_state[best_machine]["last_product"] = op["product"]
-            order_finish_time[op["order_id"]] = best_finish
-
-            # 3️⃣ 若该订单还有下一工序，则加入 ready_ops
-            order = next(o for o in orders if o["order_id"] == op["order_id"])
-            next_index = order_progress[op["order_id"]] + 1
-            order_progress[op["order_id"]] = next_index
-            if next_index < len(order["operations"]):
-                next_op = order["operations"][next_index]
-                ready_ops.append({
-                    "order_id": order["order_id"],
-                    "product": order["product"],
-                    "entry_date": order["entry_date"],
-                    "due_date": order["due_date"],
-                    "op_no": next_op["op_no"],
-                    "op_id": next_op["op_id"],
-                    "machines": next_op["machines"],
-                    "processing_time": next_op["processing_time"]
-                })
-
-            # 4️⃣ 计算延迟与惩罚
-            due_limit = (op["due_date"] - op["entry_date"]).total_seconds() / 3600
-            tardiness = max(0, best_finish - due_limit)
-            penalty = tardiness_weight * tardiness
-            total_penalty += penalty
-
-            # 5️⃣ 记录结果
-            schedule.append({
-                "order_id": op["order_id"],
-                "product": op["product"],
-                "op_id": op["op_id"],
-                "machine": best_machine,
-                "processing_time": op["processing_time"],
-                "start_time_dt": op["entry_date"] + timedelta(hours=best_start),
-                "finish_time_dt": op["entry_date"] + timedelta(hours=best_finish),
-                "tardiness": round(tardiness, 2),
-                "penalty": round(penalty, 2)
-            })
-
-        return schedule, total_penalty
-
-    #批量调度优化
-    def batch_schedule(orders, machines_state, switch_time, batch_size, tardiness_weight):
-        schedule = []
-        total_penalty = 0
-        # 将订单按到达日期排序，然后分批
-        orders_sorted = sorted(orders, key=lambda x: x["entry_date"])
-        batched_orders = [orders_sorted[i:i+batch_size] for i in range(0, len(orders_sorted), batch_size)]
-
-        for batch in batched_orders:
-            # 每批使用独立机器状态，避免批间干扰
-            machines_copy = deepcopy(machines_state)
-            s, p = edd_multi_machine(batch, machines_copy, switch_time, tardiness_weight)
-            schedule.extend(s)
-            total_penalty += p
-            # 更新全局机器状态，保证下一批正确衔接
-            for m in machines_state:
-                machines_state[m]["available_time"] = machines_copy[m]["available_time"]
-                machines_state[m]["last_product"] = machines_copy[m]["last_product"]
-
-        return schedule, total_penalty
+            if best_machine < 0:
+                raise ValueError(f"工序 {problem['order_ids'][o]}_工序{problem['op_no'][op]} 没有可用机器！")
+
+            timeline_reserve(timelines[best_machine], best_start, best_finish, product)
+            prev_finish = best_finish
+
+            seq.append(op)
+            op_machine[op] = best_machine
+            op_start[op] = best_start
+            op_finish[op] = best_finish
+
+    return schedule
+
+
+def _sync_machines_state(problem, schedule, timelines, machines_state):
+    """插空调度后回写机器可用时间与最后加工产品"""
+    machines_state["available_time"][:] = [timeline_free_from(t) for t in timelines]
+    seq = schedule["seq"]
+    if len(seq):
+        machine = schedule["machine"][seq]
+        finish = schedule["finish"][seq]
+        last = np.lexsort((finish, machine))
+        is_last = np.r_[machine[last][1:] != machine[last][:-1], True]
+        ops = seq[last[is_last]]
+        machines_state["last_product"][machine[last[is_last]]] = problem["product_codes"][problem["op_order"][ops]]
+
+
+def insertion_schedule(problem, machines_state, setup_matrix=None, **_):
+    """
+    EDD 顺序 + 插空调度
+    -------------------------------------------------------
+    与 EDD 相同按最晚交付日期依次排产，但每台机器维护空闲空隙索引，
+    工序可以放入因前序等待而留下的空闲空隙，而不只是排在机器末尾
+    """
+    order_seq = np.argsort(problem["due_dates"], kind="stable").tolist()
+    proc_times = problem["proc_times"]
+    min_gap = float(proc_times.min()) if len(proc_times) else 0.0
+    timelines = new_timelines(machines_state, min_gap)
+    schedule = _new_schedule(len(proc_times))
+    _dispatch_orders_with_gaps(problem, order_seq, timelines, schedule, setup_matrix=setup_matrix)
+    schedule = _finalize_schedule(schedule)
+    _sync_machines_state(problem, schedule, timelines, machines_state)
+    return schedule
+
+
+def changeover_summary(problem, schedule, setup_matrix):
+    """统计每台机器上相邻工序的产品切换：返回 (换线次数, 换线总时长)"""
+    seq = schedule["seq"]
+    if setup_matrix is None or len(seq) < 2:
+        return 0, 0.0
+    machine = schedule["machine"][seq]
+    order = np.lexsort((schedule["start"][seq], machine))
+    products = problem["product_codes"][problem["op_order"][seq[order]]]
+    same_machine = machine[order][1:] == machine[order][:-1]
+    prev_p, next_p = products[:-1][same_machine], products[1:][same_machine]
+    switched = prev_p != next_p
+    return int(switched.sum()), float(setup_matrix[prev_p[switched], next_p[switched]].sum())
+
+
+# 可用调度算法注册表
+SCHEDULERS = {
+    "edd": edd_multi_machine,
+    "greedy": greedy_multi_machine,
+    "batch": batch_schedule,
+    "insertion": insertion_schedule,
+    "family": family_schedule,
+}
+
+
+#算法组合：一次解析，并行运行全部已注册算法，取延迟惩罚最小者
+_portfolio_pool = None
+
+
+def _get_portfolio_pool():
+    """进程池按需创建并在请求间复用"""
+    global _portfolio_pool
+    if _portfolio_pool is None:
+        workers = max(1, min(len(SCHEDULERS), os.cpu_count() or 1))
+        _portfolio_pool = ProcessPoolExecutor(max_workers=workers)
+    return _portfolio_pool
+
+
+def _run_portfolio_member(name, problem, tardiness_weight, options):
+    """在子进程中运行单个算法，返回排产、总延迟惩罚与耗时（毫秒）"""
+    started = time.perf_counter()
+    schedule = SCHEDULERS[name](problem, new_machines_state(problem), **options)
+    _, penalty = evaluate_schedule(problem, schedule, tardiness_weight)
+    total_penalty = sum(penalty[schedule["seq"]].tolist())
+    return schedule, total_penalty, (time.perf_counter() - started) * 1000.0
+
+
+def _reaches(outcome, stop_penalty):
+    """算法结果是否已达到提前停止阈值"""
+    return stop_penalty is not None and not isinstance(outcome, Exception) and outcome[1] <= stop_penalty
+
+
+def run_portfolio(problem, tardiness_weight=1, parallel=True, stop_penalty=None, progress=None, member_options=None,
+                  **options):
+    """
+    算法组合调度
+    -------------------------------------------------------
+    同一份列式问题并行交给 SCHEDULERS 中的全部算法（含后续新增算法），
+    总耗时接近最慢的单个算法，而不是全部算法之和。
+    进程池不可用时自动退化为顺序执行。
+    stop_penalty: 可选，任一算法的延迟惩罚不超过该值时立即返回，
+                  尚未开始的算法取消（已在子进程中运行的算法结果被丢弃）
+    progress: 可选进度回调 progress(完成比例, 说明)，每个算法完成时调用；回调抛出异常（如任务取消）时
+              尚未开始的算法同样取消
+    member_options: 可选，{算法名: 参数}，覆盖该算法的公共参数（如只给 family 传换线矩阵）
+    返回:
+        best_schedule: 延迟惩罚最小的排产（并列时取注册顺序靠前者）
+        runs: 每个算法的 {算法, 总延迟惩罚, 耗时(ms)}，失败的算法带 错误 字段，提前停止未运行的带 跳过 字段
+    """
+    names = list(SCHEDULERS)
+    member_options = member_options or {}
+    options = {name: {**options, **member_options.get(name, {})} for name in names}
+    outcomes = {}
+    stopped = False
+
+    if parallel and len(names) > 1:
+        global _portfolio_pool
+        try:
+            pool = _get_portfolio_pool()
+            pending = {pool.submit(_run_portfolio_member, name, problem, tardiness_weight, options[name]): name
+                       for name in names}
+            try:
+                while pending and not stopped:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = pending.pop(future)
+                        try:
+                            outcomes[name] = future.result()
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            outcomes[name] = e
+                        stopped = stopped or _reaches(outcomes[name], stop_penalty)
+                        if progress is not None:
+                            progress(len(outcomes) / len(names), f"算法 {name} 完成")
+            finally:
+                for future in pending:
+                    future.cancel()
+        except (OSError, BrokenProcessPool) as e:
+            print("⚠️ 进程池不可用，改为顺序执行：", e)
+            _portfolio_pool = None
+            outcomes = {}
+            stopped = False
+
+    for name in names:
+        if stopped:
+            break
+        if name not in outcomes:
+            try:
+                outcomes[name] = _run_portfolio_member(name, problem, tardiness_weight, options[name])
+            except Exception as e:
+                outcomes[name] = e
+            stopped = _reaches(outcomes[name], stop_penalty)
+            if progress is not None:
+                progress(len(outcomes) / len(names), f"算法 {name} 完成")
+
+    runs = []
+    best_name, best_schedule, best_penalty = None, None, float("inf")
+    for name in names:
+        outcome = outcomes.get(name)
+        if outcome is None:
+            runs.append({"算法": name, "总延迟惩罚": None, "耗时(ms)": None, "跳过": "已达到下界差距容差，提前停止"})
+            continue
+        if isinstance(outcome, Exception):
+            runs.append({"算法": name, "总延迟惩罚": None, "耗时(ms)": None, "错误": str(outcome)})
+            continue
+        schedule, total_penalty, elapsed_ms = outcome
+        runs.append({"算法": name, "总延迟惩罚": round(total_penalty, 2), "耗时(ms)": round(elapsed_ms, 1)})
+        if total_penalty < best_penalty:
+            best_name, best_schedule, best_penalty = name, schedule, total_penalty
+
+    if best_schedule is None:
+        raise ValueError("算法组合中所有算法均运行失败：" + "；".join(r["错误"] for r in runs if "错误" in r))
+    print(f"🏁 算法组合最优: {best_name}（总延迟惩罚 {best_penalty:.2f}）")
+    return best_name, best_schedule, runs
+
+
+def evaluate_schedule(problem, schedule, tardiness_weight=1):
+    """按工序计算延迟（小时）与延迟惩罚，返回按工序下标排列的数组"""
+    due = problem["due_limits"][problem["op_order"]]
+    tardiness = np.maximum(0, schedule["finish"] - due)
+    penalty = tardiness_weight * tardiness
+    return tardiness, penalty
+
+
+def _format_rows(problem, schedule, seq, tardiness, penalty):
+    """把 seq 中的工序（按给定顺序）格式化为结果行（seq 为空时返回空列表）"""
+    if not len(seq):
+        return []
+    op_order = problem["op_order"][seq]
+    entry = problem["entry_dates"][op_order]
+
+    def _to_text(hours):
+        offset = np.rint(hours * 3.6e9).astype(np.int64).astype("timedelta64[us]")
+        text = np.datetime_as_string(entry + offset, unit="m")
+        return np.char.replace(text, "T", " ").tolist()
+
+    order_ids = problem["order_ids"][op_order].tolist()
+    op_nos = problem["op_no"][seq].tolist()
+    machine_names = np.asarray(problem["machines"], dtype=object)[schedule["machine"][seq]].tolist()
+
+    return [
+        {
+            "订单编号": order_id,
+            "产品型号": product,
+            "工序": f"{order_id}_工序{op_no}",
+            "机器": machine,
+            "开始时间": start,
+            "完成时间": finish,
+            "延迟(小时)": round(t, 2),
+            "延迟惩罚": round(p, 2)
+        }
+        for order_id, product, op_no, machine, start, finish, t, p in zip(
+            order_ids,
+            problem["products"][op_order].tolist(),
+            op_nos,
+            machine_names,
+            _to_text(schedule["start"][seq]),
+            _to_text(schedule["finish"][seq]),
+            tardiness[seq].tolist(),
+            penalty[seq].tolist(),
+        )
+    ]
+
+
+def schedule_kpis(machine_names, machine, start, finish, op_order, lateness):
+    """
+    排产 KPI（全部为向量化计算，不逐行循环）
+    -------------------------------------------------------
+    参数:
+        machine_names: 机器名称列表
+        machine / start / finish: 按工序对齐的机器下标、开始与完成时间（小时）
+        op_order: 工序所属订单编码（0..n_orders-1）
+        lateness: 工序完成时间 - 订单交期（小时，可为负）
+    返回:
+        最大完工时间、各机器利用率与空闲时间、延迟订单数、订单延迟分位数、平均在制订单数
+    """
+    if not len(finish):
+        return {}
+    n_machines = len(machine_names)
+    makespan = float(finish.max())
+    busy = np.bincount(machine, weights=finish - start, minlength=n_machines)
+    idle = makespan - busy
+    utilization = busy / makespan * 100 if makespan > 0 else np.zeros(n_machines)
+
+    #按订单归并：订单延迟取其工序延迟最大值，在制时长为首道工序开工到末道工序完工
+    by_order = np.argsort(op_order, kind="stable")
+    bounds = np.flatnonzero(np.r_[True, np.diff(op_order[by_order]) != 0])
+    order_lateness = np.maximum.reduceat(lateness[by_order], bounds)
+    order_span = np.maximum.reduceat(finish[by_order], bounds) - np.minimum.reduceat(start[by_order], bounds)
+    n_late = int((order_lateness > 0).sum())
+    p50, p90, p95 = np.percentile(order_lateness, [50, 90, 95]).tolist()
+
+    return {
+        "最大完工时间(h)": round(makespan, 2),
+        "机器利用率(%)": dict(zip(machine_names, np.round(utilization, 2).tolist())),
+        "平均机器利用率(%)": round(float(utilization.mean()), 2),
+        "机器空闲时间(h)": dict(zip(machine_names, np.round(idle, 2).tolist())),
+        "总空闲时间(h)": round(float(idle.sum()), 2),
+        "延迟订单数": n_late,
+        "延迟订单比例(%)": round(n_late / len(bounds) * 100, 2),
+        "订单延迟分位数(h)": {
+            "P50": round(p50, 2),
+            "P90": round(p90, 2),
+            "P95": round(p95, 2),
+            "最大": round(float(order_lateness.max()), 2),
+        },
+        # Little 定律：平均在制订单数 = 订单在制时长之和 / 计划总时长
+        "平均在制订单数": round(float(order_span.sum()) / makespan, 2) if makespan > 0 else 0,
+    }
+
+
+def format_schedule_results(problem, schedule, tardiness, penalty):
+    """按派工顺序输出排产结果表格（list[dict]）"""
+    return _format_rows(problem, schedule, schedule["seq"], tardiness, penalty)
+
+
+def iter_schedule_results(problem, schedule, tardiness, penalty, chunk_size=1000):
+    """
+    按派工顺序分块生成排产结果行（每块 list[dict]），用于流式输出：
+    任意时刻只格式化一块，不构建整张结果表
+    """
+    seq = schedule["seq"]
+    for lo in range(0, len(seq), chunk_size):
+        yield _format_rows(problem, schedule, seq[lo:lo + chunk_size], tardiness, penalty)
+
+
+def solve_schedule(input_data, algorithm='edd', batch_size=50, tardiness_weight=1, switch_default=1,
+                   available_machines=None, time_budget_ms=0, seed=None, setup_table=None, gap_tolerance=None,
+                   progress=None):
+    """
+    读取输入、运行排产算法并计算指标，但不生成结果表格
+    （参数同 run_schedule_from_excel）
+    返回:
+        run: {problem, schedule, tardiness, penalty, metrics, setup_matrix（未计入换线时为 None）}
+    """
+    #数据读取与批量预处理
+    df = load_schedule_input(input_data)
+
+    #构造列式订单与工序结构
+    problem = build_schedule_problem(df, available_machines)
+    print(f"✅ 构建完成，共 {len(problem['order_ids'])} 个订单。")
+
+    machines_state = new_machines_state(problem)
+    if setup_table is None:
+        setup_table = load_setup_table(input_data)
+    setup_matrix = None
+    if setup_table is not None or algorithm == 'family':
+        setup_matrix = build_setup_matrix(problem, setup_table, switch_default)
+
+    #下界：用于差距报告，并作为组合 / 局部搜索的提前停止信号
+    makespan_bound = makespan_lower_bound(problem)
+    penalty_bound = tardiness_lower_bound(problem, tardiness_weight)
+    stop_penalty = stop_threshold(penalty_bound, gap_tolerance)
+
+    #进度：组合调度与局部搜索各占一段（两者都有时各占一半）
+    searching = bool(time_budget_ms and time_budget_ms > 0)
+    split = 0.5 if searching and algorithm == 'portfolio' else 1.0 if algorithm == 'portfolio' else 0.0
+
+    def stage(lo, hi):
+        if progress is None:
+            return None
+        return lambda fraction, message=None: progress(lo + (hi - lo) * fraction, message)
 
     #选择算法执行
-    machines_state_copy = deepcopy(machines_state)
-    if algorithm == 'edd':
-        schedule, total_penalty = edd_multi_machine(orders, machines_state_copy, switch_time, tardiness_weight)
-    elif algorithm == 'greedy':
-        schedule, total_penalty = greedy_multi_machine(orders, machines_state_copy, switch_time, tardiness_weight)
-    elif algorithm == 'batch':
-        schedule, total_penalty = batch_schedule(orders, machines_state_copy, switch_time, batch_size, tardiness_weight)
+    portfolio_runs = None
+    if algorithm == 'portfolio':
+        # 未提供换线时间表时，family 成员与单独运行 family 一样按 switch_default 构造换线矩阵，其他成员仍不计换线
+        family_matrix = setup_matrix if setup_matrix is not None else build_setup_matrix(problem, None, switch_default)
+        best_algorithm, schedule, portfolio_runs = run_portfolio(
+            problem, tardiness_weight, stop_penalty=stop_penalty, progress=stage(0.0, split),
+            member_options={'family': {'setup_matrix': family_matrix}},
+            setup_matrix=setup_matrix, batch_size=batch_size
+        )
+        if best_algorithm == 'family':
+            setup_matrix = family_matrix  # 后续局部搜索与换线指标与单独运行 family 一致
     else:
-        raise ValueError(f"Unsupported algorithm: {algorithm}")
-
-    #输出结果
-    results = []
-    for s in schedule:
-        results.append({
-            "订单编号": s["order_id"],
-            "产品型号": s["product"],
-            "工序": s["op_id"],
-            "机器": s["machine"],
-            "开始时间": s["start_time_dt"].strftime("%Y-%m-%d %H:%M"),
-            "完成时间": s["finish_time_dt"].strftime("%Y-%m-%d %H:%M"),
-            "延迟(小时)": round(s["tardiness"], 2),
-            "延迟惩罚": round(s["penalty"], 2)
-        })
+        scheduler = SCHEDULERS.get(algorithm)
+        if scheduler is None:
+            raise ValueError(f"Unsupported algorithm: {algorithm}")
+        schedule = scheduler(problem, machines_state, setup_matrix=setup_matrix, batch_size=batch_size)
+
+    #局部搜索改进（可选）
+    search_info = None
+    if searching:
+        schedule, search_info = improve_schedule(problem, schedule, time_budget_ms, tardiness_weight, seed=seed,
+                                                 stop_penalty=stop_penalty, setup_matrix=setup_matrix,
+                                                 progress=stage(split, 1.0))
+        print(f"🔍 局部搜索: 迭代 {search_info['iterations']} 次，延迟惩罚 "
+              f"{search_info['baseline_penalty']:.2f} -> {search_info['best_penalty']:.2f}")
 
+    #评估结果
+    tardiness, penalty = evaluate_schedule(problem, schedule, tardiness_weight)
+
+    n_orders = len(problem["order_ids"])
+    total_penalty = sum(penalty[schedule["seq"]].tolist())
     metrics = {
         "总延迟惩罚": round(total_penalty, 2),
-        "平均延迟惩罚": round(total_penalty / len(orders), 2) if orders else 0
+        "平均延迟惩罚": round(total_penalty / n_orders, 2) if n_orders else 0
     }
+    if portfolio_runs is not None:
+        metrics["最优算法"] = best_algorithm
+        metrics["算法对比"] = portfolio_runs
+    if search_info is not None:
+        metrics["基线延迟惩罚"] = round(search_info["baseline_penalty"], 2)
+        metrics["搜索改进量"] = round(search_info["improvement"], 2)
+        metrics["搜索迭代次数"] = search_info["iterations"]
+    if setup_matrix is not None:
+        n_changeovers, changeover_hours = changeover_summary(problem, schedule, setup_matrix)
+        metrics["换线次数"] = n_changeovers
+        metrics["换线总时长(h)"] = round(changeover_hours, 2)
+    metrics["延迟惩罚下界"] = round(penalty_bound, 2)
+    metrics["延迟惩罚差距(%)"] = round(optimality_gap(total_penalty, penalty_bound), 2)
+    op_order = problem["op_order"]
+    metrics.update(schedule_kpis(problem["machines"], schedule["machine"], schedule["start"], schedule["finish"],
+                                 op_order, schedule["finish"] - problem["due_limits"][op_order]))
+
+    makespan = float(schedule["finish"].max()) if len(schedule["finish"]) else 0.0
+    metrics["完工时间下界(h)"] = round(makespan_bound, 2)
+    metrics["完工时间差距(%)"] = round(optimality_gap(makespan, makespan_bound), 2)
 
+    return {"problem": problem, "schedule": schedule, "tardiness": tardiness, "penalty": penalty, "metrics": metrics,
+            "setup_matrix": setup_matrix}
+
+
+def run_schedule_from_excel(input_data, algorithm='edd', batch_size=50, tardiness_weight=1, switch_default=1,
+                            available_machines=None, return_state=False, time_budget_ms=0, seed=None,
+                            setup_table=None, gap_tolerance=None, progress=None):
+    """
+    通用排产调度函数（支持多工序、多机器、顺序加工、批量优化）
+    -------------------------------------------------------
+    参数:
+        input_data: Excel 文件路径 或 list[dict]
+        algorithm: 'edd' / 'greedy' / 'batch' / 'insertion' / 'family'（产品族批量）/
+                   'portfolio'（并行运行全部算法取最优）
+        batch_size: 批量调度 / 产品族批量时的批大小
+        tardiness_weight: 延迟惩罚权重
+        switch_default: 默认换线时间（小时），用于换线时间表中未列出的产品对
+        available_machines: 可用机器列表（可选，默认取表中出现的全部机器）
+        return_state: 为 True 时额外返回计划状态，供滚动排产使用
+        time_budget_ms: 局部搜索改进的时间预算（毫秒），0 表示不做改进
+        seed: 局部搜索随机种子
+        setup_table: 换线时间表（list[dict]，可选）；为空时读取工作簿中的“换线时间”工作表。
+                     提供换线时间表或使用 'family' 时按产品对计入换线时间，否则不计换线
+                     （'portfolio' 中的 family 成员同样计入，其余成员不计）
+        gap_tolerance: 下界差距容差（比例，如 0.05），达到后算法组合与局部搜索提前停止；None 表示不提前停止
+        progress: 进度回调 progress(完成比例, 说明)（可选，后台任务用于上报进度与响应取消）：
+                  组合调度每完成一个算法、局部搜索每隔若干次迭代调用一次；单个构造算法内部不回调
+    返回:
+        results: 排产结果表格（list[dict]）
+        metrics: 总延迟惩罚、平均延迟惩罚、排产 KPI（schedule_kpis）、下界与差距；计入换线时另含换线次数与换线总时长
+        plan_state: 计划状态（仅 return_state=True 时返回）
+    """
+
+    run = solve_schedule(input_data, algorithm, batch_size, tardiness_weight, switch_default,
+                         available_machines, time_budget_ms, seed, setup_table, gap_tolerance, progress)
+    problem, schedule, metrics = run["problem"], run["schedule"], run["metrics"]
+    results = format_schedule_results(problem, schedule, run["tardiness"], run["penalty"])
+
+    if return_state:
+        return results, metrics, build_plan_state(problem, schedule, run["setup_matrix"], switch_default)
     return results, metrics
 
+
+#滚动排产（增量插单）
+def build_plan_state(problem, schedule, setup_matrix=None, switch_default=1):
+    """
+    导出可持久化的计划状态（JSON 可序列化的列式结构）
+    -------------------------------------------------------
+    orders: 订单编号 / 产品型号 / 到达日期 / 最晚交付日期
+    ops:    按派工顺序的已排工序（所属订单下标、工序编号、机器下标、加工时间、开始 / 完成时间）
+    setup:  计入换线时的换线矩阵（按产品型号，及表中未列出产品对的默认换线时间），滚动排产沿用
+    """
+    seq = schedule["seq"]
+    state = {
+        "machines": list(problem["machines"]),
+        "orders": {
+            "order_id": problem["order_ids"].tolist(),
+            "product": problem["products"].tolist(),
+            "entry_date": np.datetime_as_string(problem["entry_dates"]).tolist(),
+            "due_date": np.datetime_as_string(problem["due_dates"]).tolist(),
+        },
+        "ops": {
+            "order": problem["op_order"][seq].tolist(),
+            "op_no": problem["op_no"][seq].tolist(),
+            "machine": schedule["machine"][seq].tolist(),
+            "proc_time": problem["proc_times"][seq].tolist(),
+            "start": schedule["start"][seq].tolist(),
+            "finish": schedule["finish"][seq].tolist(),
+        },
+    }
+    if setup_matrix is not None:
+        state["setup"] = {
+            "products": list(problem["product_names"]),
+            "hours": np.asarray(setup_matrix, dtype=np.float64).tolist(),
+            "default": float(switch_default),
+        }
+    return state
+
+
+def _plan_setup_matrix(plan_setup, product_names):
+    """计划状态中的换线矩阵展开到 product_names（有序）上：计划中没有的产品对使用默认换线时间"""
+    names = np.asarray(product_names, dtype=object)
+    setup = np.full((len(names), len(names)), float(plan_setup.get("default", 1)), dtype=np.float64)
+    idx = np.searchsorted(names, np.asarray(plan_setup["products"], dtype=object))
+    setup[np.ix_(idx, idx)] = np.asarray(plan_setup["hours"], dtype=np.float64).reshape(len(idx), len(idx))
+    np.fill_diagonal(setup, 0)
+    return setup
+
+
+def _hours_to_timedelta(hours):
+    return np.rint(np.asarray(hours, dtype=np.float64) * 3.6e9).astype(np.int64).astype("timedelta64[us]")
+
+
+def reschedule_incremental(plan_state, input_data, now=None, freeze_started=True, tardiness_weight=1,
+                           available_machines=None):
+    """
+    滚动排产：在已有计划上只排新增 / 变更订单，不重新计算整本订单
+    -------------------------------------------------------
+    参数:
+        plan_state: 上一次排产导出的计划状态（build_plan_state）
+        input_data: 新增或变更订单（Excel 文件路径 或 list[dict]），
+                    订单编号已在计划中的视为变更订单，其余为新增订单
+        now: 当前时间（默认取系统时间），早于 now 的时段不再安排新工序；
+             计划状态带换线矩阵（setup）时，新工序插入空隙需同时容纳与前后工序之间的换线时间
+        freeze_started: 变更订单中已开工（开始时间 <= now）的工序是否锁定不动
+        tardiness_weight: 延迟惩罚权重
+        available_machines: 可用机器列表（可选，默认取计划与新订单中的全部机器）
+    返回:
+        results: 本次新排工序（list[dict]）
+        metrics: 合并后整份计划的延迟惩罚与排产 KPI，以及保留 / 新排工序数
+        plan_state: 合并后的计划状态，可作为下一次滚动排产的输入
+    """
+    df = load_schedule_input(input_data)
+    now64 = pd.Timestamp(now if now is not None else pd.Timestamp.now()).to_datetime64().astype("datetime64[ns]")
+
+    #解析已有计划
+    plan_orders, plan_ops = plan_state["orders"], plan_state["ops"]
+    p_order = np.asarray(plan_ops["order"], dtype=np.int64)
+    p_start = np.asarray(plan_ops["start"], dtype=np.float64)
+    p_finish = np.asarray(plan_ops["finish"], dtype=np.float64)
+    p_entry = np.asarray(plan_orders["entry_date"], dtype="datetime64[ns]")
+    p_keys = np.asarray([str(o) for o in plan_orders["order_id"]], dtype=object)
+
+    #变更订单的工序默认全部重排；开启锁定时已开工工序保留
+    input_keys = df["订单编号"].astype(str).str.strip() if "订单编号" in df.columns else pd.Series([], dtype=object)
+    changed = np.isin(p_keys, input_keys.unique())[p_order]
+    started = p_entry[p_order] + _hours_to_timedelta(p_start) <= now64
+    keep = ~changed | (started & freeze_started)
+    frozen = changed & keep
+
+    #已锁定工序不再出现在待排工序中，其完成时间作为订单剩余工序的就绪时间
+    frozen_finish = pd.Series(p_finish[frozen]).groupby(p_keys[p_order[frozen]]).max()
+    if frozen.any():
+        frozen_ops = set(zip(p_keys[p_order[frozen]].tolist(), np.asarray(plan_ops["op_no"])[frozen].tolist()))
+        op_no = pd.to_numeric(df["工序编号"], errors="coerce")
+        row_keys = zip(input_keys.tolist(), op_no.tolist())
+        df = df[[key not in frozen_ops for key in row_keys]]
+
+    #机器集合：计划机器 + 新订单机器
+    if available_machines is None:
+        tokens = df["分配机器"].dropna().astype(str).str.split(",").explode().str.strip() \
+            if "分配机器" in df.columns else pd.Series([], dtype=object)
+        available_machines = set(plan_state["machines"]) | set(tokens[tokens != ""].tolist())
+    problem = build_schedule_problem(df, available_machines)
+    machines = sorted(set(plan_state["machines"]) | set(problem["machines"]))
+    plan_machine = np.searchsorted(np.asarray(machines, dtype=object),
+                                   np.asarray(plan_state["machines"], dtype=object))[np.asarray(plan_ops["machine"], dtype=np.int64)]
+    delta_machine = np.searchsorted(np.asarray(machines, dtype=object), np.asarray(problem["machines"], dtype=object))
+
+    #换线：计划与新订单的产品合并编码，保留工序按产品占用空隙，新工序插空时计入前后换线
+    plan_setup = plan_state.get("setup")
+    setup_matrix = None
+    kept_product = np.full(int(keep.sum()), -1, dtype=np.int64)
+    if plan_setup is not None:
+        p_products = np.asarray(plan_orders["product"], dtype=object)[p_order[keep]]
+        names = sorted(set(plan_setup["products"]) | set(p_products.tolist()) | set(problem["product_names"]))
+        name_arr = np.asarray(names, dtype=object)
+        setup_matrix = _plan_setup_matrix(plan_setup, names)
+        problem = dict(problem, product_names=names,
+                       product_codes=np.searchsorted(name_arr, problem["products"]).astype(np.int64))
+        kept_product = np.searchsorted(name_arr, p_products).astype(np.int64)
+
+    #用保留工序构建每台机器的空隙索引
+    proc_times = problem["proc_times"]
+    min_gap = float(proc_times.min()) if len(proc_times) else 0.0
+    order_by_machine = np.argsort(plan_machine[keep], kind="stable")
+    kept_machine = plan_machine[keep][order_by_machine]
+    kept_busy = list(zip(p_start[keep][order_by_machine].tolist(), p_finish[keep][order_by_machine].tolist(),
+                         kept_product[order_by_machine].tolist()))
+    bounds = np.searchsorted(kept_machine, delta_machine, side="left"), np.searchsorted(kept_machine, delta_machine, side="right")
+    timelines = [timeline_from_busy(kept_busy[lo:hi], min_gap) for lo, hi in zip(*bounds)]
+
+    #订单就绪时间：不早于 now，且不早于已锁定工序完成时间
+    release = np.maximum((now64 - problem["entry_dates"]) / np.timedelta64(1, "h"), 0.0)
+    delta_keys = np.asarray([str(o) for o in problem["order_ids"]], dtype=object)
+    frozen_ready = frozen_finish.reindex(delta_keys).to_numpy(dtype=np.float64)
+    release = np.fmax(release, frozen_ready)
+
+    order_seq = np.argsort(problem["due_dates"], kind="stable").tolist()
+    schedule = _new_schedule(len(proc_times))
+    _dispatch_orders_with_gaps(problem, order_seq, timelines, schedule, release=release.tolist(),
+                               setup_matrix=setup_matrix)
+    schedule = _finalize_schedule(schedule)
+
+    tardiness, penalty = evaluate_schedule(problem, schedule, tardiness_weight)
+    results = format_schedule_results(problem, schedule, tardiness, penalty)
+
+    #合并计划：保留工序沿用原订单记录，新排工序使用新订单记录
+    kept_orders, kept_order_idx = np.unique(p_order[keep], return_inverse=True)
+    delta_state = build_plan_state(problem, schedule)
+    seq = schedule["seq"]
+    new_state = {
+        "machines": machines,
+        "orders": {key: np.asarray(plan_orders[key], dtype=object)[kept_orders].tolist() + delta_state["orders"][key]
+                   for key in plan_orders},
+        "ops": {
+            "order": kept_order_idx.tolist() + (problem["op_order"][seq] + len(kept_orders)).tolist(),
+            "op_no": np.asarray(plan_ops["op_no"])[keep].tolist() + delta_state["ops"]["op_no"],
+            "machine": plan_machine[keep].tolist() + delta_machine[schedule["machine"][seq]].tolist(),
+            "proc_time": np.asarray(plan_ops["proc_time"])[keep].tolist() + delta_state["ops"]["proc_time"],
+            "start": p_start[keep].tolist() + delta_state["ops"]["start"],
+            "finish": p_finish[keep].tolist() + delta_state["ops"]["finish"],
+        },
+    }
+    if setup_matrix is not None:
+        new_state["setup"] = {"products": list(problem["product_names"]), "hours": setup_matrix.tolist(),
+                              "default": float(plan_setup.get("default", 1))}
+
+    #整份计划的延迟惩罚
+    p_due = np.asarray(plan_orders["due_date"], dtype="datetime64[ns]")
+    p_due_limits = (p_due - p_entry) / np.timedelta64(1, "h")
+    kept_penalty = tardiness_weight * np.maximum(0, p_finish[keep] - p_due_limits[p_order[keep]])
+    total_penalty = sum(kept_penalty.tolist()) + sum(penalty[seq].tolist())
+    n_orders = len(set(new_state["orders"]["order_id"]))
+    metrics = {
+        "总延迟惩罚": round(total_penalty, 2),
+        "平均延迟惩罚": round(total_penalty / n_orders, 2) if n_orders else 0,
+        "保留工序数": int(keep.sum()),
+        "新排工序数": int(len(seq))
+    }
+    #KPI 按订单编号归并（变更订单的保留部分与新排部分视为同一订单）
+    all_ops = new_state["ops"]
+    order_codes = pd.factorize(np.asarray(new_state["orders"]["order_id"], dtype=object)[all_ops["order"]])[0]
+    all_lateness = np.r_[p_finish[keep] - p_due_limits[p_order[keep]],
+                         schedule["finish"][seq] - problem["due_limits"][problem["op_order"][seq]]]
+    metrics.update(schedule_kpis(machines, np.asarray(all_ops["machine"], dtype=np.int64),
+                                 np.asarray(all_ops["start"], dtype=np.float64),
+                                 np.asarray(all_ops["finish"], dtype=np.float64), order_codes, all_lateness))
+    print(f"🔁 滚动排产完成：保留 {metrics['保留工序数']} 道工序，新排 {metrics['新排工序数']} 道工序。")
+
+    return results, metrics, new_state
+
+
 # 兼容旧接口
 def run_schedule(input_data=None, algorithm='edd'):
     return run_schedule_from_excel(input_data, algorithm=algorithm)
@@ -1,55 +1,274 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from scipy.optimize import linprog
-import random
 
-def run_stock(forecast_data, algorithm):
+
+def pso_optimize(demands, supply_limit, holding_cost=1.0, shortage_cost=5.0, num_particles=30, num_iterations=100,
+                 w=0.7, c1=1.4, c2=1.4, seed=None, patience=20, tol=1e-9, progress=None):
     """
-    智能库存优化算法（线性规划 + 粒子群优化）
+    粒子群优化每日补货量（整群向量化）
     -------------------------------------------------
+    每轮迭代整群速度 / 位置更新为一次矩阵运算，全部粒子的适应度由一次按行 cumsum 得到；
+    全局最优连续 patience 轮相对改进不超过 tol 时提前停止。
     参数:
-        forecast_data: list[dict]
-            格式 [{'日期': '2025-10-24', '预测需求': 100}, ...]
-        algorithm: str
-            可选 'lp' 或 'pso'
+        demands: 每日需求，长度 n
+        supply_limit: 每日补货上限
+        seed: 随机种子（相同种子结果可复现）
+        progress: 进度回调 progress(已完成迭代比例, 说明)（可选），每 10 轮调用一次
     返回:
-        stock_result: list[dict] [{'日期':.., '库存水平':..}, ...]
-        chart_data: dict {'x':日期列表, 'y':库存水平}
+        best: 最优补货量向量
+        best_score: 最优总成本（持有成本 + 缺货惩罚）
+        info: {"迭代次数", "提前停止"}
     -------------------------------------------------
     """
+    rng = np.random.default_rng(seed)
+    demands = np.asarray(demands, dtype=np.float64)
+    n = len(demands)
+    cum_demand = np.cumsum(demands)
+    # 总成本 = h·Σ max(s,0) + p·Σ max(-s,0) = (h-p)/2·Σ s + (h+p)/2·Σ |s|，s 为逐日库存余额
+    a, b = (holding_cost - shortage_cost) / 2, (holding_cost + shortage_cost) / 2
 
-    # 读取需求数据
-    demands = np.array([float(d['预测需求']) for d in forecast_data])
+    # 每行一个粒子；缓冲区预先分配，迭代中全部原地运算
+    stock = np.empty((num_particles, n))
+    tmp = np.empty((num_particles, n))
+    ones = np.ones(n)
+
+    def fitness(x):
+        np.cumsum(x, axis=1, out=stock)
+        np.subtract(stock, cum_demand, out=stock)
+        # 按行求和用矩阵向量乘（BLAS），比 sum(axis=1) 快
+        return a * (stock @ ones) + b * (np.abs(stock, out=tmp) @ ones)
+
+    particles = rng.uniform(0, supply_limit, (num_particles, n))
+    velocities = np.zeros((num_particles, n))
+    personal_best = particles.copy()
+    personal_best_scores = fitness(particles)
+    best_idx = int(np.argmin(personal_best_scores))
+    global_best = personal_best[best_idx].copy()
+    global_best_score = float(personal_best_scores[best_idx])
+
+    stagnant, iterations = 0, 0
+    for iterations in range(1, num_iterations + 1):
+        # 每个粒子一组 r1 / r2（与逐粒子更新的原实现一致）
+        r1 = c1 * rng.random((num_particles, 1))
+        r2 = c2 * rng.random((num_particles, 1))
+        velocities *= w
+        np.subtract(personal_best, particles, out=tmp)
+        tmp *= r1
+        velocities += tmp
+        np.subtract(global_best, particles, out=tmp)
+        tmp *= r2
+        velocities += tmp
+        particles += velocities
+        np.clip(particles, 0, supply_limit, out=particles)
+
+        scores = fitness(particles)
+        improved = scores < personal_best_scores
+        personal_best[improved] = particles[improved]
+        personal_best_scores[improved] = scores[improved]
+
+        best_idx = int(np.argmin(personal_best_scores))
+        improvement = global_best_score - personal_best_scores[best_idx]
+        if improvement > 0:
+            global_best = personal_best[best_idx].copy()
+            global_best_score = float(personal_best_scores[best_idx])
+        stagnant = 0 if improvement > tol * max(1.0, abs(global_best_score)) else stagnant + 1
+        if patience and stagnant >= patience:
+            break
+        if progress is not None and iterations % 10 == 0:
+            progress(iterations / num_iterations, f"PSO 迭代 {iterations} / {num_iterations}")
+
+    return global_best, global_best_score, {"迭代次数": iterations, "提前停止": iterations < num_iterations}
+
+
+def lp_optimize(demands, supply_limit, holding_cost=1.0, shortage_cost=5.0, allow_shortage=True):
+    """
+    稀疏库存平衡线性规划
+    -------------------------------------------------
+    决策变量（各 n 个）: x_t 当日补货量、I⁺_t 期末库存、I⁻_t 期末缺货（欠货）
+    约束（库存平衡，每行 5 个非零元，共 O(n) 个）:
+        I⁺_t - I⁻_t = I⁺_{t-1} - I⁻_{t-1} + x_t - d_t，期初库存为 0
+        0 <= x_t <= supply_limit，I⁺_t >= 0，I⁻_t >= 0（allow_shortage=False 时 I⁻_t = 0）
+    目标:
+        最小化 holding_cost·ΣI⁺ + shortage_cost·ΣI⁻（与 PSO 适应度相同）
+    参数:
+        demands: 每日需求，长度 n
+        supply_limit: 每日补货上限
+        allow_shortage: 是否允许缺货；为 False 且补货能力不足时无可行解
+    返回:
+        deliveries: 每日补货量
+        cost: 总成本（持有成本 + 缺货惩罚）
+        info: {"允许缺货", "求解状态"}
+    -------------------------------------------------
+    """
+    deliveries, cost, info = lp_optimize_multi(
+        np.asarray(demands, dtype=np.float64)[None, :], [supply_limit], holding_cost, shortage_cost,
+        allow_shortage=allow_shortage
+    )
+    return deliveries[0], cost, {"允许缺货": allow_shortage, "求解状态": info["求解状态"]}
+
+
+def lp_optimize_multi(demand_matrix, supply_limits=None, holding_cost=1.0, shortage_cost=5.0, capacity=None,
+                      allow_shortage=True):
+    """
+    多 SKU 联合稀疏线性规划（共享每日产能）
+    -------------------------------------------------
+    各 SKU 的库存平衡约束与 lp_optimize 相同（块对角），另加每日一行产能约束:
+        Σ_k x_{k,t} <= capacity_t
+    变量按 [x, I⁺, I⁻] 三块、块内按 SKU 排列，非零元 O(K·n)。
+    参数:
+        demand_matrix: 需求矩阵，形状 (K, n)，每行一个 SKU
+        supply_limits: 各 SKU 每日补货上限，长度 K，None / 元素为 None 表示不限
+        holding_cost / shortage_cost: 标量或长度 K 的数组（各 SKU 成本）
+        capacity: 共享每日产能，标量或长度 n 的数组；None 时各 SKU 相互独立
+    返回:
+        deliveries: 补货量矩阵 (K, n)
+        cost: 总成本
+        info: {"允许缺货", "求解状态", "SKU成本"(K,), "产能影子价格"(n,) 或 None}
+              影子价格为某日多一单位产能可降低的总成本
+    -------------------------------------------------
+    """
+    from scipy import sparse  # 首次使用 LP 时才导入 scipy
+    from scipy.optimize import linprog
+
+    demand_matrix = np.atleast_2d(np.asarray(demand_matrix, dtype=np.float64))
+    k, n = demand_matrix.shape
+    holding = np.broadcast_to(np.asarray(holding_cost, dtype=np.float64), (k,))
+    shortage = np.broadcast_to(np.asarray(shortage_cost, dtype=np.float64), (k,))
+
+    # 差分矩阵 D：D @ I = I_t - I_{t-1}；多 SKU 时为 K 个 D 的块对角
+    diff = sparse.diags([np.ones(n), -np.ones(n - 1)], [0, -1], format="csr")
+    diff = sparse.kron(sparse.eye(k), diff, format="csr") if k > 1 else diff
+    A_eq = sparse.hstack([-sparse.eye(k * n, format="csr"), diff, -diff], format="csr")
+    c = np.concatenate([np.zeros(k * n), np.repeat(holding, n), np.repeat(shortage, n)])
+
+    limits = np.array([np.inf if v is None else float(v) for v in
+                       (supply_limits if supply_limits is not None else [None] * k)])
+    if len(limits) != k:
+        raise ValueError(f"补货上限个数 {len(limits)} 与 SKU 数 {k} 不一致")
+    bounds = np.zeros((3 * k * n, 2))
+    bounds[:k * n, 1] = np.repeat(limits, n)
+    bounds[k * n:2 * k * n, 1] = np.inf
+    bounds[2 * k * n:, 1] = np.inf if allow_shortage else 0.0
+
+    A_ub = b_ub = None
+    if capacity is not None:
+        b_ub = np.broadcast_to(np.asarray(capacity, dtype=np.float64), (n,)) if np.ndim(capacity) == 0 \
+            else np.asarray(capacity, dtype=np.float64)
+        if b_ub.shape != (n,):
+            raise ValueError(f"产能长度 {len(b_ub)} 与计划天数 {n} 不一致")
+        # 产能行：每日各 SKU 补货量之和
+        A_ub = sparse.hstack([sparse.kron(np.ones((1, k)), sparse.eye(n), format="csr"),
+                              sparse.csr_matrix((n, 2 * k * n))], format="csr")
+
+    res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=-demand_matrix.ravel(), bounds=bounds, method="highs")
+    if not res.success:
+        raise ValueError(f"线性规划求解失败: {res.message}")
+
+    stock = res.x[k * n:].reshape(2, k, n)
+    info = {
+        "允许缺货": allow_shortage,
+        "求解状态": res.message,
+        "SKU成本": holding * stock[0].sum(axis=1) + shortage * stock[1].sum(axis=1),
+        "产能影子价格": -res.ineqlin.marginals if capacity is not None else None,
+    }
+    return res.x[:k * n].reshape(k, n), float(res.fun), info
+
+
+def ww_optimize(demands, ordering_cost=100.0, holding_cost=1.0):
+    """
+    Wagner–Whitin 动态规划（无产能约束的订货成本 + 持有成本，精确最优）
+    -------------------------------------------------
+    F(j) = min_i F(i-1) + K·[第 i..j 期有需求] + h·Σ_{t=i..j} (t-i)·d_t
+    其中 i 为覆盖第 j 期的最后一次订货期；持有成本由需求前缀和 O(1) 求出，
+    每个 j 在候选窗口上向量化取最小。候选窗口下界单调右移：
+    - 计划期定理：j 的最优订货期不早于 j-1 的最优订货期
+    - 经济截断：h·(j-i)·d_j > K 的 i 对 j 及之后各期都不如在 j 新订货
+    订货间隔较短时接近 O(n)，最坏 O(n²)；不构造约束矩阵。
+    参数:
+        demands: 每日需求，长度 n（非负）
+        ordering_cost: 每次订货的固定成本 K
+        holding_cost: 单位库存每期持有成本 h
+    返回:
+        orders: 每日订货量（订货期订足到下次订货前的需求）
+        cost: 总成本（订货成本 + 持有成本）
+        info: {"订货次数"}
+    -------------------------------------------------
+    """
+    d = np.asarray(demands, dtype=np.float64)
+    if (d < 0).any():
+        raise ValueError("Wagner–Whitin 要求需求非负")
+    n = len(d)
+    cum_d = np.concatenate([[0.0], np.cumsum(d)])
+    cum_td = np.concatenate([[0.0], np.cumsum(np.arange(n) * d)])
+
+    F = np.zeros(n + 1)
+    last = np.zeros(n, dtype=np.int64)
+    lo = 0
+    for j in range(n):
+        if d[j] > 0 and holding_cost > 0:
+            lo = max(lo, int(np.ceil(j - ordering_cost / (holding_cost * d[j]))))
+        i = np.arange(lo, j + 1)
+        covered = cum_d[j + 1] - cum_d[i]
+        cost = F[i] + ordering_cost * (covered > 0) + holding_cost * ((cum_td[j + 1] - cum_td[i]) - i * covered)
+        k = int(np.argmin(cost))
+        F[j + 1] = cost[k]
+        last[j] = lo = lo + k
+
+    orders = np.zeros(n)
+    j = n - 1
+    while j >= 0:
+        i = last[j]
+        orders[i] = cum_d[j + 1] - cum_d[i]
+        j = i - 1
+    return orders, float(F[n]), {"订货次数": int((orders > 0).sum())}
+
+
+def plan_cost(deliveries, demands, ordering_cost=0.0, holding_cost=1.0, shortage_cost=5.0):
+    """
+    按统一口径评估补货方案：订货成本（补货量 > 0 的天数 × K）+ 持有成本 + 缺货惩罚
+    返回:
+        {"总成本", "订货成本", "持有成本", "缺货成本", "订货次数"}
+    """
+    deliveries = np.asarray(deliveries, dtype=np.float64)
+    stock = np.cumsum(deliveries - np.asarray(demands, dtype=np.float64))
+    orders = int((deliveries > 1e-9).sum())
+    holding = holding_cost * float(np.clip(stock, 0, None).sum())
+    shortage = shortage_cost * float(np.clip(-stock, 0, None).sum())
+    return {
+        "总成本": ordering_cost * orders + holding + shortage,
+        "订货成本": ordering_cost * orders,
+        "持有成本": holding,
+        "缺货成本": shortage,
+        "订货次数": orders,
+    }
+
+
+def plan_deliveries(demands, algorithm, seed=None, ordering_cost=100.0, holding_cost=1.0, shortage_cost=5.0,
+                    progress=None):
+    """
+    按算法求每日补货量（run_stock 与基准测试共用）
+    lp / pso 的每日补货上限为 max(需求) × 0.8；ww 不限产能、不缺货
+    progress 只在 PSO 迭代中回调（lp 为一次求解器调用，ww 为单次动态规划）
+    """
+    demands = np.asarray(demands, dtype=np.float64)
     n = len(demands)
-    holding_cost = 1.0        # 单位库存持有成本
-    shortage_cost = 5.0       # 缺货惩罚成本
-    max_stock = max(demands) * 1.5  # 库存上限（经验值）
     daily_supply_limit = max(demands) * 0.8  # 每天最大补货量限制
 
     #线性规划算法
     if algorithm.lower() == 'lp':
         """
-        决策变量:
-            x_i = 当日补货量
-        约束:
-            累积补货量 - 累积需求 >= 0 （不能缺货）
-            x_i >= 0, x_i <= daily_supply_limit
-        目标:
-            最小化 ∑(库存持有成本 + 缺货成本)
+        稀疏库存平衡模型（见 lp_optimize），约束非零元 O(n)，万级周期亚秒求解。
+        补货能力足以全程不缺货时禁止缺货（与原"累积补货 >= 累积需求"约束一致，
+        取其中持有成本最小的方案）；否则允许缺货并计缺货惩罚，不再退化为累积需求。
         """
-
-        c = np.ones(n) * holding_cost
-        A = np.tril(np.ones((n, n))) * -1  # -库存余额 <= -需求累计
-        b = -np.cumsum(demands)
-
-        bounds = [(0, daily_supply_limit)] * n
-
-        res = linprog(c, A_ub=A, b_ub=b, bounds=bounds, method='highs')
-        if not res.success:
-            stock_levels = np.cumsum(demands)
-        else:
-            deliveries = res.x
-            stock_levels = np.cumsum(deliveries - demands)
-            stock_levels = np.clip(stock_levels, 0, max_stock)
+        cum_capacity = daily_supply_limit * np.arange(1, n + 1)
+        allow_shortage = bool((cum_capacity < np.cumsum(demands) - 1e-9).any())
+        deliveries, _, _ = lp_optimize(demands, daily_supply_limit, holding_cost, shortage_cost,
+                                       allow_shortage=allow_shortage)
 
     # 粒子群优化算法（PSO）
     elif algorithm.lower() == 'pso':
@@ -58,55 +277,51 @@ def run_stock(forecast_data, algorithm):
         粒子 = n维补货量向量。
         适应度 = 持有成本 + 缺货惩罚。
         """
-        num_particles = 30
-        num_iterations = 100
-        w, c1, c2 = 0.7, 1.4, 1.4  # 惯性权重与学习因子
-
-        # 初始化
-        particles = np.random.uniform(0, daily_supply_limit, (num_particles, n))
-        velocities = np.zeros((num_particles, n))
-        personal_best = particles.copy()
-        global_best = particles[0].copy()
-
-        def fitness(x):
-            stock = np.cumsum(x - demands)
-            shortage = np.sum(np.abs(stock[stock < 0]))
-            holding = np.sum(stock[stock > 0])
-            return holding_cost * holding + shortage_cost * shortage
-
-        personal_best_scores = np.array([fitness(p) for p in personal_best])
-        global_best = personal_best[np.argmin(personal_best_scores)].copy()
-        global_best_score = np.min(personal_best_scores)
-
-        # 迭代更新
-        for _ in range(num_iterations):
-            for i in range(num_particles):
-                r1, r2 = random.random(), random.random()
-                velocities[i] = (
-                    w * velocities[i]
-                    + c1 * r1 * (personal_best[i] - particles[i])
-                    + c2 * r2 * (global_best - particles[i])
-                )
-                particles[i] += velocities[i]
-                particles[i] = np.clip(particles[i], 0, daily_supply_limit)
-
-                score = fitness(particles[i])
-                if score < personal_best_scores[i]:
-                    personal_best[i] = particles[i].copy()
-                    personal_best_scores[i] = score
-
-            # 更新全局最优
-            best_idx = np.argmin(personal_best_scores)
-            if personal_best_scores[best_idx] < global_best_score:
-                global_best = personal_best[best_idx].copy()
-                global_best_score = personal_best_scores[best_idx]
-
-        deliveries = global_best
-        stock_levels = np.cumsum(deliveries - demands)
-        stock_levels = np.clip(stock_levels, 0, max_stock)
+        deliveries, _, _ = pso_optimize(demands, daily_supply_limit, holding_cost, shortage_cost, seed=seed,
+                                        progress=progress)
+
+    # Wagner–Whitin 动态规划（订货成本 + 持有成本）
+    elif algorithm.lower() == 'ww':
+        deliveries, _, _ = ww_optimize(demands, ordering_cost, holding_cost)
 
     else:
-        raise ValueError("Unsupported algorithm type. Use 'lp' or 'pso'.")
+        raise ValueError("Unsupported algorithm type. Use 'lp', 'pso' or 'ww'.")
+    return deliveries
+
+
+def run_stock(forecast_data, algorithm, seed=None, ordering_cost=100.0, holding_cost=1.0, shortage_cost=5.0,
+              progress=None):
+    """
+    智能库存优化算法（线性规划 + 粒子群优化 + Wagner–Whitin 动态规划）
+    -------------------------------------------------
+    参数:
+        forecast_data: list[dict]
+            格式 [{'日期': '2025-10-24', '预测需求': 100}, ...]
+        algorithm: str
+            可选 'lp'、'pso' 或 'ww'
+        seed: int
+            PSO 随机种子（可选，相同种子结果可复现）
+        ordering_cost: float
+            每次订货的固定成本（ww 使用）
+        holding_cost / shortage_cost: float
+            单位库存持有成本 / 缺货惩罚成本
+        progress: callable
+            进度回调 progress(完成比例, 说明)（可选，后台任务用于上报进度与响应取消）
+    返回:
+        stock_result: list[dict] [{'日期':.., '库存水平':..}, ...]
+        chart_data: dict {'x':日期列表, 'y':库存水平}
+    -------------------------------------------------
+    """
+
+    # 读取需求数据
+    demands = np.array([float(d['预测需求']) for d in forecast_data])
+    max_stock = max(demands) * 1.5  # 库存上限（经验值）
+
+    deliveries = plan_deliveries(demands, algorithm, seed=seed, ordering_cost=ordering_cost,
+                                 holding_cost=holding_cost, shortage_cost=shortage_cost, progress=progress)
+    stock_levels = np.cumsum(deliveries - demands)
+    # ww 一次订货覆盖多期需求，库存可超过经验上限，不做截断
+    stock_levels = np.clip(stock_levels, 0, None if algorithm.lower() == 'ww' else max_stock)
 
     # 输出格式（兼容前端）
     stock_result = [
@@ -119,3 +334,224 @@ def run_stock(forecast_data, algorithm):
     }
 
     return stock_result, chart_data
+
+
+def run_stock_multi(batch, capacity=None, holding_cost=1.0, shortage_cost=5.0):
+    """
+    多 SKU 联合库存优化（共享每日产能，一次稀疏 LP 求解）
+    -------------------------------------------------
+    参数:
+        batch: list[dict]
+            [{'seriesId': 'A', 'forecastData': [{'日期':.., '预测需求':..}, ...],
+              'supplyLimit': 可选单品每日补货上限, 'holdingCost' / 'shortageCost': 可选单品成本}, ...]
+            也可直接使用批量预测返回的 forecastResult 字段；各 SKU 按日期对齐，缺失日期需求记 0
+        capacity: 共享每日产能，标量或按日期顺序的列表；None 表示不限
+    返回:
+        plans: list[dict] [{'seriesId', 'stockResult': [{'日期','库存水平','缺货量','补货量'}], 'chartData', '总成本'}]
+        capacity_usage: list[dict] [{'日期','补货总量','产能','利用率','影子价格'}]
+        summary: {'SKU数', '天数', '总成本'}
+    -------------------------------------------------
+    """
+    if not batch:
+        raise ValueError("SKU 列表为空")
+    series = []
+    for i, item in enumerate(batch):
+        rows = item.get('forecastData') or item.get('forecastResult')
+        if not rows:
+            raise ValueError(f"第 {i + 1} 个 SKU 缺少 forecastData")
+        series.append((item.get('seriesId', i), {str(r['日期']): float(r['预测需求']) for r in rows}))
+
+    dates = sorted(set().union(*(demand.keys() for _, demand in series)))
+    demand_matrix = np.array([[demand.get(d, 0.0) for d in dates] for _, demand in series])
+    holding = [float(item.get('holdingCost', holding_cost)) for item in batch]
+    shortage = [float(item.get('shortageCost', shortage_cost)) for item in batch]
+
+    deliveries, total_cost, info = lp_optimize_multi(
+        demand_matrix, [item.get('supplyLimit') for item in batch], holding, shortage, capacity=capacity
+    )
+    net_stock = np.cumsum(deliveries - demand_matrix, axis=1)
+
+    plans = []
+    for (series_id, _), x, s, sku_cost in zip(series, deliveries, net_stock, info["SKU成本"]):
+        levels = np.clip(s, 0, None)
+        plans.append({
+            "seriesId": series_id,
+            "stockResult": [
+                {"日期": d, "库存水平": round(float(v), 2), "缺货量": round(float(max(0.0, -b)), 2),
+                 "补货量": round(float(q), 2)}
+                for d, v, b, q in zip(dates, levels, s, x)
+            ],
+            "chartData": {"x": dates, "y": [round(float(v), 2) for v in levels]},
+            "总成本": round(float(sku_cost), 2),
+        })
+
+    total_supply = deliveries.sum(axis=0)
+    cap = None if capacity is None else np.broadcast_to(np.asarray(capacity, dtype=np.float64), (len(dates),))
+    capacity_usage = [
+        {
+            "日期": d,
+            "补货总量": round(float(q), 2),
+            "产能": None if cap is None else round(float(cap[t]), 2),
+            "利用率": None if cap is None or cap[t] <= 0 else round(float(q / cap[t]), 4),
+            "影子价格": None if cap is None else round(float(info["产能影子价格"][t]), 4),
+        }
+        for t, (d, q) in enumerate(zip(dates, total_supply))
+    ]
+    summary = {"SKU数": len(series), "天数": len(dates), "总成本": round(total_cost, 2)}
+    print(f"📦 多 SKU 库存优化完成：{len(series)} 个 SKU × {len(dates)} 天，总成本 {total_cost:.2f}")
+    return plans, capacity_usage, summary
+
+
+#情景分析：成本参数网格 × 需求扰动，一次请求比较全部情景
+MAX_SCENARIO_SOLVES = 500  # 单次请求最多求解的情景数（去重后）
+_scenario_pool = None
+
+
+def _get_scenario_pool():
+    """情景求解进程池按需创建并在请求间复用"""
+    global _scenario_pool
+    if _scenario_pool is None:
+        _scenario_pool = ProcessPoolExecutor(max_workers=max(1, os.cpu_count() or 1))
+    return _scenario_pool
+
+
+def _as_list(value, default):
+    """标量或列表统一为列表，None 时取默认值"""
+    if value is None:
+        return [default]
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _solve_scenario(demands, algorithm, seed, ordering_cost, holding_cost, shortage_cost):
+    """在子进程中求解单个情景，返回补货量与耗时（毫秒）"""
+    started = time.perf_counter()
+    deliveries = plan_deliveries(demands, algorithm, seed=seed, ordering_cost=ordering_cost,
+                                 holding_cost=holding_cost, shortage_cost=shortage_cost)
+    return deliveries, (time.perf_counter() - started) * 1000.0
+
+
+def evaluate_plans(deliveries, demand_matrix, ordering_costs, holding_costs, shortage_costs):
+    """
+    向量化评估给定补货方案：P 个方案 × S 个需求情景 × C 组成本参数
+    -------------------------------------------------
+    持有量、缺货量只与方案和需求有关，按 (P, S) 一次 cumsum 得到；
+    各组成本参数下的成本是它们的线性组合，不再逐情景重复计算。
+    参数:
+        deliveries: 补货量矩阵 (P, n)
+        demand_matrix: 需求矩阵 (S, n)
+        ordering_costs / holding_costs / shortage_costs: 长度 C 的成本参数
+    返回:
+        {"总成本", "订货成本", "持有成本", "缺货成本"}: 形状 (P, S, C)；"订货次数": 形状 (P,)
+    -------------------------------------------------
+    """
+    deliveries = np.atleast_2d(np.asarray(deliveries, dtype=np.float64))
+    demand_matrix = np.atleast_2d(np.asarray(demand_matrix, dtype=np.float64))
+    stock = np.cumsum(deliveries[:, None, :] - demand_matrix[None, :, :], axis=2)
+    held = np.clip(stock, 0, None).sum(axis=2)[:, :, None]
+    short = np.clip(-stock, 0, None).sum(axis=2)[:, :, None]
+    orders = (deliveries > 1e-9).sum(axis=1)
+
+    ordering = np.asarray(ordering_costs, dtype=np.float64) * orders[:, None, None] * np.ones_like(held)
+    holding = np.asarray(holding_costs, dtype=np.float64) * held
+    shortage = np.asarray(shortage_costs, dtype=np.float64) * short
+    return {
+        "总成本": ordering + holding + shortage,
+        "订货成本": ordering,
+        "持有成本": holding,
+        "缺货成本": shortage,
+        "订货次数": orders,
+    }
+
+
+def run_stock_scenarios(forecast_data, algorithms=None, ordering_cost=100.0, holding_cost=1.0, shortage_cost=5.0,
+                        demand_scale=1.0, plans=None, seed=None, parallel=True, progress=None):
+    """
+    库存情景分析：成本参数网格 × 需求缩放，一次比较全部情景
+    -------------------------------------------------
+    - 求解：algorithms 中每个算法在每个情景上重新优化；与算法无关的成本参数不参与去重键
+      （lp / pso 不用订货成本，ww 不用缺货成本），去重后的求解在进程池中并行（单核时顺序执行）
+    - 评估：plans 中给定的补货方案不重新求解，在全部情景上向量化计算成本（evaluate_plans）
+    参数:
+        forecast_data: list[dict] [{'日期':.., '预测需求':..}, ...]
+        algorithms: 求解算法列表，'lp' / 'pso' / 'ww'，默认 ['lp']；plans 非空时可为空列表
+        ordering_cost / holding_cost / shortage_cost: 标量或列表，取笛卡尔积
+        demand_scale: 需求缩放系数，标量或列表（如 [0.8, 1.0, 1.2] 表示需求 ±20%）
+        plans: 待评估方案 {名称: 每日补货量列表}（可选）
+        seed: PSO 随机种子
+        progress: 进度回调 progress(已求解比例, 说明)（可选），每完成一个情景求解调用一次
+    返回:
+        rows: list[dict] 成本对比表，每行一个 (方案 / 算法, 需求缩放, 成本参数) 情景
+              {"情景", "algorithm", "demandScale", "orderingCost", "holdingCost", "shortageCost",
+               "总成本", "订货成本", "持有成本", "缺货成本", "订货次数", "耗时(ms)"}
+        summary: {"情景数", "求解次数", "总耗时(s)"}
+    -------------------------------------------------
+    """
+    started = time.perf_counter()
+    demands = np.array([float(d['预测需求']) for d in forecast_data])
+    n = len(demands)
+    algorithms = ['lp'] if algorithms is None and not plans else list(algorithms or [])
+    unknown = [a for a in algorithms if a.lower() not in ('lp', 'pso', 'ww')]
+    if unknown:
+        raise ValueError(f"Unsupported algorithm: {', '.join(unknown)}，请选择 lp / pso / ww")
+
+    scales = [float(v) for v in _as_list(demand_scale, 1.0)]
+    costs = [tuple(map(float, c)) for c in itertools.product(
+        _as_list(ordering_cost, 100.0), _as_list(holding_cost, 1.0), _as_list(shortage_cost, 5.0)
+    )]
+    demand_matrix = np.array(scales)[:, None] * demands[None, :]
+
+    def row(name, s, c, cost, elapsed_ms):
+        k, h, p = costs[c]
+        return {
+            "algorithm": name, "demandScale": scales[s], "orderingCost": k, "holdingCost": h, "shortageCost": p,
+            **{key: round(float(v), 2) for key, v in cost.items() if key != "订货次数"},
+            "订货次数": int(cost["订货次数"]),
+            "耗时(ms)": None if elapsed_ms is None else round(elapsed_ms, 1),
+        }
+
+    rows = []
+    # 给定方案：不求解，全部情景一次向量化评估
+    if plans:
+        names = list(plans)
+        matrix = np.array([np.asarray(plans[name], dtype=np.float64) for name in names])
+        if matrix.ndim != 2 or matrix.shape[1] != n:
+            raise ValueError(f"方案长度需与预测天数 {n} 一致")
+        k, h, p = (np.array(v) for v in zip(*costs))
+        evaluated = evaluate_plans(matrix, demand_matrix, k, h, p)
+        for i, name in enumerate(names):
+            for s, c in itertools.product(range(len(scales)), range(len(costs))):
+                cost = {key: evaluated[key][i, s, c] for key in ("总成本", "订货成本", "持有成本", "缺货成本")}
+                rows.append(row(f"plan:{name}", s, c, dict(cost, 订货次数=evaluated["订货次数"][i]), None))
+
+    # 求解：按 (算法, 需求缩放, 相关成本参数) 去重
+    scenarios, solve_keys = [], {}
+    for algorithm, s, c in itertools.product(algorithms, range(len(scales)), range(len(costs))):
+        k, h, p = costs[c]
+        key = (algorithm.lower(), s, k if algorithm.lower() == 'ww' else None, h,
+               None if algorithm.lower() == 'ww' else p)
+        solve_keys.setdefault(key, (demand_matrix[s], algorithm, seed, k, h, p))
+        scenarios.append((algorithm, s, c, key))
+    if len(solve_keys) > MAX_SCENARIO_SOLVES:
+        raise ValueError(f"情景过多：需求解 {len(solve_keys)} 个，上限 {MAX_SCENARIO_SOLVES}")
+
+    keys = list(solve_keys)
+    if parallel and len(keys) > 1 and (os.cpu_count() or 1) > 1:
+        # 按提交顺序取回结果；中途回调抛出异常时 map 会取消尚未开始的求解
+        outcomes = _get_scenario_pool().map(_solve_scenario, *zip(*(solve_keys[key] for key in keys)))
+    else:
+        outcomes = (_solve_scenario(*solve_keys[key]) for key in keys)
+    solved = {}
+    for key, outcome in zip(keys, outcomes):
+        solved[key] = outcome
+        if progress is not None:
+            progress(len(solved) / len(keys), f"已求解 {len(solved)} / {len(keys)} 个情景")
+
+    for algorithm, s, c, key in scenarios:
+        deliveries, elapsed_ms = solved[key]
+        rows.append(row(algorithm, s, c, plan_cost(deliveries, demand_matrix[s], *costs[c]), elapsed_ms))
+
+    for i, r in enumerate(rows):
+        r["情景"] = i
+    summary = {"情景数": len(rows), "求解次数": len(keys), "总耗时(s)": round(time.perf_counter() - started, 3)}
+    print(f"📊 库存情景分析完成：{len(rows)} 个情景，求解 {len(keys)} 次")
+    return rows, summary
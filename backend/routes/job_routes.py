@@ -0,0 +1,70 @@
+from flask import Blueprint, request, jsonify
+from backend.utils.job_queue import JOB_FINISHED, submit_job, get_job, list_jobs, cancel_job
+
+job_bp = Blueprint('job_bp', __name__)
+
+
+@job_bp.route('/submit', methods=['POST'])
+def submit():
+    """
+    提交后台任务，立即返回任务 ID（长任务不再受 gunicorn 请求超时限制）
+    请求体: kind（'forecast' / 'forecast_batch' / 'stock' / 'stock_multi' / 'stock_scenarios' / 'schedule'）、
+           params（与对应同步接口相同的请求体）
+    """
+    try:
+        data = request.json or {}
+        kind = data.get('kind')
+        params = data.get('params') or {}
+        print("📥 接收到后台任务：", kind)
+
+        job_id = submit_job(kind, params)
+        return jsonify({"status": "success", "jobId": job_id}), 202
+
+    except ValueError as e:
+        return jsonify({"status": "fail", "msg": str(e)}), 400
+
+    except Exception as e:
+        import traceback
+        print("❌ 提交任务错误：", e)
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "msg": str(e)}), 500
+
+
+@job_bp.route('', methods=['GET'])
+def jobs():
+    """任务列表，可按 status 过滤"""
+    limit = int(request.args.get('limit', 20))
+    return jsonify({"status": "success", "jobs": list_jobs(request.args.get('status'), limit)})
+
+
+@job_bp.route('/<job_id>', methods=['GET'])
+def status(job_id):
+    """任务状态与进度（0~1）"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"status": "fail", "msg": f"未找到任务: {job_id}"}), 404
+    return jsonify({"status": "success", "job": job})
+
+
+@job_bp.route('/<job_id>/result', methods=['GET'])
+def result(job_id):
+    """任务结果；任务未结束时返回 409"""
+    job = get_job(job_id, with_result=True)
+    if job is None:
+        return jsonify({"status": "fail", "msg": f"未找到任务: {job_id}"}), 404
+    if job["status"] not in JOB_FINISHED:
+        return jsonify({"status": "fail", "msg": "任务尚未完成", "job": job}), 409
+    return jsonify({"status": "success", "job": job})
+
+
+@job_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel(job_id):
+    """
+    取消任务：排队中的立即取消，运行中的在下一个进度节点结束
+    长循环（回测折、批量序列、PSO 迭代、组合调度、局部搜索、情景求解）中约 0.5 秒检查一次；
+    单次模型拟合或 LP 求解（如 stock_multi）进行中无法中断，结束后才会停止
+    """
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify({"status": "fail", "msg": f"未找到任务: {job_id}"}), 404
+    return jsonify({"status": "success", "job": job})
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from backend.ml_models.stock_optimization import run_stock
+from backend.ml_models.stock_optimization import run_stock, run_stock_multi
 from backend.utils.history_utils import save_history
 
 plan_bp = Blueprint('plan_bp', __name__)
@@ -10,19 +10,25 @@ def run():
         data = request.json
         print("📥 接收到库存优化请求：", data)
 
-        algorithm = data.get('algorithm')  # 'lp' / 'pso'
+        algorithm = data.get('algorithm')  # 'lp' / 'pso' / 'ww'
         forecast_data = data.get('forecastData')
+        seed = data.get('seed')  # PSO 随机种子（可选）
+        costs = {  # 成本参数（可选）：订货成本用于 ww，缺货成本用于 lp / pso，持有成本通用
+            "ordering_cost": float(data.get('orderingCost', 100.0)),
+            "holding_cost": float(data.get('holdingCost', 1.0)),
+            "shortage_cost": float(data.get('shortageCost', 5.0)),
+        }
 
         if not forecast_data:
             return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
 
-        stock_result, chart_data = run_stock(forecast_data, algorithm)
+        stock_result, chart_data = run_stock(forecast_data, algorithm, seed=seed, **costs)
 
         # ✅ 保存历史记录
         save_history(
             module="stock",
             algorithm=algorithm,
-            params={"forecastData": forecast_data},
+            params={"forecastData": forecast_data, "costs": costs},
             result={"stockResult": stock_result, "chartData": chart_data}
         )
 
@@ -37,3 +43,49 @@ def run():
         print("❌ 库存优化运行错误：", e)
         print(traceback.format_exc())
         return jsonify({"status": "error", "msg": str(e)}), 500
+
+
+@plan_bp.route('/multi', methods=['POST'])
+def multi():
+    """
+    多 SKU 联合库存优化：各 SKU 共享每日产能，一次求解
+    请求体: batch（[{seriesId, forecastData / forecastResult, supplyLimit?, holdingCost?, shortageCost?}]）、
+           capacity（共享每日产能，标量或按日期的列表，可选）、holdingCost / shortageCost（默认成本，可选）
+    """
+    try:
+        data = request.json or {}
+        batch = data.get('batch')
+        print("📥 接收到多 SKU 库存优化请求：SKU 数 =", len(batch or []))
+
+        if not batch:
+            return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
+
+        plans, capacity_usage, summary = run_stock_multi(
+            batch, capacity=data.get('capacity'),
+            holding_cost=data.get('holdingCost', 1.0), shortage_cost=data.get('shortageCost', 5.0)
+        )
+
+        record_id = save_history(
+            module="stock",
+            algorithm="lp-multi",
+            params={"batch": batch, "capacity": data.get('capacity')},
+            result={"summary": summary, "capacityUsage": capacity_usage}
+        )
+
+        return jsonify({
+            "status": "success",
+            "plans": plans,
+            "capacityUsage": capacity_usage,
+            "summary": summary,
+            "recordId": record_id
+        })
+
+    except ValueError as e:
+        print("❌ 多 SKU 库存优化失败：", e)
+        return jsonify({"status": "fail", "msg": str(e)}), 400
+
+    except Exception as e:
+        import traceback
+        print("❌ 多 SKU 库存优化错误：", e)
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "msg": str(e)}), 500
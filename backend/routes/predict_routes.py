@@ -1,6 +1,13 @@
-from flask import Blueprint, request, jsonify
-from backend.ml_models.demand_forecast import run_forecast
+import json
+import time
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from backend.ml_models.demand_forecast import (
+    FITTERS, run_forecast, model_metadata, update_forecast_model, iter_batch_forecast
+)
+from backend.ml_models.forecast_backtest import backtest_models
 from backend.utils.history_utils import save_history
+from backend.utils.model_registry import save_model, load_model, load_model_meta, list_models
 
 predict_bp = Blueprint('predict_bp', __name__)
 
@@ -10,14 +17,32 @@ def run():
         data = request.json
         print("📥 接收到预测请求：", data)
 
-        algorithm = data.get('algorithm')  # 'arima', 'exp_smooth'
+        algorithm = data.get('algorithm')  # 'arima', 'exp_smooth', 轻量引擎 'ses' / 'holt' / 'holt_winters' / 'croston', 'auto'
         input_data = data.get('inputData')
+        model_name = data.get('modelName')  # 可选：保存模型到注册表，供后续增量更新
+        arima_search = data.get('arimaSearch', 'stepwise')  # ARIMA 阶数搜索：stepwise / parallel
+        time_cap_s = data.get('timeCapS')  # 并行阶数搜索时间上限（秒）
 
         if not input_data:
             return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
 
+        # auto：滚动起点回测选出最优模型后再预测
+        selection = None
+        if algorithm == 'auto':
+            selection = backtest_models(input_data)
+            algorithm = selection["最优模型"]
+
+        # 同名模型上次选出的阶数用于热启动
+        meta = load_model_meta(model_name) if model_name else None
+        start_order = meta.get("order") if meta else None
+
         # ✅ 调用模型预测
-        forecast_result, chart_data, _ = run_forecast(input_data, algorithm)
+        forecast_result, chart_data, fit_model = run_forecast(
+            input_data, algorithm, arima_search=arima_search, start_order=start_order, time_cap_s=time_cap_s
+        )
+
+        if model_name:
+            save_model(model_name, algorithm, fit_model, model_metadata(fit_model, algorithm))
 
         # ✅ 保存历史记录（确保所有数值都是 Python 原生类型）
         save_history(
@@ -33,7 +58,10 @@ def run():
         return jsonify({
             "status": "success",
             "forecastResult": forecast_result,
-            "chartData": chart_data
+            "chartData": chart_data,
+            "modelName": model_name,
+            "algorithm": algorithm,
+            "modelSelection": selection
         })
 
     except Exception as e:
@@ -41,3 +69,171 @@ def run():
         print("❌ 预测运行错误：", e)
         print(traceback.format_exc())
         return jsonify({"status": "error", "msg": str(e)}), 500
+
+
+@predict_bp.route('/update', methods=['POST'])
+def update():
+    """
+    在线更新：向注册表中的已拟合模型追加新观测并重新预测
+    请求体: modelName（模型名称）、inputData（新观测，日期 + 需求数量）、forecastDays（可选）
+    残差诊断正常时只做增量追加；诊断退化时自动重新完整拟合
+    """
+    try:
+        data = request.json
+        print("📥 接收到模型更新请求：", data)
+
+        model_name = data.get('modelName')
+        input_data = data.get('inputData')
+        forecast_days = data.get('forecastDays')
+
+        if not model_name or not input_data:
+            return jsonify({"status": "fail", "msg": "模型名称或新观测数据为空"}), 400
+
+        fit_model, meta = load_model(model_name)
+        if fit_model is None:
+            return jsonify({"status": "fail", "msg": f"未找到模型: {model_name}"}), 404
+
+        forecast_result, chart_data, new_model, new_meta, diagnostics = update_forecast_model(
+            fit_model, meta, input_data, forecast_days=forecast_days
+        )
+        save_model(model_name, meta["algorithm"], new_model, new_meta)
+
+        save_history(
+            module="forecast",
+            algorithm=f"{meta['algorithm']}-update",
+            params={"modelName": model_name, "inputData": input_data},
+            result={
+                "forecastResult": forecast_result,
+                "chartData": chart_data,
+                "diagnostics": diagnostics
+            }
+        )
+
+        return jsonify({
+            "status": "success",
+            "forecastResult": forecast_result,
+            "chartData": chart_data,
+            "diagnostics": diagnostics,
+            "modelName": model_name
+        })
+
+    except ValueError as e:
+        print("❌ 模型更新失败：", e)
+        return jsonify({"status": "fail", "msg": str(e)}), 400
+
+    except Exception as e:
+        import traceback
+        print("❌ 模型更新错误：", e)
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "msg": str(e)}), 500
+
+
+@predict_bp.route('/backtest', methods=['POST'])
+def backtest():
+    """
+    滚动起点回测：比较候选模型的 MAPE / MASE 并给出最优模型
+    请求体: inputData、candidates（可选，候选算法列表）、horizon（预测步长，默认 7）、folds（折数，默认 4）
+    """
+    try:
+        data = request.json
+        print("📥 接收到回测请求：", {k: v for k, v in data.items() if k != 'inputData'})
+
+        input_data = data.get('inputData')
+        if not input_data:
+            return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
+
+        result = backtest_models(
+            input_data, candidates=data.get('candidates'), horizon=data.get('horizon', 7), folds=data.get('folds', 4)
+        )
+        save_history(module="forecast", algorithm="backtest", params={"inputData": input_data}, result=result)
+        return jsonify({"status": "success", "backtest": result})
+
+    except ValueError as e:
+        print("❌ 回测失败：", e)
+        return jsonify({"status": "fail", "msg": str(e)}), 400
+
+    except Exception as e:
+        import traceback
+        print("❌ 回测错误：", e)
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "msg": str(e)}), 500
+
+
+@predict_bp.route('/batch', methods=['POST'])
+def batch():
+    """
+    多序列批量预测：长表（序列编号 / SKU + 日期 + 需求数量）一次请求预测全部序列
+    请求体: algorithm、inputData、forecastDays（可选）、parallel（是否进程池并行，默认 True）
+    以 NDJSON 流式返回，每行一个 JSON 对象：
+      {"type": "series", "seriesId": ..., "status": "success" | "fail", "forecastResult" | "msg", "elapsedS": ...}
+      {"type": "summary", "summary": {...}, "recordId": n}   最后一行，汇总
+    序列按完成顺序返回；历史记录只保存汇总与失败序列
+    """
+    data = request.json or {}
+    print("📥 接收到批量预测请求：算法=", data.get('algorithm'))
+
+    algorithm = data.get('algorithm')
+    input_data = data.get('inputData')
+    forecast_days = data.get('forecastDays')
+    parallel = data.get('parallel', True)
+
+    if not input_data:
+        return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
+    if algorithm not in FITTERS:
+        return jsonify({"status": "fail", "msg": f"Unsupported algorithm: 请选择 {' / '.join(FITTERS)}"}), 400
+
+    try:
+        records = iter_batch_forecast(input_data, algorithm, forecast_days=forecast_days, parallel=parallel)
+        # 先取第一条结果：列名等整体错误在开始流式输出前以 400 返回
+        started = time.perf_counter()
+        first = next(records, None)
+    except ValueError as e:
+        print("❌ 批量预测输入错误：", e)
+        return jsonify({"status": "fail", "msg": str(e)}), 400
+    except Exception as e:
+        import traceback
+        print("❌ 批量预测错误：", e)
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "msg": str(e)}), 500
+
+    def generate():
+        summary = {"序列数": 0, "成功": 0, "失败": 0, "缓存命中": 0}
+        failures = []
+        for record in ([first] if first is not None else []):
+            yield _series_line(record, summary, failures)
+        for record in records:
+            yield _series_line(record, summary, failures)
+
+        summary["总耗时(s)"] = round(time.perf_counter() - started, 3)
+        record_id = save_history(
+            module="forecast",
+            algorithm=f"{algorithm}-batch",
+            params={"seriesCount": summary["序列数"], "forecastDays": forecast_days},
+            result={"summary": summary, "failures": failures}
+        )
+        print("📦 批量预测完成：", summary)
+        yield json.dumps({"type": "summary", "summary": summary, "recordId": record_id}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def _series_line(record, summary, failures):
+    """单条序列结果计入汇总并转为一行 NDJSON"""
+    summary["序列数"] += 1
+    if record["status"] == "success":
+        summary["成功"] += 1
+        summary["缓存命中"] += int(record.get("cached", False))
+    else:
+        summary["失败"] += 1
+        failures.append({"seriesId": record["seriesId"], "msg": record.get("msg")})
+    return json.dumps(dict(record, type="series"), ensure_ascii=False) + "\n"
+
+
+@predict_bp.route('/models', methods=['GET'])
+def models():
+    """列出注册表中的模型"""
+    try:
+        return jsonify({"status": "success", "models": list_models()})
+    except Exception as e:
+        print("❌ 获取模型列表失败：", e)
+        return jsonify({"status": "error", "msg": str(e)}), 500
@@ -1,23 +1,45 @@
-from flask import Blueprint, request, jsonify
-from backend.ml_models.scheduling import run_schedule
-from backend.utils.history_utils import save_history
+import json
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from backend.ml_models.scheduling import (
+    run_schedule_from_excel, reschedule_incremental, ScheduleInputError,
+    solve_schedule, iter_schedule_results, build_plan_state
+)
+from backend.utils.history_utils import save_history, get_record
 
 schedule_bp = Blueprint('schedule_bp', __name__)
 
 @schedule_bp.route('/run', methods=['POST'])
 def run():
+    """
+    排产接口
+    请求体: algorithm、inputData、timeBudgetMs、setupMatrix、gapTolerance、
+           stream（仅为 JSON true 时按 NDJSON 流式返回；字符串 "false" 等其他值均按普通 JSON 返回）
+    流式返回只减少结果表的内存占用与序列化开销：排产求解与保存历史在发送第一行之前完成，
+    第一块结果在求解结束后才到达，求解过程中客户端收不到数据（需要进度请改用后台任务接口）
+    """
     try:
         data = request.json
         print("接收到前端数据：", data)
 
         algorithm = data.get('algorithm')
         input_data = data.get('inputData')
+        time_budget_ms = data.get('timeBudgetMs', 0)  # 局部搜索改进时间预算（毫秒）
+        setup_table = data.get('setupMatrix')  # 换线时间表 [{前产品型号, 后产品型号, 换线时间(h)}]
+        stream = data.get('stream') is True  # 流式返回（NDJSON），只接受布尔 true
+        gap_tolerance = data.get('gapTolerance')  # 下界差距容差（比例），达到后提前停止
 
         if not input_data or not isinstance(input_data, list):
             return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
 
-        # 运行调度算法
-        schedule_result, metrics = run_schedule(input_data, algorithm)
+        if stream:
+            return _stream_schedule(algorithm, input_data, time_budget_ms, setup_table, gap_tolerance)
+
+        # 运行调度算法（同时导出计划状态，供滚动排产使用）
+        schedule_result, metrics, plan_state = run_schedule_from_excel(
+            input_data, algorithm=algorithm, return_state=True, time_budget_ms=time_budget_ms,
+            setup_table=setup_table, gap_tolerance=gap_tolerance
+        )
 
         # 打印调试信息
         print(f"排产结果 ({len(schedule_result)} 条):")
@@ -26,24 +48,112 @@ def run():
         print("性能指标:", metrics)
 
         # 保存历史
-        save_history(
+        record_id = save_history(
             module="schedule",
             algorithm=algorithm,
-            params={"inputData": input_data},
-            result={"result": schedule_result, "metrics": metrics}
+            params={"inputData": input_data, "timeBudgetMs": time_budget_ms, "setupMatrix": setup_table,
+                    "gapTolerance": gap_tolerance},
+            result={"result": schedule_result, "metrics": metrics, "planState": plan_state}
         )
 
-        # 确保每条记录都是 dict 类型（防止序列化错误）
-        schedule_result = [dict(r) if not isinstance(r, dict) else r for r in schedule_result]
-
         return jsonify({
             "status": "success",
             "scheduleResult": schedule_result,
-            "metrics": metrics
+            "metrics": metrics,
+            "recordId": record_id
         })
 
+    except ScheduleInputError as e:
+        # 输入校验问题一次性全部返回，便于前端逐条提示
+        print("排产输入校验失败：", e)
+        return jsonify({"status": "fail", "msg": str(e), "errors": e.errors}), 400
+
     except Exception as e:
         import traceback
         print("调度运行错误：", e)
         print(traceback.format_exc())
         return jsonify({"status": "error", "msg": str(e)}), 500
+
+
+def _stream_schedule(algorithm, input_data, time_budget_ms, setup_table, gap_tolerance):
+    """
+    流式排产：排产完成后按块输出 NDJSON，每行一个 JSON 对象
+      {"type": "rows", "rows": [...]}                      排产结果（每块至多 1000 行）
+      {"type": "metrics", "metrics": {...}, "recordId": n}  最后一行，性能指标
+    结果行边格式化边发送，不在内存中构建整张结果表；历史记录只保存指标与计划状态
+    注意：求解（含局部搜索预算）与 save_history 在返回 Response 之前同步完成，
+    因此首字节在求解结束后才发出，流式只覆盖结果输出阶段
+    """
+    run = solve_schedule(input_data, algorithm=algorithm, time_budget_ms=time_budget_ms, setup_table=setup_table,
+                         gap_tolerance=gap_tolerance)
+    problem, schedule, metrics = run["problem"], run["schedule"], run["metrics"]
+    print("性能指标:", metrics)
+
+    record_id = save_history(
+        module="schedule",
+        algorithm=algorithm,
+        params={"inputData": input_data, "timeBudgetMs": time_budget_ms, "setupMatrix": setup_table,
+                "gapTolerance": gap_tolerance, "stream": True},
+        result={"metrics": metrics, "planState": build_plan_state(problem, schedule, run["setup_matrix"])}
+    )
+
+    def generate():
+        for rows in iter_schedule_results(problem, schedule, run["tardiness"], run["penalty"]):
+            yield json.dumps({"type": "rows", "rows": rows}, ensure_ascii=False) + "\n"
+        yield json.dumps({"type": "metrics", "metrics": metrics, "recordId": record_id}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@schedule_bp.route('/reschedule', methods=['POST'])
+def reschedule():
+    """
+    滚动排产：在某次排产记录的计划上插入新增 / 变更订单
+    请求体: recordId（基准排产记录）、inputData（新增或变更订单）、
+           freezeStarted（是否锁定已开工工序，默认 True）、now（当前时间，可选）
+    """
+    try:
+        data = request.json
+        print("接收到滚动排产请求：", data)
+
+        base_id = data.get('recordId')
+        input_data = data.get('inputData')
+        freeze_started = data.get('freezeStarted', True)
+        now = data.get('now')
+
+        if not input_data or not isinstance(input_data, list):
+            return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
+
+        record = get_record("schedule", base_id) if base_id else None
+        plan_state = record["result"].get("planState") if record else None
+        if not plan_state:
+            return jsonify({"status": "fail", "msg": "未找到可续排的排产记录"}), 404
+
+        schedule_result, metrics, new_state = reschedule_incremental(
+            plan_state, input_data, now=now, freeze_started=freeze_started
+        )
+        print("性能指标:", metrics)
+
+        record_id = save_history(
+            module="schedule",
+            algorithm="incremental",
+            params={"baseRecordId": base_id, "inputData": input_data, "freezeStarted": freeze_started, "now": now},
+            result={"result": schedule_result, "metrics": metrics, "planState": new_state}
+        )
+
+        return jsonify({
+            "status": "success",
+            "scheduleResult": schedule_result,
+            "metrics": metrics,
+            "recordId": record_id
+        })
+
+    except ScheduleInputError as e:
+        print("排产输入校验失败：", e)
+        return jsonify({"status": "fail", "msg": str(e), "errors": e.errors}), 400
+
+    except Exception as e:
+        import traceback
+        print("滚动排产错误：", e)
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "msg": str(e)}), 500
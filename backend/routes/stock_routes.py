@@ -1,21 +1,53 @@
 from flask import Blueprint, request, jsonify
-from backend.ml_models.stock_optimization import optimize_stock_lp, optimize_stock_pso
-from backend.utils.db_utils import add_history
+from backend.ml_models.stock_optimization import run_stock_scenarios
+from backend.utils.history_utils import save_history
 
 stock_bp = Blueprint("stock_bp", __name__)
 
-@stock_bp.route("/optimize", methods=["POST"])
-def stock_optimize():
-    data = request.json
-    method = data.get("method", "LP")
-    forecast_data = data.get("forecast_data", [])
-
-    if method == "LP":
-        optimized = optimize_stock_lp(forecast_data)
-    elif method == "PSO":
-        optimized = optimize_stock_pso(forecast_data)
-    else:
-        return jsonify({"status":"fail","message":"优化方法不存在"})
-
-    add_history("stock", {"method": method}, {"optimized_count": len(optimized)})
-    return jsonify({"status":"success","method":method,"optimized_stock":optimized})
+
+@stock_bp.route("/scenarios", methods=["POST"])
+def scenarios():
+    """
+    库存情景分析：成本参数网格 × 需求扰动，一次请求返回成本对比表
+    请求体: forecastData、algorithms（求解算法列表，默认 ['lp']）、
+           orderingCost / holdingCost / shortageCost / demandScale（标量或列表，取笛卡尔积）、
+           plans（可选，{名称: 每日补货量}，只评估不求解）、seed、parallel（默认 True）
+    """
+    try:
+        data = request.json or {}
+        forecast_data = data.get("forecastData")
+        print("📥 接收到库存情景分析请求：", {k: v for k, v in data.items() if k not in ("forecastData", "plans")})
+
+        if not forecast_data:
+            return jsonify({"status": "fail", "msg": "输入数据为空或格式错误"}), 400
+
+        rows, summary = run_stock_scenarios(
+            forecast_data,
+            algorithms=data.get("algorithms"),
+            ordering_cost=data.get("orderingCost"),
+            holding_cost=data.get("holdingCost"),
+            shortage_cost=data.get("shortageCost"),
+            demand_scale=data.get("demandScale"),
+            plans=data.get("plans"),
+            seed=data.get("seed"),
+            parallel=data.get("parallel", True)
+        )
+
+        record_id = save_history(
+            module="stock",
+            algorithm="scenarios",
+            params={k: v for k, v in data.items() if k != "plans"},
+            result={"scenarios": rows, "summary": summary}
+        )
+
+        return jsonify({"status": "success", "scenarios": rows, "summary": summary, "recordId": record_id})
+
+    except ValueError as e:
+        print("❌ 库存情景分析失败：", e)
+        return jsonify({"status": "fail", "msg": str(e)}), 400
+
+    except Exception as e:
+        import traceback
+        print("❌ 库存情景分析错误：", e)
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "msg": str(e)}), 500
@@ -6,5 +6,9 @@ from backend.app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    # 上次退出时未完成的后台任务标记为失败（gunicorn 部署由 on_starting 钩子处理）
+    from backend.utils.job_queue import recover_interrupted_jobs
+    recover_interrupted_jobs()
+
     # 启动服务
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,258 @@
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.ml_models import demand_forecast
+from backend.ml_models.demand_forecast import (
+    _candidate_orders,
+    iter_batch_forecast,
+    model_metadata,
+    preprocess_time_series,
+    run_forecast,
+    search_arima_order_parallel,
+    split_series,
+    update_forecast_model,
+)
+from backend.ml_models.fast_forecast import fast_forecast, fit_fast
+from backend.ml_models.forecast_backtest import backtest_models
+from backend.utils import db_utils, model_cache
+from backend.utils.model_registry import list_models, load_model, save_model
+
+
+def _demand_rows(n=60, seed=0, start="2025-01-01"):
+    """带周季节性与噪声的日需求序列"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    demand = 100 + 0.3 * t + 10 * np.sin(t / 7 * 2 * np.pi) + rng.normal(0, 3, n)
+    dates = pd.date_range(start, periods=n, freq="D").strftime("%Y-%m-%d")
+    return [{"日期": d, "需求数量": float(round(v))} for d, v in zip(dates, demand)]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch):
+    monkeypatch.setattr(model_cache, "MODEL_CACHE_DIR", "")
+    model_cache.clear_model_cache()
+    yield
+    model_cache.clear_model_cache()
+
+
+@pytest.fixture
+def fit_calls(monkeypatch):
+    """统计真实拟合次数"""
+    calls = []
+    for name, fitter in list(demand_forecast.FITTERS.items()):
+        @functools.wraps(fitter)  # 保留拟合函数签名，缓存键按其默认参数归一
+        def counted(ts, _fitter=fitter, _name=name, **options):
+            calls.append(_name)
+            return _fitter(ts, **options)
+        monkeypatch.setitem(demand_forecast.FITTERS, name, counted)
+    return calls
+
+
+def test_repeat_forecast_hits_cache_and_skips_fitting(fit_calls):
+    rows = _demand_rows()
+    first = run_forecast(rows, "exp_smooth")
+    second = run_forecast(list(reversed(rows)), "exp_smooth")  # 行顺序不同，排序后序列相同
+    assert fit_calls == ["exp_smooth"]
+    assert second[0] == first[0]
+    assert second[2] is first[2]
+
+    run_forecast(_demand_rows(seed=1), "exp_smooth")
+    run_forecast(rows, "exp_smooth", use_cache=False)
+    assert fit_calls == ["exp_smooth"] * 3
+
+
+def test_cache_is_lru_bounded(monkeypatch):
+    monkeypatch.setattr(model_cache, "MODEL_CACHE_SIZE", 2)
+    for key in "abc":
+        model_cache.put_cached_model(key, key.upper())
+    assert model_cache.get_cached_model("a") is None
+    assert model_cache.get_cached_model("b") == "B"
+    model_cache.put_cached_model("d", "D")  # b 刚被访问，淘汰 c
+    assert model_cache.get_cached_model("c") is None
+    assert model_cache.get_cached_model("b") == "B"
+
+
+def test_disk_cache_is_shared_across_processes(tmp_path, monkeypatch, fit_calls):
+    monkeypatch.setattr(model_cache, "MODEL_CACHE_DIR", str(tmp_path))
+    rows = _demand_rows()
+    first = run_forecast(rows, "exp_smooth")
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+
+    model_cache.clear_model_cache()  # 模拟另一个 worker：进程内缓存为空
+    second = run_forecast(rows, "exp_smooth")
+    assert fit_calls == ["exp_smooth"]
+    assert second[0] == first[0]
+    assert model_cache.model_cache_stats()["disk_hits"] == 1
+
+
+@pytest.mark.parametrize("algorithm", ["arima", "exp_smooth", "holt_winters"])
+def test_online_update_appends_and_refits_only_on_degradation(algorithm, fit_calls):
+    rows = _demand_rows(90, seed=1)
+    _, _, model = run_forecast(rows[:70], algorithm)
+    meta = model_metadata(model, algorithm)
+    assert meta["n_obs"] == 70 and meta["last_date"] == rows[69]["日期"]
+
+    # 与旧数据重叠的行被忽略，只追加 10 个新观测
+    result, chart, model, meta, diagnostics = update_forecast_model(model, meta, rows[60:80], forecast_days=5)
+    assert fit_calls == [algorithm]
+    assert diagnostics["新增观测数"] == 10 and not diagnostics["重新拟合"]
+    assert meta["n_obs"] == 80 and chart["分界线"] == 80
+    assert [r["日期"] for r in result] == [d.strftime("%Y-%m-%d") for d in pd.date_range(rows[80]["日期"], periods=5)]
+
+    # 需求突变：残差诊断退化，触发完整重新拟合
+    shock = [dict(r, 需求数量=r["需求数量"] + 200) for r in rows[80:]]
+    *_, meta, diagnostics = update_forecast_model(model, meta, shock)
+    assert diagnostics["重新拟合"]
+    assert fit_calls == [algorithm, algorithm]
+    assert meta["n_obs"] == 90
+
+    with pytest.raises(ValueError):
+        update_forecast_model(model, meta, rows[:10])
+
+
+def test_model_registry_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DATABASE", str(tmp_path / "registry.db"))
+    _, _, model = run_forecast(_demand_rows(), "exp_smooth")
+    save_model("demo", "exp_smooth", model, model_metadata(model, "exp_smooth"))
+
+    loaded, meta = load_model("demo")
+    assert meta["algorithm"] == "exp_smooth"
+    np.testing.assert_allclose(loaded.forecast(3), model.forecast(3))
+    assert [m["name"] for m in list_models()] == ["demo"]
+    assert load_model("missing") == (None, None)
+
+
+def test_parallel_order_search_is_warm_started_and_time_capped():
+    ts = preprocess_time_series(_demand_rows(120, seed=2))["需求数量"]
+    # 热启动：上次阶数附近的候选排在最前
+    assert _candidate_orders(1, (3, 1, 1))[:3] == [(3, 1, 1), (2, 1, 1), (3, 1, 0)]
+
+    order, info = search_arima_order_parallel(ts, start_order=(1, 1, 1))
+    assert info["evaluated"] == info["candidates"] and not info["timed_out"]
+    assert order[0] + order[2] <= 5
+
+    _, info = search_arima_order_parallel(ts, time_cap_s=0)
+    assert info["timed_out"] and info["evaluated"] < info["candidates"]
+
+    result, _, model = run_forecast(_demand_rows(120, seed=2), "arima", forecast_days=3, use_cache=False,
+                                    arima_search="parallel", time_cap_s=0)
+    assert len(result) == 3 and model.model.order is not None  # 无候选完成时退回逐步搜索
+
+
+def _long_table(series):
+    """多条序列拼成长表（行顺序打乱，模拟导出的明细表）"""
+    rows = [dict(r, SKU=sku) for sku, sku_rows in series.items() for r in sku_rows]
+    return [rows[i] for i in np.random.default_rng(0).permutation(len(rows))]
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_batch_forecast_splits_long_table_and_isolates_failures(parallel):
+    series = {"A": _demand_rows(40, seed=1), "B": _demand_rows(50, seed=2), "C": _demand_rows(30, seed=3)}
+    series["C"][5]["需求数量"] = None
+    rows = _long_table(series)
+    records = {r["seriesId"]: r for r in iter_batch_forecast(rows, "exp_smooth", forecast_days=4, parallel=parallel)}
+
+    assert set(records) == {"A", "B", "C"}
+    assert records["C"]["status"] == "fail" and "缺失" in records["C"]["msg"]
+    for sku in "AB":
+        assert records[sku]["status"] == "success" and records[sku]["elapsedS"] >= 0
+        assert records[sku]["nObs"] == len(series[sku])
+        single, _, _ = run_forecast(series[sku], "exp_smooth", forecast_days=4, use_cache=False)
+        np.testing.assert_allclose([r["预测需求"] for r in records[sku]["forecastResult"]],
+                                   [r["预测需求"] for r in single])
+
+    # 再次请求全部命中缓存（失败序列除外）
+    again = {r["seriesId"]: r for r in iter_batch_forecast(rows, "exp_smooth", forecast_days=4, parallel=parallel)}
+    assert again["A"]["cached"] and again["B"]["cached"] and not again["C"]["cached"]
+
+
+def test_split_series_requires_series_id():
+    with pytest.raises(ValueError):
+        split_series(_demand_rows(10))
+
+
+def test_fast_engine_recovers_trend_and_season():
+    t = np.arange(84)
+    season = np.array([5.0, -3.0, 0.0, 8.0, -6.0, 2.0, -6.0])
+    y = 50 + 0.5 * t + season[t % 7]
+    model = fit_fast(y[:70], "holt_winters")
+    assert model["seasonal_periods"] == 7
+    np.testing.assert_allclose(fast_forecast(model, 14), y[70:], atol=0.5)
+
+    np.testing.assert_allclose(fast_forecast(fit_fast(y[:70], "holt"), 3)[0], y[70], atol=10)
+    assert fast_forecast(fit_fast(np.full(30, 12.0), "ses"), 5).tolist() == [12.0] * 5
+
+    # 间歇需求：每 4 天一次、每次 8 件，Croston 预测日均 2 件
+    intermittent = np.where(t % 4 == 3, 8.0, 0.0)
+    np.testing.assert_allclose(fast_forecast(fit_fast(intermittent, "croston"), 3), 2.0)
+
+    with pytest.raises(ValueError):
+        fit_fast(np.array([1.0, np.nan, 3.0]), "ses")
+
+
+def test_run_forecast_with_fast_algorithm(fit_calls):
+    rows = _demand_rows(60)
+    result, chart, model = run_forecast(rows, "holt_winters", forecast_days=5)
+    assert len(result) == 5 and chart["分界线"] == 60
+    assert isinstance(model, dict) and model["n_obs"] == 60
+    run_forecast(rows, "holt_winters", forecast_days=5)
+    assert fit_calls == ["holt_winters"]
+    with pytest.raises(ValueError):
+        run_forecast(rows, "prophet")
+
+
+def test_backtest_reuses_fits_across_folds_and_abandons_poor_candidates(fit_calls):
+    rows = _demand_rows(120, seed=4)
+    result = backtest_models(rows, candidates=["ses", "holt_winters", "exp_smooth"], horizon=7, folds=5,
+                             parallel=False)
+    report = {r["algorithm"]: r for r in result["候选"]}
+    assert result["折数"] == 5 and result["最优模型"] in ("holt_winters", "exp_smooth")
+    assert report["ses"]["状态"] == "提前淘汰" and report["ses"]["完成折数"] == 2
+    assert report[result["最优模型"]]["MASE"] < report["ses"]["MASE"]
+    # 每个候选只在首个起点完整拟合一次，之后沿用参数推进状态
+    assert sorted(fit_calls) == ["exp_smooth", "holt_winters", "ses"]
+
+    naive = backtest_models(rows, candidates=["holt_winters"], horizon=7, folds=5, parallel=False, reuse=False)
+    assert naive["候选"][0]["完成折数"] == 5 and fit_calls.count("holt_winters") == 6
+
+    with pytest.raises(ValueError):
+        backtest_models(rows[:10], horizon=7)
+
+
+def test_app_import_defers_heavy_libraries():
+    import subprocess
+    import sys
+    code = (
+        "import sys\n"
+        "from backend.app import create_app, warm_up\n"
+        "create_app()\n"
+        "heavy = ('statsmodels', 'pmdarima', 'scipy')\n"
+        "assert not [m for m in heavy if m in sys.modules], [m for m in heavy if m in sys.modules]\n"
+        "warm_up()\n"
+        "assert all(m in sys.modules for m in heavy)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True, capture_output=True)
+
+
+def test_cache_key_includes_fit_options_that_change_the_fit(fit_calls):
+    rows = _demand_rows(40, seed=4)
+    run_forecast(rows, "arima", forecast_days=3)
+    run_forecast(rows, "arima", forecast_days=3, arima_search="stepwise")  # 显式传默认值，键不变
+    assert fit_calls == ["arima"]
+
+    run_forecast(rows, "arima", forecast_days=3, start_order=(1, 1, 1))  # 热启动阶数不同，单独拟合
+    run_forecast(rows, "arima", forecast_days=3, start_order=[1, 1, 1])  # JSON 传入的 list 与 tuple 相同
+    assert fit_calls == ["arima"] * 2
+
+    # 批量预测按默认参数拟合，与默认参数的单序列预测共用缓存
+    ts = preprocess_time_series(rows)["需求数量"]
+    assert demand_forecast._cache_key(ts, "arima", search="stepwise", start_order=None, time_cap_s=None) == \
+        model_cache.series_fingerprint(ts, "arima")
+    assert demand_forecast._cache_key(ts, "arima", time_cap_s=2.0) != model_cache.series_fingerprint(ts, "arima")
+    records = list(iter_batch_forecast([dict(r, 产品="A") for r in rows], "arima", forecast_days=3, parallel=False))
+    assert records[0]["cached"] and fit_calls == ["arima"] * 2
@@ -0,0 +1,580 @@
+import json
+import os
+import random
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.ml_models.schedule_bounds import makespan_lower_bound, tardiness_lower_bound
+from backend.ml_models.schedule_search import improve_schedule
+from backend.utils.workload_utils import generate_order_book
+from backend.ml_models.scheduling import (
+    SCHEDULERS,
+    build_schedule_problem,
+    build_setup_matrix,
+    changeover_summary,
+    iter_schedule_results,
+    new_machines_state,
+    reschedule_incremental,
+    run_portfolio,
+    run_schedule_from_excel,
+    solve_schedule,
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SAMPLE_XLSX = os.path.join(ROOT_DIR, "测试排产用表.xlsx")
+
+
+def _reference_greedy(input_data, tardiness_weight=1, switch_default=1):
+    """原始 O(n²) 贪心实现（逐次排序 + pop(0) + 线性查找订单），作为对照基准"""
+    df = pd.read_excel(input_data) if isinstance(input_data, str) else pd.DataFrame(input_data)
+    for col in ["到达日期", "最晚交付日期"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+
+    all_machines = set()
+    for val in df.get("分配机器", []):
+        if pd.notna(val) and str(val).strip() != "":
+            all_machines.update([m.strip() for m in str(val).split(",")])
+    all_machines = sorted(list(all_machines))
+    machines_state = {m: {"available_time": 0, "last_product": None} for m in all_machines}
+    switch_time = {m: {m2: switch_default for m2 in all_machines if m2 != m} for m in all_machines}
+
+    orders = []
+    for order_id, group in df.groupby("订单编号"):
+        group = group.sort_values(by="工序编号")
+        operations = []
+        for _, row in group.iterrows():
+            ops = [m.strip() for m in str(row.get("分配机器", "")).split(",") if m.strip()]
+            operations.append({
+                "op_no": int(row["工序编号"]),
+                "op_id": f"{order_id}_工序{int(row['工序编号'])}",
+                "machines": ops if ops else all_machines,
+                "processing_time": float(row.get("加工时间(h)", 1))
+            })
+        orders.append({
+            "order_id": order_id,
+            "product": str(group["产品型号"].iloc[0]),
+            "entry_date": group["到达日期"].iloc[0],
+            "due_date": group["最晚交付日期"].iloc[0],
+            "operations": operations
+        })
+
+    schedule = []
+    total_penalty = 0.0
+    order_progress = {o["order_id"]: 0 for o in orders}
+    order_finish_time = {o["order_id"]: 0.0 for o in orders}
+    ready_ops = []
+    for order in orders:
+        op = order["operations"][0]
+        ready_ops.append(dict(op, order_id=order["order_id"], product=order["product"],
+                              entry_date=order["entry_date"], due_date=order["due_date"]))
+
+    while ready_ops:
+        ready_ops.sort(key=lambda x: x["processing_time"])
+        op = ready_ops.pop(0)
+        best_machine, best_start, best_finish = None, None, float("inf")
+        for m in op["machines"]:
+            state = machines_state[m]
+            switch_t = 0
+            if state["last_product"] and state["last_product"] != op["product"]:
+                switch_t = switch_time.get(m, {}).get(m, 0) or 0
+            start_time = max(state["available_time"] + switch_t, order_finish_time[op["order_id"]], 0)
+            finish_time = start_time + op["processing_time"]
+            if finish_time < best_finish:
+                best_finish, best_machine, best_start = finish_time, m, start_time
+
+        machines_state[best_machine]["available_time"] = best_finish
+        machines_state[best_machine]["last_product"] = op["product"]
+        order_finish_time[op["order_id"]] = best_finish
+
+        order = next(o for o in orders if o["order_id"] == op["order_id"])
+        next_index = order_progress[op["order_id"]] + 1
+        order_progress[op["order_id"]] = next_index
+        if next_index < len(order["operations"]):
+            ready_ops.append(dict(order["operations"][next_index], order_id=order["order_id"],
+                                  product=order["product"], entry_date=order["entry_date"],
+                                  due_date=order["due_date"]))
+
+        due_limit = (op["due_date"] - op["entry_date"]).total_seconds() / 3600
+        tardiness = max(0, best_finish - due_limit)
+        penalty = tardiness_weight * tardiness
+        total_penalty += penalty
+        schedule.append({
+            "订单编号": op["order_id"],
+            "产品型号": op["product"],
+            "工序": op["op_id"],
+            "机器": best_machine,
+            "开始时间": (op["entry_date"] + timedelta(hours=best_start)).strftime("%Y-%m-%d %H:%M"),
+            "完成时间": (op["entry_date"] + timedelta(hours=best_finish)).strftime("%Y-%m-%d %H:%M"),
+            "延迟(小时)": round(tardiness, 2),
+            "延迟惩罚": round(penalty, 2)
+        })
+
+    metrics = {
+        "总延迟惩罚": round(total_penalty, 2),
+        "平均延迟惩罚": round(total_penalty / len(orders), 2) if orders else 0
+    }
+    return schedule, metrics
+
+
+def _random_order_book(num_orders, num_machines, seed):
+    """生成带大量加工时间并列的随机订单（用于检验堆的并列次序）"""
+    rng = random.Random(seed)
+    machines = [f"M{i}" for i in range(1, num_machines + 1)]
+    rows = []
+    for i in range(num_orders):
+        entry = pd.Timestamp("2025-10-01") + pd.Timedelta(days=rng.randint(0, 5))
+        due = entry + pd.Timedelta(hours=rng.randint(8, 200))
+        for op_no in range(1, rng.randint(1, 4) + 1):
+            rows.append({
+                "订单编号": f"O{i:04d}",
+                "产品型号": rng.choice("ABC"),
+                "工序编号": op_no,
+                "分配机器": ",".join(rng.sample(machines, rng.randint(1, num_machines))),
+                "加工时间(h)": rng.choice([1.0, 2.5, 4.0, 7.1]),
+                "最晚交付日期": str(due),
+                "到达日期": str(entry),
+            })
+    return rows
+
+
+def test_greedy_matches_reference_on_sample_workbook():
+    results, metrics = run_schedule_from_excel(SAMPLE_XLSX, algorithm="greedy")
+    expected_results, expected_metrics = _reference_greedy(SAMPLE_XLSX)
+    assert results == expected_results
+    assert {k: metrics[k] for k in expected_metrics} == expected_metrics
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_greedy_matches_reference_on_random_books(seed):
+    rows = _random_order_book(num_orders=150, num_machines=4, seed=seed)
+    results, metrics = run_schedule_from_excel(rows, algorithm="greedy")
+    expected_results, expected_metrics = _reference_greedy(rows)
+    assert results == expected_results
+    assert {k: metrics[k] for k in expected_metrics} == expected_metrics
+
+def test_date_columns_may_use_different_formats():
+    rows = [
+        {"订单编号": "O1", "产品型号": "A", "工序编号": 1, "分配机器": "M1", "加工时间(h)": 2,
+         "到达日期": "2025-01-01", "最晚交付日期": "2025-01-03 12:00:00"},
+        {"订单编号": "O2", "产品型号": "B", "工序编号": 1, "分配机器": "M1", "加工时间(h)": 3,
+         "到达日期": "2025-01-02", "最晚交付日期": "2025-01-04 06:30:00"},
+    ]
+    problem = build_schedule_problem(pd.DataFrame(rows))
+    np.testing.assert_array_equal(problem["due_limits"], [60.0, 54.5])
+    np.testing.assert_array_equal(problem["entry_dates"], np.array(["2025-01-01", "2025-01-02"], dtype="datetime64[ns]"))
+
+
+def _assert_feasible(problem, schedule):
+    """同一机器上工序不重叠、同一订单内工序按顺序加工、机器在可选集合内"""
+    machine, start, finish = schedule["machine"], schedule["start"], schedule["finish"]
+    assert sorted(schedule["seq"].tolist()) == list(range(len(problem["proc_times"])))
+    for op in range(len(machine)):
+        allowed = problem["elig_idx"][problem["elig_ptr"][op]:problem["elig_ptr"][op + 1]]
+        assert machine[op] in allowed
+        assert finish[op] - start[op] == pytest.approx(problem["proc_times"][op])
+    for o in range(len(problem["order_ids"])):
+        lo, hi = problem["order_ptr"][o], problem["order_ptr"][o + 1]
+        assert all(start[j + 1] >= finish[j] - 1e-9 for j in range(lo, hi - 1))
+    for m in range(len(problem["machines"])):
+        ops = sorted(np.flatnonzero(machine == m), key=lambda j: start[j])
+        assert all(start[b] >= finish[a] - 1e-9 for a, b in zip(ops, ops[1:]))
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_insertion_fills_idle_gaps(seed):
+    problem = build_schedule_problem(pd.DataFrame(_random_order_book(200, 4, seed)))
+    edd = SCHEDULERS["edd"](problem, new_machines_state(problem))
+    insertion = SCHEDULERS["insertion"](problem, new_machines_state(problem))
+    _assert_feasible(problem, insertion)
+    # 派工顺序与 EDD 相同，插空后工序整体完成得更早
+    assert insertion["finish"].sum() < edd["finish"].sum()
+
+
+def test_reschedule_keeps_started_operations_and_fills_gaps():
+    rows = _random_order_book(60, 3, seed=5)
+    _, _, plan_state = run_schedule_from_excel(rows, algorithm="insertion", return_state=True)
+    now = "2025-10-03 00:00"
+
+    changed = [dict(r, **{"加工时间(h)": 1.0}) for r in rows if r["订单编号"] == "O0001"]
+    new = [dict(r, 订单编号="N0001") for r in rows if r["订单编号"] == "O0002"]
+    results, metrics, state = reschedule_incremental(plan_state, changed + new, now=now)
+
+    ops = state["ops"]
+    orders = state["orders"]
+    # 未变更订单的工序原样保留
+    before = {(str(plan_state["orders"]["order_id"][o]), n, s_, f)
+              for o, n, s_, f in zip(plan_state["ops"]["order"], plan_state["ops"]["op_no"],
+                                     plan_state["ops"]["start"], plan_state["ops"]["finish"])
+              if plan_state["orders"]["order_id"][o] != "O0001"}
+    after = {(str(orders["order_id"][o]), n, s_, f)
+             for o, n, s_, f in zip(ops["order"], ops["op_no"], ops["start"], ops["finish"])}
+    assert before <= after
+    assert metrics["新排工序数"] == len(results)
+    assert {r["订单编号"] for r in results} <= {"O0001", "N0001"}
+    assert any(r["订单编号"] == "N0001" for r in results)
+    # 新排工序不早于 now
+    assert all(r["开始时间"] >= "2025-10-03 00:00" for r in results)
+    # 合并后同一机器上不重叠
+    for m in range(len(state["machines"])):
+        spans = sorted((s_, f) for mm, s_, f in zip(ops["machine"], ops["start"], ops["finish"]) if mm == m)
+        assert all(b[0] >= a[1] - 1e-9 for a, b in zip(spans, spans[1:]))
+
+def _assert_state_setups_respected(state):
+    """合并后的计划状态中，同一机器上相邻工序之间留足换线时间"""
+    setup = state["setup"]
+    index = {name: i for i, name in enumerate(setup["products"])}
+    ops, products = state["ops"], state["orders"]["product"]
+    for m in range(len(state["machines"])):
+        spans = sorted((s_, f, index[products[o]]) for mm, o, s_, f
+                       in zip(ops["machine"], ops["order"], ops["start"], ops["finish"]) if mm == m)
+        for (_, fa, pa), (sb, _, pb) in zip(spans, spans[1:]):
+            assert sb >= fa + setup["hours"][pa][pb] - 1e-9
+
+
+def test_reschedule_keeps_changeover_gaps_of_setup_aware_plan():
+    rows = _random_order_book(80, 3, seed=9)
+    table = [{"前产品型号": "A", "后产品型号": "B", "换线时间(h)": 5}, {"前产品型号": "C", "后产品型号": "A", "换线时间(h)": 4}]
+    _, _, plan_state = run_schedule_from_excel(rows, algorithm="insertion", return_state=True, setup_table=table,
+                                               switch_default=2)
+    assert plan_state["setup"]["default"] == 2.0 and plan_state["setup"]["hours"][0][1] == 5
+    _assert_state_setups_respected(plan_state)
+
+    # 新订单含计划中没有的产品 D（按默认换线时间），插入保留工序之间的空隙
+    new = [dict(r, 订单编号=f"N{r['订单编号']}", 产品型号=p) for r, p in zip(rows[:40], "ABCD" * 10)]
+    results, _, state = reschedule_incremental(plan_state, new, now="2025-10-01 00:00")
+    assert {r["订单编号"][0] for r in results} == {"N"}
+    assert state["setup"]["products"] == ["A", "B", "C", "D"]
+    assert state["setup"]["hours"][3][0] == 2.0 and state["setup"]["hours"][0][1] == 5
+    _assert_state_setups_respected(state)
+
+    # 续排结果可继续作为下一次滚动排产的输入
+    more = [dict(r, 订单编号=f"M{r['订单编号']}") for r in rows[40:60]]
+    _assert_state_setups_respected(reschedule_incremental(state, more, now="2025-10-01 00:00")[2])
+
+
+def test_reschedule_with_all_operations_frozen_returns_merged_plan():
+    rows = _random_order_book(60, 3, seed=5)
+    _, _, plan_state = run_schedule_from_excel(rows, algorithm="insertion", return_state=True)
+
+    # now 晚于全部工序开工时间：重新提交的订单工序全部锁定，没有待排工序
+    changed = [dict(r, **{"加工时间(h)": 1.0}) for r in rows if r["订单编号"] == "O0001"]
+    results, metrics, state = reschedule_incremental(plan_state, changed, now="2030-01-01 00:00")
+
+    assert results == []
+    assert metrics["新排工序数"] == 0 and metrics["保留工序数"] == len(plan_state["ops"]["op_no"])
+    assert sorted(state["ops"]["start"]) == sorted(plan_state["ops"]["start"])
+
+
+@pytest.mark.parametrize("algorithm", ["edd", "greedy"])
+def test_local_search_improves_baseline_with_delta_evaluation(algorithm):
+    problem = build_schedule_problem(pd.DataFrame(_random_order_book(120, 3, seed=7)))
+    baseline = SCHEDULERS[algorithm](problem, new_machines_state(problem))
+    best, info = improve_schedule(problem, baseline, time_budget_ms=60_000, seed=0, max_iterations=2000)
+
+    _assert_feasible(problem, best)
+    assert info["iterations"] == 2000
+    assert info["best_penalty"] < info["baseline_penalty"]
+    # 增量累计的惩罚与对最优解的完整计算一致
+    due = problem["due_limits"][problem["op_order"]]
+    assert info["best_penalty"] == pytest.approx(np.maximum(0, best["finish"] - due).sum())
+
+
+def test_portfolio_returns_best_algorithm_in_parallel():
+    problem = build_schedule_problem(pd.DataFrame(_random_order_book(80, 3, seed=11)))
+    best_name, best, runs = run_portfolio(problem, batch_size=10)
+
+    assert [r["算法"] for r in runs] == list(SCHEDULERS)
+    penalties = {r["算法"]: r["总延迟惩罚"] for r in runs}
+    assert penalties[best_name] == min(penalties.values())
+    expected = SCHEDULERS[best_name](problem, new_machines_state(problem), batch_size=10)
+    np.testing.assert_array_equal(best["finish"], expected["finish"])
+
+
+def _assert_setups_respected(problem, schedule, setup):
+    """同一机器上相邻工序之间留足前后产品的换线时间"""
+    product = problem["product_codes"][problem["op_order"]]
+    machine, start, finish = schedule["machine"], schedule["start"], schedule["finish"]
+    for m in range(len(problem["machines"])):
+        ops = sorted(np.flatnonzero(machine == m), key=lambda j: start[j])
+        assert all(start[b] >= finish[a] + setup[product[a], product[b]] - 1e-9 for a, b in zip(ops, ops[1:]))
+
+
+def test_family_batching_cuts_changeovers_and_respects_setup_matrix():
+    rows = _random_order_book(200, 4, seed=3)
+    problem = build_schedule_problem(pd.DataFrame(rows))
+    table = [{"前产品型号": "A", "后产品型号": "B", "换线时间(h)": 3}]
+    setup = build_setup_matrix(problem, table, switch_default=2)
+    assert setup[0, 1] == 3 and setup[1, 0] == 2 and setup[2, 2] == 0
+
+    for name in SCHEDULERS:
+        schedule = SCHEDULERS[name](problem, new_machines_state(problem), setup_matrix=setup, batch_size=20)
+        _assert_feasible(problem, schedule)
+        _assert_setups_respected(problem, schedule, setup)
+
+    edd = SCHEDULERS["edd"](problem, new_machines_state(problem), setup_matrix=setup)
+    family = SCHEDULERS["family"](problem, new_machines_state(problem), setup_matrix=setup, batch_size=20)
+    assert changeover_summary(problem, family, setup)[1] < changeover_summary(problem, edd, setup)[1]
+
+    best, _ = improve_schedule(problem, family, time_budget_ms=60_000, seed=0, max_iterations=500, setup_matrix=setup)
+    _assert_setups_respected(problem, best, setup)
+
+    _, metrics = run_schedule_from_excel(rows, algorithm="family", batch_size=20, setup_table=table, switch_default=2)
+    assert metrics["换线总时长(h)"] == round(changeover_summary(problem, family, setup)[1], 2)
+
+
+def test_streamed_chunks_match_full_results():
+    rows = _random_order_book(120, 3, seed=4)
+    results, metrics = run_schedule_from_excel(rows, algorithm="greedy")
+    run = solve_schedule(rows, algorithm="greedy")
+    chunks = list(iter_schedule_results(run["problem"], run["schedule"], run["tardiness"], run["penalty"],
+                                        chunk_size=50))
+    assert [len(c) for c in chunks[:-1]] == [50] * (len(chunks) - 1)
+    assert [r for chunk in chunks for r in chunk] == results
+    assert run["metrics"] == metrics
+
+
+def test_kpis_match_row_by_row_computation():
+    rows = _random_order_book(100, 3, seed=6)
+    run = solve_schedule(rows, algorithm="edd")
+    problem, schedule, metrics = run["problem"], run["schedule"], run["metrics"]
+    machine, start, finish = schedule["machine"], schedule["start"], schedule["finish"]
+
+    makespan = max(finish)
+    assert metrics["最大完工时间(h)"] == round(makespan, 2)
+    for m, name in enumerate(problem["machines"]):
+        busy = sum(f - s_ for mm, s_, f in zip(machine, start, finish) if mm == m)
+        assert metrics["机器利用率(%)"][name] == round(busy / makespan * 100, 2)
+        assert metrics["机器空闲时间(h)"][name] == round(makespan - busy, 2)
+
+    lateness = [finish[problem["order_ptr"][o + 1] - 1] - problem["due_limits"][o]
+                for o in range(len(problem["order_ids"]))]
+    assert metrics["延迟订单数"] == sum(1 for x in lateness if x > 0)
+    assert metrics["订单延迟分位数(h)"]["P90"] == round(float(np.percentile(lateness, 90)), 2)
+    assert metrics["订单延迟分位数(h)"]["最大"] == round(max(lateness), 2)
+
+
+def test_generated_order_book_is_seeded_and_schedulable():
+    rows = generate_order_book(200, ops_per_order=(2, 3), num_machines=6, eligibility=0.2, seed=9)
+    assert rows == generate_order_book(200, ops_per_order=(2, 3), num_machines=6, eligibility=0.2, seed=9)
+    assert rows != generate_order_book(200, ops_per_order=(2, 3), num_machines=6, eligibility=0.2, seed=10)
+
+    problem = build_schedule_problem(pd.DataFrame(rows))
+    assert len(problem["order_ids"]) == 200
+    assert set(np.diff(problem["order_ptr"]).tolist()) <= {2, 3}
+    assert problem["machines"] == [f"M{i}" for i in range(1, 7)]
+    assert (np.diff(problem["elig_ptr"]) >= 1).all()
+    _assert_feasible(problem, SCHEDULERS["edd"](problem, new_machines_state(problem)))
+
+
+@pytest.mark.parametrize("seed,eligibility", [(0, 0.2), (1, 0.5), (2, 0.9)])
+def test_lower_bounds_hold_for_every_algorithm(seed, eligibility):
+    rows = generate_order_book(150, num_machines=5, eligibility=eligibility, due_slack_hours=(20, 400), seed=seed)
+    problem = build_schedule_problem(pd.DataFrame(rows))
+    makespan_bound = makespan_lower_bound(problem)
+    penalty_bound = tardiness_lower_bound(problem)
+    for name in SCHEDULERS:
+        schedule = SCHEDULERS[name](problem, new_machines_state(problem))
+        assert schedule["finish"].max() >= makespan_bound - 1e-9
+        assert np.maximum(0, schedule["finish"] - problem["due_limits"][problem["op_order"]]).sum() >= penalty_bound - 1e-9
+
+
+def test_bound_stops_portfolio_and_search_early():
+    problem = build_schedule_problem(pd.DataFrame(_random_order_book(80, 3, seed=11)))
+    best_name, _, runs = run_portfolio(problem, parallel=False, stop_penalty=float("inf"))
+    assert best_name == next(iter(SCHEDULERS))
+    assert all("跳过" in r for r in runs[1:])
+
+    _, metrics = run_schedule_from_excel(_random_order_book(80, 3, seed=11), time_budget_ms=60_000, gap_tolerance=1)
+    assert metrics["搜索迭代次数"] == 0
+    assert 0 <= metrics["延迟惩罚下界"] <= metrics["总延迟惩罚"]
+    assert metrics["完工时间下界(h)"] <= metrics["最大完工时间(h)"]
+
+
+@pytest.fixture
+def job_db(tmp_path, monkeypatch):
+    """任务进程从 fork 时继承数据库路径，因此每个测试使用新的任务进程池"""
+    from backend.utils import db_utils, job_queue
+    monkeypatch.setattr(db_utils, "DATABASE", str(tmp_path / "jobs.db"))
+    db_utils.execute_query(
+        "CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, module TEXT NOT NULL, algorithm TEXT NOT NULL, "
+        "params TEXT, result TEXT, timestamp TEXT NOT NULL)"
+    )
+    monkeypatch.setattr(job_queue, "_executor", None)
+    monkeypatch.setattr(job_queue, "JOB_WORKERS", 1)
+    yield job_queue
+    if job_queue._executor is not None:
+        job_queue._executor.shutdown(wait=True)
+
+
+def _wait_job(job_queue, job_id, timeout=60):
+    import time
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_queue.get_job(job_id, with_result=True)
+        if job["status"] in job_queue.JOB_FINISHED:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"任务超时: {job}")
+
+
+def test_schedule_job_runs_in_background_and_can_be_cancelled(job_db):
+    rows = _random_order_book(300, 4, seed=5)
+    first = job_db.submit_job("schedule", {"algorithm": "greedy", "inputData": rows})
+    second = job_db.submit_job("schedule", {"algorithm": "edd", "inputData": rows})
+    assert job_db.cancel_job(second)["status"] == "cancelled"  # 单个任务进程，第二个任务仍在排队
+
+    job = _wait_job(job_db, first)
+    assert job["status"] == "success" and job["progress"] == 1.0
+    expected, metrics = run_schedule_from_excel(rows, "greedy")
+    assert job["result"]["scheduleResult"] == expected
+    assert job["result"]["metrics"]["总延迟惩罚"] == metrics["总延迟惩罚"]
+    assert job["result"]["recordId"] == 1
+
+    assert _wait_job(job_db, second)["result"] is None
+    assert [j["jobId"] for j in job_db.list_jobs()] == [second, first]
+    assert job_db.get_job("missing") is None
+
+    failed = _wait_job(job_db, job_db.submit_job("schedule", {"algorithm": "greedy", "inputData": [{"订单编号": 1}]}))
+    assert failed["status"] == "failed" and failed["error"]
+    with pytest.raises(ValueError):
+        job_db.submit_job("unknown", {})
+
+
+def test_running_schedule_job_reports_progress_and_stops_on_cancel(job_db):
+    import time
+    rows = _random_order_book(300, 4, seed=6)
+    job_id = job_db.submit_job("schedule", {"algorithm": "greedy", "inputData": rows, "timeBudgetMs": 30000})
+
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        job = job_db.get_job(job_id)
+        if job["status"] == "running" and job["progress"] > 0.1:
+            break
+        time.sleep(0.05)
+    assert job["status"] == "running" and 0.1 < job["progress"] < 0.9  # 局部搜索过程中进度持续更新
+
+    started = time.time()
+    assert job_db.cancel_job(job_id)["status"] == "running"
+    job = _wait_job(job_db, job_id, timeout=10)
+    assert job["status"] == "cancelled" and job["result"] is None
+    assert time.time() - started < 5  # 远早于 30 秒搜索预算结束
+
+
+def test_recover_interrupted_jobs_marks_stale_jobs_failed(job_db):
+    from backend.utils.db_utils import execute_query
+    job_db._ensure_table()
+    for job_id, status in [("q", "queued"), ("r", "running"), ("s", "success")]:
+        execute_query("INSERT INTO jobs (id, kind, status, progress, params, created_at) VALUES (?, ?, ?, 0, '{}', ?)",
+                      (job_id, "schedule", status, job_db._now()))
+
+    assert job_db.recover_interrupted_jobs() == 2
+    assert [job_db.get_job(j)["status"] for j in ("q", "r", "s")] == ["failed", "failed", "success"]
+    assert job_db.get_job("r")["error"]
+    assert job_db.recover_interrupted_jobs() == 0
+
+
+def test_schedule_route_streams_only_when_stream_is_true(tmp_path, monkeypatch):
+    from backend.app import create_app
+    from backend.utils import db_utils
+    monkeypatch.setattr(db_utils, "DATABASE", str(tmp_path / "history.db"))
+    db_utils.execute_query(
+        "CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, module TEXT NOT NULL, algorithm TEXT NOT NULL, "
+        "params TEXT, result TEXT, timestamp TEXT NOT NULL)"
+    )
+    client = create_app().test_client()
+    rows = _random_order_book(20, 2, seed=7)
+
+    for flag in ("false", "true", 1, None):
+        resp = client.post("/api/schedule/run", json={"algorithm": "edd", "inputData": rows, "stream": flag})
+        assert resp.status_code == 200 and resp.mimetype == "application/json"
+        assert resp.get_json()["status"] == "success"
+
+    resp = client.post("/api/schedule/run", json={"algorithm": "edd", "inputData": rows, "stream": True})
+    assert resp.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert lines[-1]["type"] == "metrics"
+    assert sum(len(line["rows"]) for line in lines[:-1]) == len(client.post(
+        "/api/schedule/run", json={"algorithm": "edd", "inputData": rows}).get_json()["scheduleResult"])
+
+
+def test_portfolio_family_member_matches_direct_family_run(monkeypatch):
+    from backend.ml_models import scheduling
+    rows = _random_order_book(120, 3, seed=8)
+    direct = {name: run_schedule_from_excel(rows, algorithm=name, batch_size=20, switch_default=2)[1]
+              for name in SCHEDULERS}
+
+    _, metrics = run_schedule_from_excel(rows, algorithm="portfolio", batch_size=20, switch_default=2)
+    penalties = {r["算法"]: r["总延迟惩罚"] for r in metrics["算法对比"]}
+    assert penalties == {name: m["总延迟惩罚"] for name, m in direct.items()}
+
+    # family 胜出时，换线指标与单独运行 family 一致
+    monkeypatch.setattr(scheduling, "SCHEDULERS", {"family": scheduling.family_schedule})
+    results, metrics = run_schedule_from_excel(rows, algorithm="portfolio", batch_size=20, switch_default=2)
+    assert metrics.pop("最优算法") == "family" and len(metrics.pop("算法对比")) == 1
+    assert (results, metrics) == run_schedule_from_excel(rows, algorithm="family", batch_size=20, switch_default=2)
+
+
+def _load_bench_scheduling():
+    """benchmarks 不是包，按文件路径导入基准脚本"""
+    import importlib.util
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks", "bench_scheduling.py")
+    spec = importlib.util.spec_from_file_location("bench_scheduling", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_benchmark_regression_check_against_fabricated_baseline(tmp_path):
+    bench = _load_bench_scheduling()
+    baseline = [
+        {"订单数": 100, "算法": "edd", "耗时(ms)": 100.0, "峰值内存(MB)": 10.0, "总延迟惩罚": 50.0},
+        {"订单数": 100, "算法": "greedy", "耗时(ms)": 4.0, "峰值内存(MB)": 10.0, "总延迟惩罚": 50.0},
+    ]
+    record = dict(baseline[0], **{"耗时(ms)": 130.0, "峰值内存(MB)": 12.5, "总延迟惩罚": 50.0})
+    assert bench.check_regressions([record], baseline) == []  # 耗时在容差 + 余量内，内存恰在容差上
+    assert bench.check_regressions([dict(record, **{"订单数": 1000})], baseline) == []  # 基线中没有的组合不比较
+
+    slow = dict(baseline[0], **{"耗时(ms)": 136.0, "峰值内存(MB)": 12.6, "总延迟惩罚": 50.5})
+    problems = bench.check_regressions([slow], baseline)
+    assert len(problems) == 3 and all(p.startswith("edd @ 100 订单") for p in problems)
+    assert bench.check_regressions([slow], baseline, time_tolerance=0.5, memory_tolerance=0.5) == [problems[2]]
+
+    jitter = dict(baseline[1], **{"耗时(ms)": 13.0})  # 小规模用例的计时抖动由绝对余量吸收
+    assert bench.check_regressions([jitter], baseline) == []
+    assert len(bench.check_regressions([jitter], baseline, time_slack_ms=0.0)) == 1
+
+    # 命令行：结果优于基线时退出码为 0，延迟惩罚变差时为 1
+    args = ["--sizes", "20", "--algorithms", "edd", "--repeat", "1", "--machines", "2"]
+    output = tmp_path / "baseline.json"
+    assert bench.main(args + ["--output", str(output)]) == 0
+    records = json.loads(output.read_text(encoding="utf-8"))
+    loose = [dict(r, **{"耗时(ms)": 1e6, "峰值内存(MB)": 1e6}) for r in records]
+    output.write_text(json.dumps(loose), encoding="utf-8")
+    assert bench.main(args + ["--baseline", str(output)]) == 0
+    strict = [dict(r, **{"总延迟惩罚": r["总延迟惩罚"] - 1}) for r in loose]
+    output.write_text(json.dumps(strict), encoding="utf-8")
+    assert bench.main(args + ["--baseline", str(output)]) == 1
+
+
+def test_schedule_job_history_keeps_every_solve_argument(job_db):
+    from backend.utils.history_utils import get_record
+    rows = _random_order_book(60, 3, seed=10)
+    params = {"algorithm": "family", "inputData": rows, "timeBudgetMs": 0, "gapTolerance": 0.5,
+              "setupMatrix": [{"前产品型号": "A", "后产品型号": "B", "换线时间(h)": 3}]}
+    job = _wait_job(job_db, job_db.submit_job("schedule", params))
+    assert job["status"] == "success"
+
+    record = get_record("schedule", job["result"]["recordId"])
+    assert record["algorithm"] == "family"
+    assert record["params"] == {k: v for k, v in params.items() if k != "algorithm"}
+    assert record["result"]["planState"]["setup"]["hours"][0][1] == 3
+
+    # 由历史记录中的参数复现同一结果
+    p = record["params"]
+    rerun, metrics = run_schedule_from_excel(p["inputData"], algorithm=record["algorithm"], time_budget_ms=p["timeBudgetMs"],
+                                             setup_table=p["setupMatrix"], gap_tolerance=p["gapTolerance"])
+    assert rerun == job["result"]["scheduleResult"] and metrics == job["result"]["metrics"]
@@ -0,0 +1,181 @@
+import itertools
+
+import numpy as np
+
+from backend.ml_models.stock_optimization import (
+    lp_optimize, plan_cost, plan_deliveries, pso_optimize, run_stock, run_stock_multi, run_stock_scenarios,
+    ww_optimize
+)
+
+
+def _forecast_rows(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    demand = 100 + 20 * np.sin(np.arange(n) / 7 * 2 * np.pi) + rng.normal(0, 5, n)
+    return [{"日期": f"2025-11-{i % 30 + 1:02d}", "预测需求": float(v)} for i, v in enumerate(demand)]
+
+
+def _loop_cost(x, demands, holding_cost=1.0, shortage_cost=5.0):
+    """原实现的单粒子适应度"""
+    stock = np.cumsum(x - demands)
+    return holding_cost * np.sum(stock[stock > 0]) + shortage_cost * np.sum(np.abs(stock[stock < 0]))
+
+
+def test_pso_is_seeded_and_scores_match_loop_fitness():
+    demands = np.array([r["预测需求"] for r in _forecast_rows()])
+    limit = demands.max() * 0.8
+    best, score, info = pso_optimize(demands, limit, seed=7)
+    again, score_again, _ = pso_optimize(demands, limit, seed=7)
+    np.testing.assert_array_equal(best, again)
+    assert score == score_again
+    assert np.isclose(score, _loop_cost(best, demands))
+    assert (best >= 0).all() and (best <= limit).all()
+
+    # 停滞提前停止；关闭后跑满迭代次数，结果不劣于提前停止
+    assert info["提前停止"] and info["迭代次数"] < 100
+    _, full_score, full_info = pso_optimize(demands, limit, seed=7, patience=0)
+    assert full_info["迭代次数"] == 100 and full_score <= score
+
+
+def test_run_stock_pso_reproducible_with_seed():
+    rows = _forecast_rows(30)
+    result, chart = run_stock(rows, "pso", seed=1)
+    assert result == run_stock(rows, "pso", seed=1)[0]
+    assert len(result) == len(chart["y"]) == 30
+
+
+def test_sparse_lp_matches_dense_formulation():
+    from scipy.optimize import linprog
+
+    rng = np.random.default_rng(3)
+    for n in (5, 20, 60):
+        demands = rng.uniform(50, 150, n)
+        demands[0] = 30
+        limit = demands.max() * 0.8
+        # 原稠密模型：min Σx，累积补货 >= 累积需求
+        dense = linprog(np.ones(n), A_ub=-np.tril(np.ones((n, n))), b_ub=-np.cumsum(demands),
+                        bounds=[(0, limit)] * n, method="highs")
+        x, cost, _ = lp_optimize(demands, limit, allow_shortage=False)
+        assert dense.success
+        assert np.isclose(x.sum(), dense.fun)
+        assert (np.cumsum(x - demands) >= -1e-7).all()
+        assert np.isclose(cost, _loop_cost(x, demands))
+
+
+def test_sparse_lp_prices_shortage_when_capacity_is_short():
+    rows = _forecast_rows(10_000)
+    demands = np.array([r["预测需求"] for r in rows])
+    limit = demands.max() * 0.8
+    x, cost, info = lp_optimize(demands, limit)
+    assert info["允许缺货"] and (x <= limit + 1e-7).all()
+    assert np.isclose(cost, _loop_cost(x, demands), rtol=1e-6)
+    # LP 为精确最优，同一输入上不劣于 PSO
+    _, lp_cost, _ = lp_optimize(demands[:60], limit)
+    assert lp_cost <= pso_optimize(demands[:60], limit, seed=0)[1] + 1e-6
+
+    result, chart = run_stock(rows[:60], "lp")
+    assert len(result) == 60 and min(chart["y"]) >= 0
+
+
+def _sku_batch(k=4, n=28, seed=0):
+    batch = []
+    for i in range(k):
+        rows = _forecast_rows(n, seed + i)
+        batch.append({"seriesId": f"SKU-{i}", "forecastData": rows[i:]})  # 各 SKU 起始日期不同
+    return batch
+
+
+def test_multi_sku_without_capacity_equals_independent_plans():
+    batch = _sku_batch()
+    plans, usage, summary = run_stock_multi(batch)
+    assert summary["SKU数"] == 4 and summary["天数"] == 28
+    assert all(u["产能"] is None for u in usage)
+    independent = [lp_optimize([r["预测需求"] for r in b["forecastData"]], np.inf)[1] for b in batch]
+    assert np.isclose(summary["总成本"], sum(independent), atol=0.05)
+    # 缺失日期需求记 0：晚开始的 SKU 前几天不补货
+    assert plans[3]["stockResult"][0]["补货量"] == 0
+
+
+def test_multi_sku_shares_capacity_and_prices_bottleneck_days():
+    batch = _sku_batch()
+    free_cost = run_stock_multi(batch)[2]["总成本"]
+    plans, usage, summary = run_stock_multi(batch, capacity=380)
+    assert len(plans) == 4 and len(usage) == 28
+    assert all(u["补货总量"] <= 380 + 1e-6 for u in usage)
+    assert summary["总成本"] >= free_cost
+    # 影子价格只出现在产能用满的日期
+    for u in usage:
+        assert u["影子价格"] >= -1e-9
+        if u["影子价格"] > 1e-6:
+            assert u["利用率"] > 0.999
+    assert any(u["影子价格"] > 0 for u in usage)
+
+
+def _brute_force_lot_sizing(demands, ordering_cost, holding_cost):
+    """枚举全部订货期组合（第 0 期必订），每次订足到下次订货前"""
+    n, best = len(demands), np.inf
+    for mask in itertools.product([0, 1], repeat=n - 1):
+        periods = [0] + [t + 1 for t, m in enumerate(mask) if m]
+        x = np.zeros(n)
+        for a, b in zip(periods, periods[1:] + [n]):
+            x[a] = demands[a:b].sum()
+        best = min(best, plan_cost(x, demands, ordering_cost, holding_cost)["总成本"])
+    return best
+
+
+def test_wagner_whitin_is_exact():
+    rng = np.random.default_rng(5)
+    for _ in range(60):
+        n = int(rng.integers(1, 10))
+        demands = rng.integers(0, 40, n).astype(float)
+        demands[rng.random(n) < 0.3] = 0  # 含零需求期
+        ordering_cost, holding_cost = float(rng.choice([5, 30, 100, 500])), float(rng.choice([0.5, 1, 3]))
+        orders, cost, info = ww_optimize(demands, ordering_cost, holding_cost)
+        assert np.isclose(cost, _brute_force_lot_sizing(demands, ordering_cost, holding_cost))
+        assert np.isclose(plan_cost(orders, demands, ordering_cost, holding_cost)["总成本"], cost)
+        assert info["订货次数"] == int((orders > 0).sum())
+
+
+def test_run_stock_ww_never_short_and_batches_orders():
+    rows = _forecast_rows(60)
+    result, chart = run_stock(rows, "ww", ordering_cost=300.0, holding_cost=1.0)
+    levels = np.array(chart["y"])
+    assert len(result) == 60 and (levels >= 0).all()
+    # 订货成本高于单日持有成本：至少有一次订货覆盖两天以上，库存超过当日需求
+    demands = np.array([r["预测需求"] for r in rows])
+    assert (levels > 0).any()
+    orders, _, info = ww_optimize(demands, 300.0, 1.0)
+    assert info["订货次数"] < 60 and np.isclose(orders.sum(), demands.sum())
+
+
+def test_scenarios_dedupe_solves_by_relevant_costs():
+    rows = _forecast_rows(30)
+    table, summary = run_stock_scenarios(
+        rows, algorithms=["lp", "ww"], ordering_cost=[50, 200], holding_cost=[1, 2], shortage_cost=[5, 20],
+        demand_scale=[0.8, 1.2], parallel=False
+    )
+    # 每个算法 2×2×2 组成本 × 2 个需求缩放；lp 不用订货成本、ww 不用缺货成本，各只需求解 8 次
+    assert summary["情景数"] == 32 and summary["求解次数"] == 16
+    assert [r["情景"] for r in table] == list(range(32))
+
+    demands = np.array([r["预测需求"] for r in rows])
+    for r in table:
+        d = demands * r["demandScale"]
+        x = plan_deliveries(d, r["algorithm"], ordering_cost=r["orderingCost"], holding_cost=r["holdingCost"],
+                            shortage_cost=r["shortageCost"])
+        expected = plan_cost(x, d, r["orderingCost"], r["holdingCost"], r["shortageCost"])
+        assert np.isclose(r["总成本"], expected["总成本"], atol=0.01)
+
+
+def test_scenarios_evaluate_given_plans_without_solving():
+    rows = _forecast_rows(40)
+    demands = np.array([r["预测需求"] for r in rows])
+    plans = {"daily": demands.tolist(), "ww": plan_deliveries(demands, "ww").tolist()}
+    table, summary = run_stock_scenarios(rows, algorithms=[], plans=plans, holding_cost=[1, 3],
+                                         demand_scale=[0.8, 1.0, 1.2])
+    assert summary["求解次数"] == 0 and summary["情景数"] == 12
+    for r in table:
+        name = r["algorithm"].split(":", 1)[1]
+        expected = plan_cost(plans[name], demands * r["demandScale"], r["orderingCost"], r["holdingCost"],
+                             r["shortageCost"])
+        assert np.isclose(r["总成本"], expected["总成本"], atol=0.01)
+        assert r["订货次数"] == expected["订货次数"] and r["耗时(ms)"] is None
@@ -8,7 +8,7 @@ def execute_query(query, params=(), fetch=False):
     if fetch:
         result = cursor.fetchall()
     else:
-        result = None
+        result = cursor.lastrowid  # 写操作返回新记录 ID
     conn.commit()
     cursor.close()
     conn.close()
@@ -10,6 +10,7 @@ def save_history(module, algorithm, params, result):
     :param algorithm: 使用的算法名称，如 "EDD"、"ARIMA"、"PSO"
     :param params: 输入参数（通常为前端传入的原始数据）
     :param result: 计算结果（算法输出结果）
+    :return: 新记录 ID
     """
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -17,7 +18,7 @@ def save_history(module, algorithm, params, result):
     params_json = json.dumps(params, ensure_ascii=False)
     result_json = json.dumps(result, ensure_ascii=False)
 
-    execute_query(
+    record_id = execute_query(
         """
         INSERT INTO history (module, algorithm, params, result, timestamp)
         VALUES (?, ?, ?, ?, ?)
@@ -26,6 +27,7 @@ def save_history(module, algorithm, params, result):
     )
 
     print(f"✅ 已保存历史记录: 模块={module}, 算法={algorithm}, 时间={timestamp}")
+    return record_id
 
 
 def get_history(module, limit=20, start_time=None, end_time=None):
@@ -62,6 +64,29 @@ def get_history(module, limit=20, start_time=None, end_time=None):
     return history_list
 
 
+def get_record(module, record_id):
+    """
+    按 ID 获取单条历史记录，不存在时返回 None
+    """
+    rows = execute_query(
+        "SELECT id, module, algorithm, params, result, timestamp FROM history WHERE module=? AND id=?",
+        (module, record_id),
+        fetch=True
+    )
+    if not rows:
+        return None
+
+    row = rows[0]
+    return {
+        "recordId": row[0],
+        "module": row[1],
+        "algorithm": row[2],
+        "params": json.loads(row[3]),
+        "result": json.loads(row[4]),
+        "timestamp": row[5]
+    }
+
+
 def delete_record(module, record_id):
     """
     删除指定历史记录
@@ -0,0 +1,332 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from backend.config import JOB_WORKERS
+from backend.utils.db_utils import execute_query
+
+# 任务状态：queued -> running -> success / failed / cancelled
+JOB_FINISHED = ("success", "failed", "cancelled")
+REPORT_INTERVAL_S = 0.5  # 算法内部进度写库（并检查取消标记）的最小间隔
+
+_CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        params TEXT,
+        result TEXT,
+        error TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    )
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """任务在运行中被取消（由进度回调抛出）"""
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _ensure_table():
+    """旧数据库没有 jobs 表时自动创建"""
+    execute_query(_CREATE_SQL)
+
+
+def _get_executor():
+    """
+    任务进程池按需创建：计算在独立进程中进行，不占用 Web worker 的线程与 GIL
+    每个 Web worker 各有一个进程池，任务进程总数 = gunicorn workers × JOB_WORKERS
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max(1, JOB_WORKERS))
+        return _executor
+
+
+def _stage(report, lo, hi):
+    """
+    把算法内部进度（0~1）映射为任务进度 [lo, hi] 的回调，传入算法的长循环
+    按时间节流：距上次写库不足 REPORT_INTERVAL_S 的调用直接返回；
+    每次写库同时检查取消标记，已请求取消时由 report 抛出 JobCancelled，中断算法循环
+    """
+    last = [float("-inf")]
+
+    def progress(fraction, message=None):
+        now = time.monotonic()
+        if now - last[0] < REPORT_INTERVAL_S and fraction < 1:
+            return
+        last[0] = now
+        report(lo + (hi - lo) * min(max(float(fraction), 0.0), 1.0), message)
+    return progress
+
+
+#任务执行函数：runner(params, report) -> 可 JSON 序列化的结果
+#长循环（回测折、批量序列、PSO 迭代、组合调度成员、局部搜索迭代、情景求解）通过 _stage 上报进度并响应取消；
+#单次求解器调用（一次模型拟合、一次 LP）期间无法中断，在其前后的进度节点检查取消
+def _run_forecast_job(params, report):
+    from backend.ml_models.demand_forecast import run_forecast
+    from backend.ml_models.forecast_backtest import backtest_models
+    from backend.utils.history_utils import save_history
+
+    algorithm, input_data = params.get('algorithm'), params.get('inputData')
+    # auto：与 /api/forecast/run 相同，先滚动起点回测选出最优模型
+    selection = None
+    if algorithm == 'auto':
+        report(0.05, "回测选择模型")
+        selection = backtest_models(input_data, progress=_stage(report, 0.05, 0.6))
+        algorithm = selection["最优模型"]
+    report(0.6 if selection else 0.1, "拟合预测模型")
+    forecast_result, chart_data, _ = run_forecast(
+        input_data, algorithm, arima_search=params.get('arimaSearch', 'stepwise'), time_cap_s=params.get('timeCapS')
+    )
+    report(0.9, "保存历史记录")
+    result = {"forecastResult": forecast_result, "chartData": chart_data}
+    record_id = save_history(module="forecast", algorithm=algorithm, params={"inputData": input_data}, result=result)
+    return dict(result, recordId=record_id, algorithm=algorithm, modelSelection=selection)
+
+
+def _run_forecast_batch_job(params, report):
+    from backend.ml_models.demand_forecast import FITTERS, iter_batch_forecast
+    from backend.utils.history_utils import save_history
+
+    algorithm, input_data, forecast_days = params.get('algorithm'), params.get('inputData'), params.get('forecastDays')
+    if algorithm not in FITTERS:
+        raise ValueError(f"Unsupported algorithm: 请选择 {' / '.join(FITTERS)}")
+    report(0.05, "批量预测")
+    series = list(iter_batch_forecast(input_data, algorithm, forecast_days=forecast_days,
+                                      parallel=params.get('parallel', True), progress=_stage(report, 0.05, 0.9)))
+    failures = [{"seriesId": r["seriesId"], "msg": r.get("msg")} for r in series if r["status"] != "success"]
+    summary = {"序列数": len(series), "成功": len(series) - len(failures), "失败": len(failures),
+               "缓存命中": sum(int(r.get("cached", False)) for r in series)}
+    report(0.9, "保存历史记录")
+    record_id = save_history(module="forecast", algorithm=f"{algorithm}-batch",
+                             params={"seriesCount": len(series), "forecastDays": forecast_days},
+                             result={"summary": summary, "failures": failures})
+    return {"series": series, "summary": summary, "recordId": record_id}
+
+
+def _run_stock_job(params, report):
+    from backend.ml_models.stock_optimization import run_stock
+    from backend.utils.history_utils import save_history
+
+    algorithm, forecast_data = params.get('algorithm'), params.get('forecastData')
+    report(0.1, "库存优化计算")
+    stock_result, chart_data = run_stock(
+        forecast_data, algorithm, seed=params.get('seed'), ordering_cost=float(params.get('orderingCost', 100.0)),
+        holding_cost=float(params.get('holdingCost', 1.0)), shortage_cost=float(params.get('shortageCost', 5.0)),
+        progress=_stage(report, 0.1, 0.9)
+    )
+    report(0.9, "保存历史记录")
+    result = {"stockResult": stock_result, "chartData": chart_data}
+    record_id = save_history(module="stock", algorithm=algorithm, params={"forecastData": forecast_data}, result=result)
+    return dict(result, recordId=record_id)
+
+
+def _run_stock_multi_job(params, report):
+    from backend.ml_models.stock_optimization import run_stock_multi
+    from backend.utils.history_utils import save_history
+
+    batch = params.get('batch')
+    report(0.1, f"多 SKU 联合 LP 求解（{len(batch or [])} 个 SKU，求解期间无法中断）")
+    plans, capacity_usage, summary = run_stock_multi(
+        batch, capacity=params.get('capacity'),
+        holding_cost=params.get('holdingCost', 1.0), shortage_cost=params.get('shortageCost', 5.0)
+    )
+    report(0.9, "保存历史记录")
+    record_id = save_history(module="stock", algorithm="lp-multi",
+                             params={"batch": batch, "capacity": params.get('capacity')},
+                             result={"summary": summary, "capacityUsage": capacity_usage})
+    return {"plans": plans, "capacityUsage": capacity_usage, "summary": summary, "recordId": record_id}
+
+
+def _run_stock_scenarios_job(params, report):
+    from backend.ml_models.stock_optimization import run_stock_scenarios
+    from backend.utils.history_utils import save_history
+
+    report(0.1, "库存情景分析")
+    rows, summary = run_stock_scenarios(
+        params.get('forecastData'), algorithms=params.get('algorithms'),
+        ordering_cost=params.get('orderingCost'), holding_cost=params.get('holdingCost'),
+        shortage_cost=params.get('shortageCost'), demand_scale=params.get('demandScale'),
+        plans=params.get('plans'), seed=params.get('seed'), parallel=params.get('parallel', True),
+        progress=_stage(report, 0.1, 0.9)
+    )
+    report(0.9, "保存历史记录")
+    record_id = save_history(module="stock", algorithm="scenarios",
+                             params={k: v for k, v in params.items() if k != 'plans'},
+                             result={"scenarios": rows, "summary": summary})
+    return {"scenarios": rows, "summary": summary, "recordId": record_id}
+
+
+def _run_schedule_job(params, report):
+    from backend.ml_models.scheduling import run_schedule_from_excel
+    from backend.utils.history_utils import save_history
+
+    algorithm, input_data = params.get('algorithm', 'edd'), params.get('inputData')
+    time_budget_ms = params.get('timeBudgetMs', 0)
+    setup_table, gap_tolerance = params.get('setupMatrix'), params.get('gapTolerance')
+    report(0.1, "排产计算")
+    schedule_result, metrics, plan_state = run_schedule_from_excel(
+        input_data, algorithm=algorithm, return_state=True, time_budget_ms=time_budget_ms,
+        setup_table=setup_table, gap_tolerance=gap_tolerance,
+        progress=_stage(report, 0.1, 0.9)
+    )
+    report(0.9, "保存历史记录")
+    # 保存全部求解参数，便于从历史记录复现或审计
+    record_id = save_history(
+        module="schedule",
+        algorithm=algorithm,
+        params={"inputData": input_data, "timeBudgetMs": time_budget_ms, "setupMatrix": setup_table,
+                "gapTolerance": gap_tolerance},
+        result={"result": schedule_result, "metrics": metrics, "planState": plan_state}
+    )
+    return {"scheduleResult": schedule_result, "metrics": metrics, "recordId": record_id}
+
+
+JOB_RUNNERS = {
+    "forecast": _run_forecast_job,
+    "forecast_batch": _run_forecast_batch_job,
+    "stock": _run_stock_job,
+    "stock_multi": _run_stock_multi_job,
+    "stock_scenarios": _run_stock_scenarios_job,
+    "schedule": _run_schedule_job,
+}
+
+
+def _update_job(job_id, **fields):
+    columns = ", ".join(f"{k}=?" for k in fields)
+    execute_query(f"UPDATE jobs SET {columns} WHERE id=?", (*fields.values(), job_id))
+
+
+def _execute_job(job_id, kind, params):
+    """
+    在任务进程中执行（模块级函数，可被子进程导入）
+    进度回调写入 jobs 表，同时检查取消标记，已请求取消时抛出 JobCancelled 结束任务
+    """
+    def report(progress, message=None):
+        rows = execute_query("SELECT cancel_requested FROM jobs WHERE id=?", (job_id,), fetch=True)
+        if rows and rows[0][0]:
+            raise JobCancelled()
+        _update_job(job_id, progress=float(progress), message=message)
+
+    try:
+        report(0.0, "开始运行")
+        _update_job(job_id, status="running", started_at=_now())
+        result = JOB_RUNNERS[kind](params, report)
+        _update_job(job_id, status="success", progress=1.0, message="完成",
+                    result=json.dumps(result, ensure_ascii=False), finished_at=_now())
+        print(f"✅ 任务完成: {kind} {job_id}")
+    except JobCancelled:
+        _update_job(job_id, status="cancelled", message="已取消", finished_at=_now())
+        print(f"🛑 任务已取消: {kind} {job_id}")
+    except Exception as e:
+        import traceback
+        print(f"❌ 任务失败: {kind} {job_id}", e)
+        print(traceback.format_exc())
+        _update_job(job_id, status="failed", message="运行失败", error=str(e), finished_at=_now())
+
+
+def submit_job(kind, params):
+    """
+    提交后台任务，立即返回任务 ID
+    :param kind: 任务类型，见 JOB_RUNNERS（'forecast' / 'forecast_batch' / 'stock' / 'stock_multi' /
+                 'stock_scenarios' / 'schedule'）
+    :param params: 与对应同步接口相同的请求体
+    """
+    if kind not in JOB_RUNNERS:
+        raise ValueError(f"不支持的任务类型: {kind}，请选择 {' / '.join(JOB_RUNNERS)}")
+    _ensure_table()
+    job_id = uuid.uuid4().hex
+    execute_query(
+        "INSERT INTO jobs (id, kind, status, progress, message, params, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (job_id, kind, "queued", 0.0, "排队中", json.dumps(params, ensure_ascii=False), _now())
+    )
+    _get_executor().submit(_execute_job, job_id, kind, params)
+    print(f"📨 已提交任务: {kind} {job_id}（进程 {os.getpid()}）")
+    return job_id
+
+
+def get_job(job_id, with_result=False):
+    """查询任务状态（with_result=True 时附带结果），不存在返回 None"""
+    _ensure_table()
+    rows = execute_query(
+        "SELECT id, kind, status, progress, message, error, created_at, started_at, finished_at, result "
+        "FROM jobs WHERE id=?", (job_id,), fetch=True
+    )
+    if not rows:
+        return None
+    r = rows[0]
+    job = {
+        "jobId": r[0], "kind": r[1], "status": r[2], "progress": r[3], "message": r[4], "error": r[5],
+        "createdAt": r[6], "startedAt": r[7], "finishedAt": r[8],
+    }
+    if with_result:
+        job["result"] = json.loads(r[9]) if r[9] else None
+    return job
+
+
+def list_jobs(status=None, limit=20):
+    """按提交时间倒序列出任务（不含结果）"""
+    _ensure_table()
+    query = "SELECT id FROM jobs"
+    params = ()
+    if status:
+        query += " WHERE status=?"
+        params = (status,)
+    query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    return [get_job(r[0]) for r in execute_query(query, params + (int(limit),), fetch=True)]
+
+
+def cancel_job(job_id):
+    """
+    请求取消任务：排队中的任务直接标记为已取消；运行中的任务在下次进度回调时结束
+    （长循环中至少每 REPORT_INTERVAL_S 秒检查一次；单次模型拟合 / LP 求解结束后才会检查）
+    :return: 取消后的任务状态，任务不存在返回 None
+    """
+    job = get_job(job_id)
+    if job is None:
+        return None
+    if job["status"] in JOB_FINISHED:
+        return job
+    execute_query("UPDATE jobs SET cancel_requested=1 WHERE id=?", (job_id,))
+    execute_query(
+        "UPDATE jobs SET status='cancelled', message='已取消', finished_at=? WHERE id=? AND status='queued'",
+        (_now(), job_id)
+    )
+    return get_job(job_id)
+
+
+def recover_interrupted_jobs():
+    """
+    服务启动时调用一次：上次服务退出时仍为 queued / running 的任务已没有进程执行，标记为失败
+    只能在启动阶段调用（gunicorn 主进程 on_starting 钩子 / 开发服务器入口），
+    不能在各 worker 中调用，否则会把其他 worker 正在运行的任务误判为中断
+    :return: 标记为失败的任务数
+    """
+    _ensure_table()
+    rows = execute_query("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')", fetch=True)
+    count = rows[0][0] if rows else 0
+    if count:
+        execute_query(
+            "UPDATE jobs SET status='failed', message='服务重启，任务中断', error=?, finished_at=? "
+            "WHERE status IN ('queued', 'running')",
+            ("服务重启时任务尚未完成", _now())
+        )
+        print(f"⚠️ 已将 {count} 个中断的任务标记为失败")
+    return count
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.config import MODEL_CACHE_DIR, MODEL_CACHE_DISK_SIZE, MODEL_CACHE_SIZE
+
+# 进程内 LRU 缓存：key -> 已拟合模型
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+
+def series_fingerprint(ts, algorithm, **params):
+    """
+    时间序列指纹：日期、数值、算法及影响拟合的参数共同决定缓存键
+    同一份序列无论来自 Excel 还是前端 JSON、单序列还是批量预测，只要日期与数值一致即命中
+    params: 影响拟合结果的参数（由 demand_forecast 按拟合函数默认值归一后传入）
+    """
+    h = hashlib.sha256()
+    h.update(str(algorithm).encode("utf-8"))
+    for k in sorted(params):
+        h.update(f"|{k}={params[k]!r}".encode("utf-8"))
+    index = ts.index
+    if hasattr(index, "as_unit"):
+        # 日期精度统一为纳秒：pandas 解析日期字符串与由 datetime64[ns] 数组构造得到的精度可能不同
+        index = index.as_unit("ns")
+    h.update(np.asarray(index.asi8 if hasattr(index, "asi8") else index, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(ts.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def _disk_path(key):
+    return os.path.join(MODEL_CACHE_DIR, f"{key}.pkl")
+
+
+def _disk_get(key):
+    """从磁盘缓存读取（多个 gunicorn worker 共享），命中时刷新修改时间用于 LRU"""
+    path = _disk_path(key)
+    try:
+        with open(path, "rb") as f:
+            model = pickle.load(f)
+        os.utime(path)
+        return model
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print("⚠️ 模型缓存文件损坏，已忽略：", path, e)
+        return None
+
+
+def _disk_put(key, model):
+    """原子写入磁盘缓存，超出容量时按修改时间淘汰最久未用的文件"""
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, _disk_path(key))
+
+    entries = []
+    for name in os.listdir(MODEL_CACHE_DIR):
+        if name.endswith(".pkl"):
+            path = os.path.join(MODEL_CACHE_DIR, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) - MODEL_CACHE_DISK_SIZE)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_cached_model(key):
+    """按键取已拟合模型：先查进程内 LRU，再查磁盘缓存（若启用），未命中返回 None"""
+    with _lock:
+        model = _cache.get(key)
+        if model is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return model
+
+    if MODEL_CACHE_DIR:
+        model = _disk_get(key)
+        if model is not None:
+            with _lock:
+                _stats["disk_hits"] += 1
+                _remember(key, model)
+            return model
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def _remember(key, model):
+    """写入进程内 LRU（调用方持有锁）"""
+    _cache[key] = model
+    _cache.move_to_end(key)
+    while len(_cache) > MODEL_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def put_cached_model(key, model):
+    """缓存已拟合模型（进程内 LRU + 可选磁盘持久化）"""
+    if MODEL_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        _remember(key, model)
+    if MODEL_CACHE_DIR:
+        try:
+            _disk_put(key, model)
+        except Exception as e:
+            print("⚠️ 模型缓存写入磁盘失败：", e)
+
+
+def clear_model_cache():
+    """清空进程内缓存与统计（磁盘缓存保留）"""
+    with _lock:
+        _cache.clear()
+        for k in _stats:
+            _stats[k] = 0
+
+
+def model_cache_stats():
+    """缓存命中统计"""
+    with _lock:
+        return dict(_stats, size=len(_cache), capacity=MODEL_CACHE_SIZE)
@@ -0,0 +1,75 @@
+from backend.utils.db_utils import execute_query
+from datetime import datetime
+import json
+import pickle
+
+_CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS model_registry (
+        name TEXT PRIMARY KEY,
+        algorithm TEXT NOT NULL,
+        model BLOB NOT NULL,
+        meta TEXT,
+        updated_at TEXT NOT NULL
+    )
+"""
+
+
+def _ensure_table():
+    """旧数据库没有 model_registry 表时自动创建"""
+    execute_query(_CREATE_SQL)
+
+
+def save_model(name, algorithm, model, meta):
+    """
+    保存（覆盖）已拟合模型
+    :param name: 模型名称（由前端指定，如 "产品A日需求"）
+    :param algorithm: 算法名称，如 "arima"、"exp_smooth"
+    :param model: 已拟合模型对象（pickle 序列化后存入数据库，多 worker 共享）
+    :param meta: 模型元信息（最后日期、样本数、残差基线等）
+    """
+    _ensure_table()
+    updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    execute_query(
+        """
+        INSERT OR REPLACE INTO model_registry (name, algorithm, model, meta, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (name, algorithm, pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL),
+         json.dumps(meta, ensure_ascii=False), updated_at)
+    )
+    print(f"✅ 已保存模型: {name}（{algorithm}），时间={updated_at}")
+
+
+def load_model(name):
+    """
+    读取已保存模型
+    :return: (model, meta)，不存在时返回 (None, None)
+    """
+    _ensure_table()
+    rows = execute_query("SELECT model, meta FROM model_registry WHERE name=?", (name,), fetch=True)
+    if not rows:
+        return None, None
+    model_blob, meta = rows[0]
+    return pickle.loads(model_blob), json.loads(meta) if meta else {}
+
+
+def load_model_meta(name):
+    """只读取模型元信息（如上次选出的 ARIMA 阶数），不反序列化模型，不存在时返回 None"""
+    _ensure_table()
+    rows = execute_query("SELECT meta FROM model_registry WHERE name=?", (name,), fetch=True)
+    if not rows:
+        return None
+    return json.loads(rows[0][0]) if rows[0][0] else {}
+
+
+def list_models():
+    """列出已保存模型的元信息（不加载模型本身）"""
+    _ensure_table()
+    rows = execute_query(
+        "SELECT name, algorithm, meta, updated_at FROM model_registry ORDER BY updated_at DESC",
+        fetch=True
+    )
+    return [
+        {"name": r[0], "algorithm": r[1], "meta": json.loads(r[2]) if r[2] else {}, "updated_at": r[3]}
+        for r in rows
+    ]
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+
+def generate_order_book(num_orders, ops_per_order=(1, 4), num_machines=4, eligibility=0.5, num_products=3,
+                        proc_time_range=(0.5, 8.0), due_slack_hours=(8, 200), arrival_days=5,
+                        start_date="2025-10-01", seed=0):
+    """
+    生成可复现的合成订单簿（与排产接口 inputData 格式相同）
+    -------------------------------------------------------
+    参数:
+        num_orders: 订单数
+        ops_per_order: 每个订单工序数范围 (最少, 最多)，含两端
+        num_machines: 机器数（机器名为 M1..Mn）
+        eligibility: 可选机器密度，每道工序对每台机器可选的概率（每道工序至少一台可选机器）
+        num_products: 产品型号数（P1..Pn）
+        proc_time_range: 加工时间范围（小时），保留 1 位小数
+        due_slack_hours: 交期相对到达日期的小时数范围
+        arrival_days: 到达日期分布在 start_date 之后的天数范围
+        start_date: 最早到达日期
+        seed: 随机种子，相同参数与种子生成完全相同的订单簿
+    返回:
+        rows: list[dict]，列为 订单编号 / 产品型号 / 工序编号 / 分配机器 / 加工时间(h) / 最晚交付日期 / 到达日期
+    """
+    rng = np.random.default_rng(seed)
+    lo, hi = ops_per_order
+    n_ops = rng.integers(lo, hi + 1, size=num_orders)
+    total = int(n_ops.sum())
+
+    #订单级属性
+    entry = pd.Timestamp(start_date) + pd.to_timedelta(rng.integers(0, arrival_days + 1, size=num_orders), unit="D")
+    due = entry + pd.to_timedelta(rng.integers(due_slack_hours[0], due_slack_hours[1] + 1, size=num_orders), unit="h")
+    products = np.char.add("P", (rng.integers(0, num_products, size=num_orders) + 1).astype(str))
+    order_ids = np.char.add("O", np.char.zfill(np.arange(num_orders).astype(str), len(str(max(num_orders - 1, 0)))))
+
+    #工序级属性：订单下标按工序展开，工序编号为订单内序号
+    op_order = np.repeat(np.arange(num_orders), n_ops)
+    op_no = np.arange(total) - np.repeat(np.cumsum(n_ops) - n_ops, n_ops) + 1
+    proc = np.round(rng.uniform(proc_time_range[0], proc_time_range[1], size=total), 1)
+    proc = np.maximum(proc, 0.1)
+
+    #可选机器：按密度抽样，空集时随机补一台
+    machines = np.asarray([f"M{i}" for i in range(1, num_machines + 1)], dtype=object)
+    eligible = rng.random((total, num_machines)) < eligibility
+    empty = ~eligible.any(axis=1)
+    eligible[np.flatnonzero(empty), rng.integers(0, num_machines, size=int(empty.sum()))] = True
+    machine_text = [",".join(machines[row]) for row in eligible]
+
+    entry_text = entry.strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+    due_text = due.strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+    return pd.DataFrame({
+        "订单编号": order_ids[op_order],
+        "产品型号": products[op_order],
+        "工序编号": op_no,
+        "分配机器": machine_text,
+        "加工时间(h)": proc,
+        "最晚交付日期": due_text[op_order],
+        "到达日期": entry_text[op_order],
+    }).to_dict("records")
@@ -0,0 +1,143 @@
+"""
+排产算法基准测试
+-------------------------------------------------------
+用 backend.utils.workload_utils 生成可复现的订单簿，按规模逐个运行排产算法，
+记录耗时（多次取中位数）、峰值内存（tracemalloc）与总延迟惩罚。
+
+用法（在项目根目录下运行）:
+    python benchmarks/bench_scheduling.py                               # 默认规模与算法
+    python benchmarks/bench_scheduling.py --sizes 1000,10000 --algorithms edd,greedy
+    python benchmarks/bench_scheduling.py --output benchmarks/baseline.json   # 保存为基线
+    python benchmarks/bench_scheduling.py --baseline benchmarks/baseline.json # 与基线对比，回退时退出码为 1
+
+基线不随仓库提交：耗时与峰值内存取决于机器与 Python / numpy 版本，只能与同一台机器上的结果比较。
+检查某次改动时，先在改动前的代码上用相同参数（--sizes / --algorithms / --machines / --seed）保存基线，
+再在改动后的代码上加 --baseline 运行；基线中没有的（订单数, 算法）组合不参与比较。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ml_models.scheduling import run_schedule_from_excel  # noqa: E402
+from backend.utils.workload_utils import generate_order_book  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_ALGORITHMS = ["edd", "greedy", "batch", "insertion", "family"]
+
+
+def _run_once(rows, algorithm):
+    """运行一次排产（屏蔽算法内部打印），返回总延迟惩罚"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, metrics = run_schedule_from_excel(rows, algorithm=algorithm)
+    return metrics["总延迟惩罚"]
+
+
+def benchmark(sizes, algorithms, repeat=3, num_machines=8, eligibility=0.5, seed=0):
+    """
+    逐规模、逐算法运行基准测试
+    返回:
+        records: list[dict]，每条为 {订单数, 工序数, 算法, 耗时(ms), 峰值内存(MB), 总延迟惩罚}
+    """
+    records = []
+    for size in sizes:
+        rows = generate_order_book(size, num_machines=num_machines, eligibility=eligibility, seed=seed)
+        for algorithm in algorithms:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                penalty = _run_once(rows, algorithm)
+                timings.append((time.perf_counter() - started) * 1000.0)
+
+            # 峰值内存单独测一次，避免 tracemalloc 的开销计入耗时
+            tracemalloc.start()
+            _run_once(rows, algorithm)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            record = {
+                "订单数": size,
+                "工序数": len(rows),
+                "算法": algorithm,
+                "耗时(ms)": round(statistics.median(timings), 1),
+                "峰值内存(MB)": round(peak / 2 ** 20, 2),
+                "总延迟惩罚": penalty,
+            }
+            records.append(record)
+            print(f"{size:>8} {len(rows):>8} {algorithm:>10} {record['耗时(ms)']:>10.1f} ms "
+                  f"{record['峰值内存(MB)']:>8.2f} MB  惩罚 {penalty}")
+    return records
+
+
+def check_regressions(records, baseline, time_tolerance=0.25, memory_tolerance=0.25, time_slack_ms=10.0):
+    """
+    与基线对比：耗时或峰值内存超出容差、或延迟惩罚变差即视为回退
+    耗时另有绝对余量 time_slack_ms，避免小规模用例的计时抖动误报
+    返回:
+        problems: 回退说明列表（为空表示通过）
+    """
+    base = {(r["订单数"], r["算法"]): r for r in baseline}
+    problems = []
+    for r in records:
+        b = base.get((r["订单数"], r["算法"]))
+        if b is None:
+            continue
+        label = f"{r['算法']} @ {r['订单数']} 订单"
+        if r["耗时(ms)"] > b["耗时(ms)"] * (1 + time_tolerance) + time_slack_ms:
+            problems.append(f"{label}: 耗时 {b['耗时(ms)']} -> {r['耗时(ms)']} ms")
+        if r["峰值内存(MB)"] > b["峰值内存(MB)"] * (1 + memory_tolerance):
+            problems.append(f"{label}: 峰值内存 {b['峰值内存(MB)']} -> {r['峰值内存(MB)']} MB")
+        if r["总延迟惩罚"] > b["总延迟惩罚"] + 1e-6:
+            problems.append(f"{label}: 总延迟惩罚 {b['总延迟惩罚']} -> {r['总延迟惩罚']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="排产算法基准测试")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="订单数列表，逗号分隔")
+    parser.add_argument("--algorithms", default=",".join(DEFAULT_ALGORITHMS), help="算法列表，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每个组合的计时次数（取中位数）")
+    parser.add_argument("--machines", type=int, default=8, help="机器数")
+    parser.add_argument("--eligibility", type=float, default=0.5, help="可选机器密度")
+    parser.add_argument("--seed", type=int, default=0, help="订单簿随机种子")
+    parser.add_argument("--output", help="结果保存路径（JSON）")
+    parser.add_argument("--baseline", help="基线结果路径（JSON），用于回退检查")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="耗时容差（比例）")
+    parser.add_argument("--time-slack-ms", type=float, default=10.0, help="耗时绝对余量（毫秒）")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="峰值内存容差（比例）")
+    args = parser.parse_args(argv)
+
+    records = benchmark(
+        [int(s) for s in args.sizes.split(",") if s.strip()],
+        [a.strip() for a in args.algorithms.split(",") if a.strip()],
+        repeat=args.repeat, num_machines=args.machines, eligibility=args.eligibility, seed=args.seed,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = check_regressions(records, baseline, args.time_tolerance, args.memory_tolerance,
+                                     args.time_slack_ms)
+        if problems:
+            print("❌ 发现性能回退：")
+            for p in problems:
+                print("  -", p)
+            return 1
+        print("✅ 未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
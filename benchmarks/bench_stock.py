@@ -0,0 +1,96 @@
+"""
+库存优化算法基准测试
+-------------------------------------------------------
+按计划天数生成可复现的预测需求（forecastData 格式），对同一输入逐个运行 lp / pso / ww，
+记录耗时（多次取中位数），并用 plan_cost 按统一口径（订货成本 + 持有成本 + 缺货惩罚）评估方案。
+lp / pso 受每日补货上限约束、不计订货成本；ww 不限产能，因此同时列出各成本分项。
+
+用法（在项目根目录下运行）:
+    python benchmarks/bench_stock.py                                   # 默认规模与算法
+    python benchmarks/bench_stock.py --sizes 30,365 --algorithms lp,ww --ordering-cost 200
+    python benchmarks/bench_stock.py --output benchmarks/stock.json     # 保存结果
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ml_models.stock_optimization import plan_cost, plan_deliveries  # noqa: E402
+
+DEFAULT_SIZES = [30, 365, 3650]
+DEFAULT_ALGORITHMS = ["lp", "pso", "ww"]
+
+
+def generate_forecast(n, seed=0):
+    """周季节 + 噪声的预测需求，格式与 /api/stock/run 的 forecastData 相同"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    demand = np.clip(100 + 30 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 10, n), 0, None)
+    start = np.datetime64("2025-01-01")
+    return [{"日期": str(start + i), "预测需求": round(float(v), 2)} for i, v in enumerate(demand)]
+
+
+def benchmark(sizes, algorithms, repeat=3, ordering_cost=100.0, holding_cost=1.0, shortage_cost=5.0, seed=0):
+    """
+    逐规模、逐算法运行基准测试
+    返回:
+        records: list[dict]，每条为 {天数, 算法, 耗时(ms), 总成本, 订货成本, 持有成本, 缺货成本, 订货次数}
+    """
+    records = []
+    for size in sizes:
+        demands = np.array([r["预测需求"] for r in generate_forecast(size, seed)])
+        for algorithm in algorithms:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    deliveries = plan_deliveries(demands, algorithm, seed=seed, ordering_cost=ordering_cost,
+                                                 holding_cost=holding_cost, shortage_cost=shortage_cost)
+                timings.append((time.perf_counter() - started) * 1000.0)
+
+            cost = plan_cost(deliveries, demands, ordering_cost, holding_cost, shortage_cost)
+            record = {"天数": size, "算法": algorithm, "耗时(ms)": round(statistics.median(timings), 1)}
+            record.update({k: round(v, 2) for k, v in cost.items()})
+            records.append(record)
+            print(f"{size:>8} {algorithm:>6} {record['耗时(ms)']:>10.1f} ms  总成本 {record['总成本']:>14.2f}"
+                  f"  (订货 {record['订货成本']:.0f} / 持有 {record['持有成本']:.0f} / 缺货 {record['缺货成本']:.0f}"
+                  f"，{record['订货次数']} 次订货)")
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="库存优化算法基准测试")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="计划天数列表，逗号分隔")
+    parser.add_argument("--algorithms", default=",".join(DEFAULT_ALGORITHMS), help="算法列表，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每个组合的计时次数（取中位数）")
+    parser.add_argument("--ordering-cost", type=float, default=100.0, help="每次订货固定成本")
+    parser.add_argument("--holding-cost", type=float, default=1.0, help="单位库存每日持有成本")
+    parser.add_argument("--shortage-cost", type=float, default=5.0, help="单位缺货每日惩罚成本")
+    parser.add_argument("--seed", type=int, default=0, help="需求与 PSO 随机种子")
+    parser.add_argument("--output", help="结果保存路径（JSON）")
+    args = parser.parse_args(argv)
+
+    records = benchmark(
+        [int(s) for s in args.sizes.split(",") if s.strip()],
+        [a.strip() for a in args.algorithms.split(",") if a.strip()],
+        repeat=args.repeat, ordering_cost=args.ordering_cost, holding_cost=args.holding_cost,
+        shortage_cost=args.shortage_cost, seed=args.seed,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
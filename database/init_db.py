@@ -40,6 +40,31 @@ CREATE TABLE IF NOT EXISTS stock (
     date TEXT PRIMARY KEY,
     stock INTEGER NOT NULL
 );
+
+-- 预测模型注册表
+CREATE TABLE IF NOT EXISTS model_registry (
+    name TEXT PRIMARY KEY,
+    algorithm TEXT NOT NULL,
+    model BLOB NOT NULL,
+    meta TEXT,
+    updated_at TEXT NOT NULL
+);
+
+-- 后台任务表
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    params TEXT,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
 """
 
 DEMO_DATA = {
@@ -36,3 +36,32 @@ CREATE TABLE IF NOT EXISTS stock (
     date TEXT PRIMARY KEY,
     stock INTEGER NOT NULL
 );
+
+-- ==========================
+-- 预测模型注册表：已拟合模型（pickle）及元信息，供增量更新
+-- ==========================
+CREATE TABLE IF NOT EXISTS model_registry (
+    name TEXT PRIMARY KEY,
+    algorithm TEXT NOT NULL,
+    model BLOB NOT NULL,
+    meta TEXT,                  -- JSON 元信息（最后日期、样本数、残差基线等）
+    updated_at TEXT NOT NULL
+);
+
+-- ==========================
+-- 后台任务表：长时间运行的预测 / 库存 / 排产任务的状态、进度与结果
+-- ==========================
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,         -- forecast / stock / schedule
+    status TEXT NOT NULL,       -- queued / running / success / failed / cancelled
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    params TEXT,                -- JSON 请求参数
+    result TEXT,                -- JSON 运行结果
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
@@ -1,6 +1,7 @@
 # 文件名: gunicorn_config.py
 # 功能: Gunicorn 配置文件，适用于 Flask 生产环境
 
+import gc
 import multiprocessing
 import os
 
@@ -13,6 +14,36 @@ threads = 2  # 每个worker使用2个线程
 timeout = 120  # 请求超时时间（秒）
 keepalive = 5  # 长连接保持时间（秒）
 
+# --------------------------
+# 预加载模式（默认开启，GUNICORN_PRELOAD=0 关闭）
+# --------------------------
+# 主进程先加载应用并预热算法依赖库，再 fork 出 worker：各 worker 以写时复制方式共享已导入的模块，
+# 启动 / 重启 worker 不再重复导入，单个 worker 的独占内存也更小。
+# 注意：预加载模式下 HUP 信号只重启 worker，不会重新加载代码，更新代码需重启主进程。
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# --------------------------
+# 后台任务进程
+# --------------------------
+# 每个 worker 各自创建任务进程池，任务进程总数 = workers × JOB_WORKERS；
+# worker 数已按 CPU 核数放大，默认每个 worker 只开 1 个任务进程，避免进程数远超核数（可用环境变量覆盖）
+os.environ.setdefault("JOB_WORKERS", "1")
+
+
+def on_starting(server):
+    """主进程启动时调用一次（早于 fork worker）：上次退出时未完成的后台任务标记为失败"""
+    from backend.utils.job_queue import recover_interrupted_jobs
+    recover_interrupted_jobs()
+
+
+def when_ready(server):
+    """主进程就绪、fork worker 之前调用：预热后冻结 GC，避免垃圾回收触碰共享页导致复制"""
+    if not preload_app:
+        return
+    from backend.app import warm_up
+    warm_up()
+    gc.freeze()
+
 # --------------------------
 # 日志配置
 # --------------------------